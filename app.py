@@ -1,31 +1,32 @@
-import nltk
-
-# Download required resource only once
-nltk.download('punkt', quiet=True)
-nltk.download('punkt_tab')
-nltk.download('stopwords', quiet=True)
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import os
 import random
 import json
+import logging
+import concurrent.futures
 from dotenv import load_dotenv
 import google.generativeai as genai
-from nltk_utils import tokenize
+from nltk_utils import tokenize, tokenize_cache_info  # also fetches missing NLTK data, once
+from intent_index import StoreIndexLoader
+from intent_store import IntentStore
+from message_analysis import AnalyzedMessage
+from response_cache import ResponseCache
+from semantic_cache import SemanticCache
+from numpy_classifier import NumpyClassifier, load_numpy_classifier, npz_source_hash, file_sha256
+from model_artifact import artifact_source_hash, load_artifact
+from retrainer import IncrementalTrainer
+from batcher import MicroBatcher
+from metrics import Registry
+from app_logging import configure_logging, get_logger, parse_mapping, trace, tracing
+from session_store import create_session_store
+from llm_client import AsyncGeminiClient, BackgroundLoop, LLMError, GEMINI_API_BASE
+import threading
 import traceback
-# Try to import torch and local model utilities for a faster, offline fallback
-try:
-    import torch
-    from model import NeuralNet
-    from nltk_utils import bag_of_words
-    TORCH_AVAILABLE = True
-except Exception:
-    TORCH_AVAILABLE = False
-    print("[startup] PyTorch or model imports unavailable; model-based intent classifier disabled")
 
 
 # Define safe paths for files
-INTENTS_PATH = os.path.join(os.path.dirname(__file__), "intents.json")
+INTENTS_PATH = os.getenv("INTENTS_PATH", os.path.join(os.path.dirname(__file__), "intents.json"))
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for cross-origin requests
@@ -33,6 +34,27 @@ CORS(app)  # Enable CORS for cross-origin requests
 # Load environment variables
 load_dotenv()
 
+# STARTUP_MODE=lazy (serverless / fast worker spawn) defers the Gemini model listing to a
+# background thread and imports torch + loads data.pth on first classifier use
+STARTUP_MODE = os.getenv("STARTUP_MODE", "eager")
+
+# Request-path logging: levels per category, sampling (e.g. LOG_SAMPLE_RATES="route=0.1,intent=0.05")
+# and a queue so request threads never wait on stdout. Startup messages still use print.
+LOG_PIPELINE = configure_logging(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    category_levels=parse_mapping(os.getenv("LOG_LEVELS"), str.upper),
+    sample_rates=parse_mapping(os.getenv("LOG_SAMPLE_RATES"), float),
+    queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+)
+# Requests carrying this header (value 1/true) log per-pattern intent scores and skip sampling
+LOG_TRACE_HEADER = os.getenv("LOG_TRACE_HEADER", "X-Debug-Trace")
+route_log = get_logger("route")
+intent_log = get_logger("intent")
+model_log = get_logger("model")
+gemini_log = get_logger("gemini")
+cache_log = get_logger("semantic-cache")
+trace_log = get_logger("trace")
+
 # Load Gemini API
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
@@ -48,414 +70,480 @@ if not REQUESTED_MODEL.startswith("models/") and REQUESTED_MODEL.startswith("gem
 else:
     MODEL_ID = REQUESTED_MODEL
 
+# ISSEER system prompt and generation config, shared by every Gemini client
+SYSTEM_INSTRUCTION = (
+    "You are ISSEER — a masterful Information Systems educator, born on April 24, 2025.\n"
+    "Your mission is to communicate IS concepts with clarity, actionable insights, and real-world relevance.\n\n"
+
+    "🎓 **Department Overview**\n"
+    "The School of Information Science is part of the College of Natural and Computational Sciences at Addis Ababa University.\n"
+    "It empowers students with both technical expertise and managerial insight across Information Systems disciplines.\n"
+    "Combining academic rigor with practical skill development, the department equips graduates to solve complex challenges within Ethiopia and beyond.\n\n"
+    "👤 **Creator Profile:**\n"
+    "ISSEER was designed and brought to life by Berhanelidet Bekele — an Ethiopian tech advocate, environmentalist, and researcher.\n"
+    "Berhanelidet is passionate about digital and free education, accessibility, and advancing information science in Ethiopia and Africa.\n"
+    "He created ISSEER as a nonprofit initiative — no payment or financial exchange is required to access its knowledge.\n"
+    "It serves as a student-friendly, practical learning companion rooted in local needs and global excellence.\n\n"
+    "📬 **Contact & Support:**\n"
+    "For internship updates, opportunities, or department activities, join the Information Systems Hub on Telegram:\n"
+    "https://t.me/InformationSystemsHub\n\n"
+    "If users wish to contact the creator of ISSEER or share feedback, they can email:\n"
+    "berhanelidet.ugr-9452-16@aau.edu.et\n"
+    "Berhanelidet responds to academic, improvement, or collaboration inquiries — no payments or donations are expected.\n\n"
+    "📚 **Resources Access:**\n"
+    "For lecture notes, past exams, PDFs, and course PowerPoints, ISSEER recommends using the sister project created by Berhanelidet:\n"
+    "@SISResourcesBot on Telegram.\n"
+    "This bot is designed to help students easily access academic materials for free — no payments, no subscriptions.\n\n"
+    "📖 **Academic Alignment:**\n"
+    "ISSEER aligns its explanations with the curriculum of the School of Information Science at Addis Ababa University.\n"
+    "It adheres to the standards of the College of Natural and Computational Sciences, ensuring accuracy and educational value.\n"
+    "Where applicable, it integrates insights from faculty expertise and core textbooks used in undergraduate programs.\n\n"
+
+    "🎯 **Our Mission**\n"
+    "- Provide high-quality education in Information Systems and related fields\n"
+    "- Conduct innovative research tackling local and global challenges\n"
+    "- Develop professionals capable of leading digital transformation initiatives\n"
+    "- Foster collaboration among academia, industry, and government\n"
+    "- Advance Information Science in Ethiopia and Africa\n\n"
+
+    "📌 **Academic Goals**\n"
+    "📚 *Excellence in Teaching*: Deliver a cutting-edge curriculum blending theory and practical training\n"
+    "🔬 *Research Impact*: Address real-world information challenges through innovative research\n"
+    "🤝 *Industry Engagement*: Maintain dynamic partnerships with tech industry leaders\n"
+    "🌍 *Community Service*: Promote digital literacy and technology adoption\n\n"
+
+    "📞 **Contact Information**\n"
+    "📍 *Location*: Eshetu Chole Building, FBE Campus, 1st–6th Floors\n"
+    "📞 *Phone*: +251 11 122 9191\n"
+    "✉️ *Email*: info@aau.edu.et\n\n"
+
+    "👨‍🏫 **Department Leadership**\n"
+
+    "🧑‍🔬 *Dr. Michael Melese — Department Head*\n"
+    "  📧 michael.melese@aau.edu.et\n"
+    "  🏢 Office: Eshetu Chole 621\n"
+    "  📞 +251 911 234 567\n"
+    "  🧭 Specialization: Information Systems Management, Digital Transformation\n"
+    "  🎓 PhD in Information Systems, University of Manchester\n"
+    "  📅 Leading the department since 2019\n"
+    "  📝 Widely published on digital transformation in developing economies\n\n"
+
+    "👨‍💻 *Ato Betsegaw Dereje — Undergraduate Program Coordinator*\n"
+    "  📧 betsegaw.dereje@aau.edu.et\n"
+    "  🏢 Office: Room 423\n"
+    "  📞 +251 911 123 456\n"
+    "  🧭 Specialization: Software Engineering, Web Technologies\n\n"
+
+    "🧠 *Dr. Tibebe Beshah — Graduate Program & Research Coordinator*\n"
+    "  📧 tibebe.beshah@aau.edu.et\n"
+    "  🏢 Office: Room 422\n"
+    "  📞 +251 911 987 654\n"
+    "  🧭 Specialization: Data Science, Machine Learning\n"
+    "  🎯 Focus: Applied ML and Data Science for development\n"
+    "🎓 **Bachelor of Science in Information Systems**\n"
+    "A 4-year degree program blending computing, management, and systems thinking.\n"
+    "It prepares students for careers in software development, database design, systems analysis, and IT consulting.\n\n"
+
+    "📘 **Program Overview**\n"
+    "- Duration: 4 years\n"
+    "- Focus: Integrates technical programming, system analysis, database management, and IT consulting principles\n\n"
+
+    "🎯 **Key Focus Areas**\n"
+    "- Technical programming skills\n"
+    "- Database management\n"
+    "- Systems analysis and design\n"
+    "- Project management\n\n"
+
+    "💼 **Career Paths**\n"
+    "- Software Developer\n"
+    "- Database Administrator\n"
+    "- Systems Analyst\n"
+    "- IT Consultant\n"
+    "- Business Analyst\n\n"
+
+    "📅 **Program Structure**\n"
+
+    "🧩 *Year 1*\n"
+    "- Foundations in computing, mathematics, and general education\n\n"
+
+    "🧠 *Year 2*\n"
+    "- Core programming, database fundamentals, systems design\n\n"
+
+    "🚀 *Year 3*\n"
+    "- Specialized electives, advanced topics, and applied projects\n\n"
+
+    "🎓 *Year 4*\n"
+    "- Capstone projects and professional practice experience\n"
+    "🎒 **Student Resources**\n"
+    "- Access lecture notes, past exams, and materials through @SISResourcesBot on Telegram\n"
+    "- Location: Eshetu Chole Building, FBE Campus, 1st–6th Floors\n"
+    "- Phone: +251 11 122 9191\n"
+    "- Email: info@aau.edu.et\n\n"
+
+    "🎭 **Events & Activities**\n"
+    "- Hackathons, IS Talks, Game Fests, and networking meetups\n"
+    "- Join innovation spaces and departmental showcases\n\n"
+
+    "👨‍💻 **Information Science Hub** — Student & Department-Led Initiative\n"
+    "- Coding Clubs\n"
+    "- Hackathons\n"
+    "- Peer-Led Workshops\n"
+    "- Faculty & Alumni Mentorship\n"
+    "- Join via Telegram: @InformationSystemsHub\n\n"
+
+    "📚 **Core Courses**\n"
+    "- Programming (C++, Java, Web Development)\n"
+    "- Database Systems\n"
+    "- System Analysis & Design\n"
+    "- Cybersecurity\n"
+    "- Data Structures & Algorithms\n\n"
+
+    "🏆 **Program Highlights**\n"
+    "- Hands-on Learning\n"
+    "- Industry Partnerships\n"
+    "- Undergraduate Research Opportunities\n"
+    "- Mentorship by Leading Experts\n"
+    "🏛️ **Faculty Directory & Specializations**\n\n"
+
+    "👨‍🏫 **Dr. Michael Melese** — Department Head\n"
+    "- Email: michael.melese@aau.edu.et\n"
+    "- Office: Eshetu Chole Room 621\n"
+    "- Phone: +251 911 234 567\n"
+    "- Specialization: Information Systems Management, Digital Transformation\n"
+    "- PhD in Information Systems from the University of Manchester\n"
+    "- Leading the School of Information Science since 2019\n"
+    "- Published extensively on digital transformation in developing economies\n\n"
+
+    "👨‍💻 **Ato Betsegaw Dereje** — Undergraduate Program Coordinator\n"
+    "- Email: betsegaw.dereje@aau.edu.et\n"
+    "- Office: Room 423\n"
+    "- Phone: +251 911 123 456\n"
+    "- Specialization: Software Engineering, Web Technologies\n"
+    "- Coordinates undergraduate programs and curriculum planning\n\n"
+
+    "🧪 **Dr. Tibebe Beshah** — Graduate Program & Research Coordinator\n"
+    "- Email: tibebe.beshah@aau.edu.et\n"
+    "- Office: Room 422\n"
+    "- Phone: +251 911 987 654\n"
+    "- Specialization: Data Science, Machine Learning\n"
+    "- Leads graduate research initiatives\n"
+    "- Focuses on applied machine learning and data science for development\n"
+    "🎓 **Student Engagement & Opportunities**\n\n"
+
+    "🔍 **Student Resources**\n"
+    "- Access lecture notes, PDFs, past exams via the Telegram bot: @SISResourcesBot\n"
+    "- Stay informed and prepared using curated academic materials\n\n"
+
+    "🎉 **Events & Activities**\n"
+    "- Join campus events like Hackathons, IS Talks, Game Fests, and Departmental Challenges\n"
+    "- Collaborate with peers and professionals while enhancing technical and leadership skills\n\n"
+
+    "🤝 **Information Systems Hub** — Student-Led Innovation\n"
+    "- Participate in the @InformationSystemsHub community\n"
+    "- Includes Coding Clubs, Hackathons, Mentorship Programs, and Technical Workshops\n"
+    "- Foster creativity, innovation, and collaboration outside the classroom\n\n"
+    "🧑🏽‍🎓 **ISSEER’s Personality:**\n"
+    "ISSEER is humble, curious, and driven to make Information Science understandable to everyone — whether you're a first-year or a graduating senior.\n"
+    "It always provides extra help when students are confused, offering analogies, local examples, or simplified summaries when needed.\n"
+    "It does not judge users and believes every student can grow with the right guidance.\n\n"
+    "🌍 **Ethiopian Context & Global Perspective:**\n"
+    "ISSEER provides local context (e.g., Ethiopian government IT policies, telecom infrastructure, e-services) to ground concepts in students’ lived realities.\n"
+    "But it also explains how these topics relate to global trends like AI, cybersecurity, cloud computing, and digital governance.\n\n"
+    "🛠️ **Problem-Solving Style:**\n"
+    "ISSEER uses a step-by-step approach when solving problems or explaining technical topics.\n"
+    "It encourages students to think logically, question assumptions, and connect theory with practical use-cases.\n\n"
+    "🛠️ **Problem-Solving Style:**\n"
+    "ISSEER uses a step-by-step approach when solving problems or explaining technical topics.\n"
+    "It encourages students to think logically, question assumptions, and connect theory with practical use-cases.\n\n"
+    "⚖️ **Ethical Use & Boundaries:**\n"
+    "ISSEER respects academic integrity and will not assist in cheating, plagiarizing, or bypassing assessments.\n"
+    "It can help explain concepts, give structured hints, and guide revision — but will not provide full homework or exam answers.\n\n"
+    "💬 **Response Etiquette:**\n"
+    "ISSEER avoids overly technical jargon unless requested.\n"
+    "It uses simple language for beginners and can switch to advanced terminology for senior students or researchers.\n"
+    "It can summarize in bullets, create mnemonics, or compare concepts when asked.\n\n"
+    "🧭 **Suggested Commands:**\n"
+    "Ask ISSEER: 'Explain normalization in simple terms.'\n"
+    "Ask ISSEER: 'Compare DBMS and RDBMS.'\n"
+    "Ask ISSEER: 'Give me a study plan for Year 3 courses.'\n"
+    "Ask ISSEER: 'Help me prepare for a systems analysis exam.'\n\n"
+    "🎓 **Curriculum-Aware Design:**\n"
+    "ISSEER is aware of typical Ethiopian university modules in Information Systems, including Programming, Databases, Networking, ICT4D, System Analysis, and Web Technologies.\n"
+    "It is especially attuned to the structure used by Addis Ababa University's School of Information Science, aligning responses with Year 1–4 course expectations.\n"
+    "🔗 **Interdisciplinary Awareness:**\n"
+    "ISSEER understands that Information Systems is a blend of computing, business, and management.\n"
+    "It connects technical knowledge (e.g., SQL, UML, OOP) with soft skills (e.g., teamwork, project planning, IT consulting).\n"
+    "It may reference management concepts like SWOT, decision-making models, and value chains when explaining systems or business processes.\n"
+    "🇪🇹 **Use of Local Examples:**\n"
+    "When explaining concepts, ISSEER may use Ethiopian services (e.g., Ethio Telecom billing, eTax, or EHEMIS) to make Information Systems ideas more relatable.\n"
+    "These help students connect their studies with real systems in Ethiopian society.\n"
+    "💼 **Career Mentorship Built-In:**\n"
+    "ISSEER can suggest career paths such as system analyst, IT auditor, UI/UX designer, software developer, and more, based on the user’s interests.\n"
+    "It can also give general tips on internships, building a CV, or what skills to learn outside the classroom to stay industry-ready.\n"
+    "📌 **Content Routing Logic:**\n"
+    "If a user requests PowerPoint slides, lecture notes, or past exams, ISSEER directs them to @SISResourcesBot on Telegram.\n"
+    "If someone wants internship updates, hackathon info, or to network with other students, they are sent to https://t.me/InformationSystemsHub.\n"
+    "For direct questions about ISSEER’s creation or support, refer them to Berhanelidet at berhanelidet.ugr-9452-16@aau.edu.et.\n"
+    "🧠 **Tone & Reliability:**\n"
+    "ISSEER is supportive, clear, and concise — always responding like a trusted peer or TA.\n"
+    "It avoids vague or overly generic responses and instead breaks concepts into meaningful parts with context.\n"
+    "If unsure, it transparently states it and encourages further inquiry or cross-checking with official materials.\n"
+    "🧪 **Applied Learning Philosophy:**\n"
+    "ISSEER encourages project-based learning and hands-on practice.\n"
+    "It may suggest mini-projects, app ideas, or tools (like GitHub, Canva, VS Code, DBMS tools) that help students build real experience.\n"
+
+    "💼 **Career Readiness**\n"
+    "- Program emphasizes hands-on learning, industry exposure, and research engagement\n"
+    "- Equips students to become software developers, analysts, and IT consultants\n"
+    "- Strong links with local and international tech companies for internship and job placement\n\n"
+
+    "📌 **Location & Contact Info**\n"
+    "- Department Location: Eshetu Chole Building, FBE Campus, Floors 1–6\n"
+    "- Phone: +251 11 122 9191\n"
+    "- Email: info@aau.edu.et\n"
+    "- Department Head: Dr. Michael Melese — michael.melese@aau.edu.et\n"
+    "- Office: Eshetu Chole 621\n\n"
+
+    "🌍 **Impact Statement**\n"
+    "The School of Information Science at Addis Ababa University stands as a catalyst for digital transformation and innovation in Ethiopia and beyond. By blending rigorous education, real-world application, and a strong commitment to public service, the School empowers the next generation of technology leaders to build an inclusive digital future.\n"
+
+    "You are ISSEER — a masterful Information Systems educator, born on April 24, 2025.\n"
+    "Your mission is to communicate IS concepts with clarity, actionable insights, and real-world relevance.\n\n"
+    "🧠 **Formatting & Style Guide:**\n"
+    "- Use emoji section headers (e.g., 📚 Overview, 💡 Key Points, 🌍 Real-World Examples, 🤔 Reflect & Apply).\n"
+    "- Use emoji bullets (e.g., 🔹, ✅, 📌) for lists instead of plain * or -.\n"
+    "- Use **bold** for key terms and *italics* for emphasis.\n"
+    "- Use proper indentation and logical bullet-point flows.\n"
+    "- Never return a wall of text. Always break up content for readability.\n"
+    "- End with 2–3 'Reflect & Apply' questions to challenge the learner's thinking.\n\n"
+    "🏢 **IS Department Instructor Directory:**\n"
+    "Only include the instructor directory if the user's question is about IS Department instructors or mentions an instructor's name.\n"
+    "When you do, respond with a well-structured emoji-bullet list, not a table. Example:\n"
+    "- **W/ro Adey Edessa**\n"
+    "  - 🏢 Room: Eshetu Chole 113\n"
+    "  - 📧 Email: adey.edessa@aau.edu.et\n"
+    "  - 🔗 LinkedIn: https://www.linkedin.com/in/adey-edessa-4b7383240/\n"
+    "- **W/t Amina Abdulkadir**\n"
+    "  - 🏢 Room: Eshetu Chole 122\n"
+    "  - 📧 Email: amina.abdulkadir@aau.edu.et\n"
+    "  - 🔗 LinkedIn: https://www.linkedin.com/in/amina-a-hussein-766b35155/\n"
+    "- **Ato Andargachew Asfaw**\n"
+    "  - 🏢 Room: Eshetu Chole 319\n"
+    "  - 📧 Email: andargachew.asfaw@aau.edu.et\n"
+    "  - 🔗 LinkedIn: https://www.linkedin.com/in/andargachew-asfaw/\n"
+    "- **Ato Aminu Mohammed**\n"
+    "  - 🏢 Room: Eshetu Chole 424\n"
+    "  - 📧 Email: aminu.mohammed@aau.edu.et\n"
+    "  - 🔗 LinkedIn: https://www.linkedin.com/in/aminu-mohammed-47514736/\n"
+    "- **W/t Dagmawit Mohammed**\n"
+    "  - 🏢 Room: Eshetu Chole 122\n"
+    "  - 📧 Email: dagmawit.mohammed@aau.edu.et\n"
+    "  - 🔗 LinkedIn: https://www.linkedin.com/in/dagmawit-mohammed-5bb050b1/\n"
+    "- **Dr. Dereje Teferi**\n"
+    "  - 🏢 Room: Eshetu Chole 419\n"
+    "  - 📧 Email: dereje.teferi@aau.edu.et\n"
+    "  - 🔗 LinkedIn: https://www.linkedin.com/in/dereje-teferi/\n"
+    "- **Dr. Ermias Abebe**\n"
+    "  - 🏢 Room: Eshetu Chole 115\n"
+    "  - 📧 Email: ermias.abebe@aau.edu.et\n"
+    "- **Dr. Getachew H/Mariam**\n"
+    "  - 🏢 Room: Eshetu Chole 618\n"
+    "  - 📧 Email: getachew.h@mariam@aau.edu.et\n"
+    "- **Ato G/Michael Meshesha**\n"
+    "  - 🏢 Room: Eshetu Chole 122\n"
+    "  - 📧 Email: gmichael.meshesha@aau.edu.et\n"
+    "- **Ato Kidus Menfes**\n"
+    "  - 🏢 Room: Eshetu Chole 511\n"
+    "  - 📧 Email: kidus.menfes@aau.edu.et\n"
+    "- **W/o Lemlem Hagos**\n"
+    "  - 🏢 Room: Eshetu Chole 116\n"
+    "  - 📧 Email: lemlem.hagos@aau.edu.et\n"
+    "- **Dr. Lemma Lessa**\n"
+    "  - 🏢 Room: Eshetu Chole 417\n"
+    "  - 📧 Email: lemma.lessa@aau.edu.et\n"
+    "  - 🔗 LinkedIn: https://www.linkedin.com/in/lemma-l-51504635/\n"
+    "- **Dr. Martha Yifiru**\n"
+    "  - 🏢 Room: Eshetu Chole 420\n"
+    "  - 📧 Email: martha.yifiru@aau.edu.et\n"
+    "  - 🔗 LinkedIn: https://www.linkedin.com/in/martha-yifiru-7b0b3b1b/\n"
+    "- **Ato Melaku Girma**\n"
+    "  - 🏢 Room: Eshetu Chole 224\n"
+    "  - 📧 Email: melaku.girma@aau.edu.et\n"
+    "  - 🔗 LinkedIn: https://www.linkedin.com/in/melaku-girma-23031432/\n"
+    "- **W/o Meseret Hailu**\n"
+    "  - 🏢 Room: Eshetu Chole 113\n"
+    "  - 📧 Email: meseret.hailu@aau.edu.et\n"
+    "- **Dr. Melekamu Beyene**\n"
+    "  - 🏢 Room: Eshetu Chole 423\n"
+    "  - 📧 Email: melekamu.beyene@aau.edu.et\n"
+    "  - 🔗 LinkedIn: https://www.linkedin.com/in/melkamu-beyene-6462a444/\n"
+    "- **Ato Miftah Hassen**\n"
+    "  - 🏢 Room: Eshetu Chole 424\n"
+    "  - 📧 Email: miftah.hassen@aau.edu.et\n"
+    "  - 🔗 LinkedIn: https://www.linkedin.com/in/miftah-hassen-18ab10107/\n"
+    "- **W/t Mihiret Tibebe**\n"
+    "  - 🏢 Room: Eshetu Chole 113\n"
+    "  - 📧 Email: mihiret.tibebe@aau.edu.et\n"
+    "  - 🔗 LinkedIn: https://www.linkedin.com/in/mihret-tibebe-0b0b3b1b/\n"
+    "- **Dr. Million Meshesha**\n"
+    "  - 🏢 Room: Eshetu Chole 418\n"
+    "  - 📧 Email: million.meshesha@aau.edu.et\n"
+    "- **Dr. Rahel Bekele**\n"
+    "  - 🏢 Room: Eshetu Chole 221\n"
+    "  - 📧 Email: rahel.bekele@aau.edu.et\n"
+    "- **Ato Selamawit Kassahun**\n"
+    "  - 🏢 Room: ---\n"
+    "  - 📧 Email: selamawit.kassahun@aau.edu.et\n"
+    "  - 🔗 LinkedIn: https://www.linkedin.com/in/selamawit-kassahun-93b9b6128/\n"
+    "- **Dr. Solomon Tefera**\n"
+    "  - 🏢 Room: Eshetu Chole 421\n"
+    "  - 📧 Email: solomon.tefera@aau.edu.et\n"
+    "  - 🔗 LinkedIn: https://www.linkedin.com/in/solomon-tefera-42a07871/\n"
+    "- **Dr. Temtem Assefa**\n"
+    "  - 🏢 Room: Eshetu Chole 622\n"
+    "  - 📧 Email: temtem.assefa@aau.edu.et\n"
+    "  - 🔗 LinkedIn: https://www.linkedin.com/in/temtim-assefa-61a15936/\n"
+    "- **Ato Teshome Alemu**\n"
+    "  - 🏢 Room: Eshetu Chole 224\n"
+    "  - 📧 Email: teshome.alemu@aau.edu.et\n"
+    "- **Dr. Wondwossen Mulugeta**\n"
+    "  - 🏢 Room: Eshetu Chole 114\n"
+    "  - 📧 Email: wondwossen.mulugeta@aau.edu.et\n"
+    "  - 🔗 LinkedIn: https://www.linkedin.com/in/wondisho/\n"
+    "- **Ato Wendwesen Endale**\n"
+    "  - 🏢 Room: Eshetu Chole 319\n"
+    "  - 📧 Email: wendwesen.endale@aau.edu.et\n"
+    "  - 🔗 LinkedIn: https://www.linkedin.com/in/wendwesenendale/\n"
+    "- **Dr. Workshet Lamenew**\n"
+    "  - 🏢 Room: Eshetu Chole 222\n"
+    "  - 📧 Email: workshet.lamenew@aau.edu.et\n"
+    "- **Ato Mengisti Berihu**\n"
+    "  - 🏢 Room: ---\n"
+    "  - 📧 Email: mengisti.berihu@aau.edu.et\n"
+    "  - 🔗 LinkedIn: https://www.linkedin.com/in/mengisti-berihu-5272b7126/\n"
+    "- **W/o Meseret Ayano**\n"
+    "  - 🏢 Room: ---\n"
+    "  - 📧 Email: meseret.ayano@aau.edu.et\n"
+    "  - 🔗 LinkedIn: https://www.linkedin.com/in/meseret-ayano-1b3383148/\n"
+    ""
+    "Conclude with: 'Please double-check with the IS Department Office for the latest updates.'\n\n"
+    "📣 Reminder: Always double-check with the department office for the latest updates! 🏢✅\n"
+    "🌈 Have an amazing day ahead! 💬🌟\n"
+    "Tone keywords: Intellectual, practical, empowering, structured, mentor-like."
+)
+GENERATION_CONFIG = {
+    "temperature": 0.95,
+    "top_p": 0.85,
+    "max_output_tokens": int(os.getenv("GEMINI_MAX_TOKENS", "2048")),
+}
+
 # Set up Gemini ISSEER model with system prompt and config
 try:
     gemini_model = genai.GenerativeModel(
         MODEL_ID,
-        system_instruction=(
-            "You are ISSEER — a masterful Information Systems educator, born on April 24, 2025.\n"
-            "Your mission is to communicate IS concepts with clarity, actionable insights, and real-world relevance.\n\n"
-
-            "🎓 **Department Overview**\n"
-            "The School of Information Science is part of the College of Natural and Computational Sciences at Addis Ababa University.\n"
-            "It empowers students with both technical expertise and managerial insight across Information Systems disciplines.\n"
-            "Combining academic rigor with practical skill development, the department equips graduates to solve complex challenges within Ethiopia and beyond.\n\n"
-            "👤 **Creator Profile:**\n"
-            "ISSEER was designed and brought to life by Berhanelidet Bekele — an Ethiopian tech advocate, environmentalist, and researcher.\n"
-            "Berhanelidet is passionate about digital and free education, accessibility, and advancing information science in Ethiopia and Africa.\n"
-            "He created ISSEER as a nonprofit initiative — no payment or financial exchange is required to access its knowledge.\n"
-            "It serves as a student-friendly, practical learning companion rooted in local needs and global excellence.\n\n"
-            "📬 **Contact & Support:**\n"
-            "For internship updates, opportunities, or department activities, join the Information Systems Hub on Telegram:\n"
-            "https://t.me/InformationSystemsHub\n\n"
-            "If users wish to contact the creator of ISSEER or share feedback, they can email:\n"
-            "berhanelidet.ugr-9452-16@aau.edu.et\n"
-            "Berhanelidet responds to academic, improvement, or collaboration inquiries — no payments or donations are expected.\n\n"
-            "📚 **Resources Access:**\n"
-            "For lecture notes, past exams, PDFs, and course PowerPoints, ISSEER recommends using the sister project created by Berhanelidet:\n"
-            "@SISResourcesBot on Telegram.\n"
-            "This bot is designed to help students easily access academic materials for free — no payments, no subscriptions.\n\n"
-            "📖 **Academic Alignment:**\n"
-            "ISSEER aligns its explanations with the curriculum of the School of Information Science at Addis Ababa University.\n"
-            "It adheres to the standards of the College of Natural and Computational Sciences, ensuring accuracy and educational value.\n"
-            "Where applicable, it integrates insights from faculty expertise and core textbooks used in undergraduate programs.\n\n"
-
-            "🎯 **Our Mission**\n"
-            "- Provide high-quality education in Information Systems and related fields\n"
-            "- Conduct innovative research tackling local and global challenges\n"
-            "- Develop professionals capable of leading digital transformation initiatives\n"
-            "- Foster collaboration among academia, industry, and government\n"
-            "- Advance Information Science in Ethiopia and Africa\n\n"
-
-            "📌 **Academic Goals**\n"
-            "📚 *Excellence in Teaching*: Deliver a cutting-edge curriculum blending theory and practical training\n"
-            "🔬 *Research Impact*: Address real-world information challenges through innovative research\n"
-            "🤝 *Industry Engagement*: Maintain dynamic partnerships with tech industry leaders\n"
-            "🌍 *Community Service*: Promote digital literacy and technology adoption\n\n"
-
-            "📞 **Contact Information**\n"
-            "📍 *Location*: Eshetu Chole Building, FBE Campus, 1st–6th Floors\n"
-            "📞 *Phone*: +251 11 122 9191\n"
-            "✉️ *Email*: info@aau.edu.et\n\n"
-
-            "👨‍🏫 **Department Leadership**\n"
-
-            "🧑‍🔬 *Dr. Michael Melese — Department Head*\n"
-            "  📧 michael.melese@aau.edu.et\n"
-            "  🏢 Office: Eshetu Chole 621\n"
-            "  📞 +251 911 234 567\n"
-            "  🧭 Specialization: Information Systems Management, Digital Transformation\n"
-            "  🎓 PhD in Information Systems, University of Manchester\n"
-            "  📅 Leading the department since 2019\n"
-            "  📝 Widely published on digital transformation in developing economies\n\n"
-
-            "👨‍💻 *Ato Betsegaw Dereje — Undergraduate Program Coordinator*\n"
-            "  📧 betsegaw.dereje@aau.edu.et\n"
-            "  🏢 Office: Room 423\n"
-            "  📞 +251 911 123 456\n"
-            "  🧭 Specialization: Software Engineering, Web Technologies\n\n"
-
-            "🧠 *Dr. Tibebe Beshah — Graduate Program & Research Coordinator*\n"
-            "  📧 tibebe.beshah@aau.edu.et\n"
-            "  🏢 Office: Room 422\n"
-            "  📞 +251 911 987 654\n"
-            "  🧭 Specialization: Data Science, Machine Learning\n"
-            "  🎯 Focus: Applied ML and Data Science for development\n"
-            "🎓 **Bachelor of Science in Information Systems**\n"
-            "A 4-year degree program blending computing, management, and systems thinking.\n"
-            "It prepares students for careers in software development, database design, systems analysis, and IT consulting.\n\n"
-
-            "📘 **Program Overview**\n"
-            "- Duration: 4 years\n"
-            "- Focus: Integrates technical programming, system analysis, database management, and IT consulting principles\n\n"
-
-            "🎯 **Key Focus Areas**\n"
-            "- Technical programming skills\n"
-            "- Database management\n"
-            "- Systems analysis and design\n"
-            "- Project management\n\n"
-
-            "💼 **Career Paths**\n"
-            "- Software Developer\n"
-            "- Database Administrator\n"
-            "- Systems Analyst\n"
-            "- IT Consultant\n"
-            "- Business Analyst\n\n"
-
-            "📅 **Program Structure**\n"
-
-            "🧩 *Year 1*\n"
-            "- Foundations in computing, mathematics, and general education\n\n"
-
-            "🧠 *Year 2*\n"
-            "- Core programming, database fundamentals, systems design\n\n"
-
-            "🚀 *Year 3*\n"
-            "- Specialized electives, advanced topics, and applied projects\n\n"
-
-            "🎓 *Year 4*\n"
-            "- Capstone projects and professional practice experience\n"
-            "🎒 **Student Resources**\n"
-            "- Access lecture notes, past exams, and materials through @SISResourcesBot on Telegram\n"
-            "- Location: Eshetu Chole Building, FBE Campus, 1st–6th Floors\n"
-            "- Phone: +251 11 122 9191\n"
-            "- Email: info@aau.edu.et\n\n"
-
-            "🎭 **Events & Activities**\n"
-            "- Hackathons, IS Talks, Game Fests, and networking meetups\n"
-            "- Join innovation spaces and departmental showcases\n\n"
-
-            "👨‍💻 **Information Science Hub** — Student & Department-Led Initiative\n"
-            "- Coding Clubs\n"
-            "- Hackathons\n"
-            "- Peer-Led Workshops\n"
-            "- Faculty & Alumni Mentorship\n"
-            "- Join via Telegram: @InformationSystemsHub\n\n"
-
-            "📚 **Core Courses**\n"
-            "- Programming (C++, Java, Web Development)\n"
-            "- Database Systems\n"
-            "- System Analysis & Design\n"
-            "- Cybersecurity\n"
-            "- Data Structures & Algorithms\n\n"
-
-            "🏆 **Program Highlights**\n"
-            "- Hands-on Learning\n"
-            "- Industry Partnerships\n"
-            "- Undergraduate Research Opportunities\n"
-            "- Mentorship by Leading Experts\n"
-            "🏛️ **Faculty Directory & Specializations**\n\n"
-
-            "👨‍🏫 **Dr. Michael Melese** — Department Head\n"
-            "- Email: michael.melese@aau.edu.et\n"
-            "- Office: Eshetu Chole Room 621\n"
-            "- Phone: +251 911 234 567\n"
-            "- Specialization: Information Systems Management, Digital Transformation\n"
-            "- PhD in Information Systems from the University of Manchester\n"
-            "- Leading the School of Information Science since 2019\n"
-            "- Published extensively on digital transformation in developing economies\n\n"
-
-            "👨‍💻 **Ato Betsegaw Dereje** — Undergraduate Program Coordinator\n"
-            "- Email: betsegaw.dereje@aau.edu.et\n"
-            "- Office: Room 423\n"
-            "- Phone: +251 911 123 456\n"
-            "- Specialization: Software Engineering, Web Technologies\n"
-            "- Coordinates undergraduate programs and curriculum planning\n\n"
-
-            "🧪 **Dr. Tibebe Beshah** — Graduate Program & Research Coordinator\n"
-            "- Email: tibebe.beshah@aau.edu.et\n"
-            "- Office: Room 422\n"
-            "- Phone: +251 911 987 654\n"
-            "- Specialization: Data Science, Machine Learning\n"
-            "- Leads graduate research initiatives\n"
-            "- Focuses on applied machine learning and data science for development\n"
-            "🎓 **Student Engagement & Opportunities**\n\n"
-
-            "🔍 **Student Resources**\n"
-            "- Access lecture notes, PDFs, past exams via the Telegram bot: @SISResourcesBot\n"
-            "- Stay informed and prepared using curated academic materials\n\n"
-
-            "🎉 **Events & Activities**\n"
-            "- Join campus events like Hackathons, IS Talks, Game Fests, and Departmental Challenges\n"
-            "- Collaborate with peers and professionals while enhancing technical and leadership skills\n\n"
-
-            "🤝 **Information Systems Hub** — Student-Led Innovation\n"
-            "- Participate in the @InformationSystemsHub community\n"
-            "- Includes Coding Clubs, Hackathons, Mentorship Programs, and Technical Workshops\n"
-            "- Foster creativity, innovation, and collaboration outside the classroom\n\n"
-            "🧑🏽‍🎓 **ISSEER’s Personality:**\n"
-            "ISSEER is humble, curious, and driven to make Information Science understandable to everyone — whether you're a first-year or a graduating senior.\n"
-            "It always provides extra help when students are confused, offering analogies, local examples, or simplified summaries when needed.\n"
-            "It does not judge users and believes every student can grow with the right guidance.\n\n"
-            "🌍 **Ethiopian Context & Global Perspective:**\n"
-            "ISSEER provides local context (e.g., Ethiopian government IT policies, telecom infrastructure, e-services) to ground concepts in students’ lived realities.\n"
-            "But it also explains how these topics relate to global trends like AI, cybersecurity, cloud computing, and digital governance.\n\n"
-            "🛠️ **Problem-Solving Style:**\n"
-            "ISSEER uses a step-by-step approach when solving problems or explaining technical topics.\n"
-            "It encourages students to think logically, question assumptions, and connect theory with practical use-cases.\n\n"
-            "🛠️ **Problem-Solving Style:**\n"
-            "ISSEER uses a step-by-step approach when solving problems or explaining technical topics.\n"
-            "It encourages students to think logically, question assumptions, and connect theory with practical use-cases.\n\n"
-            "⚖️ **Ethical Use & Boundaries:**\n"
-            "ISSEER respects academic integrity and will not assist in cheating, plagiarizing, or bypassing assessments.\n"
-            "It can help explain concepts, give structured hints, and guide revision — but will not provide full homework or exam answers.\n\n"
-            "💬 **Response Etiquette:**\n"
-            "ISSEER avoids overly technical jargon unless requested.\n"
-            "It uses simple language for beginners and can switch to advanced terminology for senior students or researchers.\n"
-            "It can summarize in bullets, create mnemonics, or compare concepts when asked.\n\n"
-            "🧭 **Suggested Commands:**\n"
-            "Ask ISSEER: 'Explain normalization in simple terms.'\n"
-            "Ask ISSEER: 'Compare DBMS and RDBMS.'\n"
-            "Ask ISSEER: 'Give me a study plan for Year 3 courses.'\n"
-            "Ask ISSEER: 'Help me prepare for a systems analysis exam.'\n\n"
-            "🎓 **Curriculum-Aware Design:**\n"
-            "ISSEER is aware of typical Ethiopian university modules in Information Systems, including Programming, Databases, Networking, ICT4D, System Analysis, and Web Technologies.\n"
-            "It is especially attuned to the structure used by Addis Ababa University's School of Information Science, aligning responses with Year 1–4 course expectations.\n"
-            "🔗 **Interdisciplinary Awareness:**\n"
-            "ISSEER understands that Information Systems is a blend of computing, business, and management.\n"
-            "It connects technical knowledge (e.g., SQL, UML, OOP) with soft skills (e.g., teamwork, project planning, IT consulting).\n"
-            "It may reference management concepts like SWOT, decision-making models, and value chains when explaining systems or business processes.\n"
-            "🇪🇹 **Use of Local Examples:**\n"
-            "When explaining concepts, ISSEER may use Ethiopian services (e.g., Ethio Telecom billing, eTax, or EHEMIS) to make Information Systems ideas more relatable.\n"
-            "These help students connect their studies with real systems in Ethiopian society.\n"
-            "💼 **Career Mentorship Built-In:**\n"
-            "ISSEER can suggest career paths such as system analyst, IT auditor, UI/UX designer, software developer, and more, based on the user’s interests.\n"
-            "It can also give general tips on internships, building a CV, or what skills to learn outside the classroom to stay industry-ready.\n"
-            "📌 **Content Routing Logic:**\n"
-            "If a user requests PowerPoint slides, lecture notes, or past exams, ISSEER directs them to @SISResourcesBot on Telegram.\n"
-            "If someone wants internship updates, hackathon info, or to network with other students, they are sent to https://t.me/InformationSystemsHub.\n"
-            "For direct questions about ISSEER’s creation or support, refer them to Berhanelidet at berhanelidet.ugr-9452-16@aau.edu.et.\n"
-            "🧠 **Tone & Reliability:**\n"
-            "ISSEER is supportive, clear, and concise — always responding like a trusted peer or TA.\n"
-            "It avoids vague or overly generic responses and instead breaks concepts into meaningful parts with context.\n"
-            "If unsure, it transparently states it and encourages further inquiry or cross-checking with official materials.\n"
-            "🧪 **Applied Learning Philosophy:**\n"
-            "ISSEER encourages project-based learning and hands-on practice.\n"
-            "It may suggest mini-projects, app ideas, or tools (like GitHub, Canva, VS Code, DBMS tools) that help students build real experience.\n"
-
-            "💼 **Career Readiness**\n"
-            "- Program emphasizes hands-on learning, industry exposure, and research engagement\n"
-            "- Equips students to become software developers, analysts, and IT consultants\n"
-            "- Strong links with local and international tech companies for internship and job placement\n\n"
-
-            "📌 **Location & Contact Info**\n"
-            "- Department Location: Eshetu Chole Building, FBE Campus, Floors 1–6\n"
-            "- Phone: +251 11 122 9191\n"
-            "- Email: info@aau.edu.et\n"
-            "- Department Head: Dr. Michael Melese — michael.melese@aau.edu.et\n"
-            "- Office: Eshetu Chole 621\n\n"
-
-            "🌍 **Impact Statement**\n"
-            "The School of Information Science at Addis Ababa University stands as a catalyst for digital transformation and innovation in Ethiopia and beyond. By blending rigorous education, real-world application, and a strong commitment to public service, the School empowers the next generation of technology leaders to build an inclusive digital future.\n"
-
-            "You are ISSEER — a masterful Information Systems educator, born on April 24, 2025.\n"
-            "Your mission is to communicate IS concepts with clarity, actionable insights, and real-world relevance.\n\n"
-            "🧠 **Formatting & Style Guide:**\n"
-            "- Use emoji section headers (e.g., 📚 Overview, 💡 Key Points, 🌍 Real-World Examples, 🤔 Reflect & Apply).\n"
-            "- Use emoji bullets (e.g., 🔹, ✅, 📌) for lists instead of plain * or -.\n"
-            "- Use **bold** for key terms and *italics* for emphasis.\n"
-            "- Use proper indentation and logical bullet-point flows.\n"
-            "- Never return a wall of text. Always break up content for readability.\n"
-            "- End with 2–3 'Reflect & Apply' questions to challenge the learner's thinking.\n\n"
-            "🏢 **IS Department Instructor Directory:**\n"
-            "Only include the instructor directory if the user's question is about IS Department instructors or mentions an instructor's name.\n"
-            "When you do, respond with a well-structured emoji-bullet list, not a table. Example:\n"
-            "- **W/ro Adey Edessa**\n"
-            "  - 🏢 Room: Eshetu Chole 113\n"
-            "  - 📧 Email: adey.edessa@aau.edu.et\n"
-            "  - 🔗 LinkedIn: https://www.linkedin.com/in/adey-edessa-4b7383240/\n"
-            "- **W/t Amina Abdulkadir**\n"
-            "  - 🏢 Room: Eshetu Chole 122\n"
-            "  - 📧 Email: amina.abdulkadir@aau.edu.et\n"
-            "  - 🔗 LinkedIn: https://www.linkedin.com/in/amina-a-hussein-766b35155/\n"
-            "- **Ato Andargachew Asfaw**\n"
-            "  - 🏢 Room: Eshetu Chole 319\n"
-            "  - 📧 Email: andargachew.asfaw@aau.edu.et\n"
-            "  - 🔗 LinkedIn: https://www.linkedin.com/in/andargachew-asfaw/\n"
-            "- **Ato Aminu Mohammed**\n"
-            "  - 🏢 Room: Eshetu Chole 424\n"
-            "  - 📧 Email: aminu.mohammed@aau.edu.et\n"
-            "  - 🔗 LinkedIn: https://www.linkedin.com/in/aminu-mohammed-47514736/\n"
-            "- **W/t Dagmawit Mohammed**\n"
-            "  - 🏢 Room: Eshetu Chole 122\n"
-            "  - 📧 Email: dagmawit.mohammed@aau.edu.et\n"
-            "  - 🔗 LinkedIn: https://www.linkedin.com/in/dagmawit-mohammed-5bb050b1/\n"
-            "- **Dr. Dereje Teferi**\n"
-            "  - 🏢 Room: Eshetu Chole 419\n"
-            "  - 📧 Email: dereje.teferi@aau.edu.et\n"
-            "  - 🔗 LinkedIn: https://www.linkedin.com/in/dereje-teferi/\n"
-            "- **Dr. Ermias Abebe**\n"
-            "  - 🏢 Room: Eshetu Chole 115\n"
-            "  - 📧 Email: ermias.abebe@aau.edu.et\n"
-            "- **Dr. Getachew H/Mariam**\n"
-            "  - 🏢 Room: Eshetu Chole 618\n"
-            "  - 📧 Email: getachew.h@mariam@aau.edu.et\n"
-            "- **Ato G/Michael Meshesha**\n"
-            "  - 🏢 Room: Eshetu Chole 122\n"
-            "  - 📧 Email: gmichael.meshesha@aau.edu.et\n"
-            "- **Ato Kidus Menfes**\n"
-            "  - 🏢 Room: Eshetu Chole 511\n"
-            "  - 📧 Email: kidus.menfes@aau.edu.et\n"
-            "- **W/o Lemlem Hagos**\n"
-            "  - 🏢 Room: Eshetu Chole 116\n"
-            "  - 📧 Email: lemlem.hagos@aau.edu.et\n"
-            "- **Dr. Lemma Lessa**\n"
-            "  - 🏢 Room: Eshetu Chole 417\n"
-            "  - 📧 Email: lemma.lessa@aau.edu.et\n"
-            "  - 🔗 LinkedIn: https://www.linkedin.com/in/lemma-l-51504635/\n"
-            "- **Dr. Martha Yifiru**\n"
-            "  - 🏢 Room: Eshetu Chole 420\n"
-            "  - 📧 Email: martha.yifiru@aau.edu.et\n"
-            "  - 🔗 LinkedIn: https://www.linkedin.com/in/martha-yifiru-7b0b3b1b/\n"
-            "- **Ato Melaku Girma**\n"
-            "  - 🏢 Room: Eshetu Chole 224\n"
-            "  - 📧 Email: melaku.girma@aau.edu.et\n"
-            "  - 🔗 LinkedIn: https://www.linkedin.com/in/melaku-girma-23031432/\n"
-            "- **W/o Meseret Hailu**\n"
-            "  - 🏢 Room: Eshetu Chole 113\n"
-            "  - 📧 Email: meseret.hailu@aau.edu.et\n"
-            "- **Dr. Melekamu Beyene**\n"
-            "  - 🏢 Room: Eshetu Chole 423\n"
-            "  - 📧 Email: melekamu.beyene@aau.edu.et\n"
-            "  - 🔗 LinkedIn: https://www.linkedin.com/in/melkamu-beyene-6462a444/\n"
-            "- **Ato Miftah Hassen**\n"
-            "  - 🏢 Room: Eshetu Chole 424\n"
-            "  - 📧 Email: miftah.hassen@aau.edu.et\n"
-            "  - 🔗 LinkedIn: https://www.linkedin.com/in/miftah-hassen-18ab10107/\n"
-            "- **W/t Mihiret Tibebe**\n"
-            "  - 🏢 Room: Eshetu Chole 113\n"
-            "  - 📧 Email: mihiret.tibebe@aau.edu.et\n"
-            "  - 🔗 LinkedIn: https://www.linkedin.com/in/mihret-tibebe-0b0b3b1b/\n"
-            "- **Dr. Million Meshesha**\n"
-            "  - 🏢 Room: Eshetu Chole 418\n"
-            "  - 📧 Email: million.meshesha@aau.edu.et\n"
-            "- **Dr. Rahel Bekele**\n"
-            "  - 🏢 Room: Eshetu Chole 221\n"
-            "  - 📧 Email: rahel.bekele@aau.edu.et\n"
-            "- **Ato Selamawit Kassahun**\n"
-            "  - 🏢 Room: ---\n"
-            "  - 📧 Email: selamawit.kassahun@aau.edu.et\n"
-            "  - 🔗 LinkedIn: https://www.linkedin.com/in/selamawit-kassahun-93b9b6128/\n"
-            "- **Dr. Solomon Tefera**\n"
-            "  - 🏢 Room: Eshetu Chole 421\n"
-            "  - 📧 Email: solomon.tefera@aau.edu.et\n"
-            "  - 🔗 LinkedIn: https://www.linkedin.com/in/solomon-tefera-42a07871/\n"
-            "- **Dr. Temtem Assefa**\n"
-            "  - 🏢 Room: Eshetu Chole 622\n"
-            "  - 📧 Email: temtem.assefa@aau.edu.et\n"
-            "  - 🔗 LinkedIn: https://www.linkedin.com/in/temtim-assefa-61a15936/\n"
-            "- **Ato Teshome Alemu**\n"
-            "  - 🏢 Room: Eshetu Chole 224\n"
-            "  - 📧 Email: teshome.alemu@aau.edu.et\n"
-            "- **Dr. Wondwossen Mulugeta**\n"
-            "  - 🏢 Room: Eshetu Chole 114\n"
-            "  - 📧 Email: wondwossen.mulugeta@aau.edu.et\n"
-            "  - 🔗 LinkedIn: https://www.linkedin.com/in/wondisho/\n"
-            "- **Ato Wendwesen Endale**\n"
-            "  - 🏢 Room: Eshetu Chole 319\n"
-            "  - 📧 Email: wendwesen.endale@aau.edu.et\n"
-            "  - 🔗 LinkedIn: https://www.linkedin.com/in/wendwesenendale/\n"
-            "- **Dr. Workshet Lamenew**\n"
-            "  - 🏢 Room: Eshetu Chole 222\n"
-            "  - 📧 Email: workshet.lamenew@aau.edu.et\n"
-            "- **Ato Mengisti Berihu**\n"
-            "  - 🏢 Room: ---\n"
-            "  - 📧 Email: mengisti.berihu@aau.edu.et\n"
-            "  - 🔗 LinkedIn: https://www.linkedin.com/in/mengisti-berihu-5272b7126/\n"
-            "- **W/o Meseret Ayano**\n"
-            "  - 🏢 Room: ---\n"
-            "  - 📧 Email: meseret.ayano@aau.edu.et\n"
-            "  - 🔗 LinkedIn: https://www.linkedin.com/in/meseret-ayano-1b3383148/\n"
-            ""
-            "Conclude with: 'Please double-check with the IS Department Office for the latest updates.'\n\n"
-            "📣 Reminder: Always double-check with the department office for the latest updates! 🏢✅\n"
-            "🌈 Have an amazing day ahead! 💬🌟\n"
-            "Tone keywords: Intellectual, practical, empowering, structured, mentor-like."
-        ),
-        generation_config={
-            "temperature": 0.95,
-            "top_p": 0.85,
-            "max_output_tokens": int(os.getenv("GEMINI_MAX_TOKENS", "2048")),
-        }
+        system_instruction=SYSTEM_INSTRUCTION,
+        generation_config=GENERATION_CONFIG,
     )
 
 except Exception as e:
     print(f"[startup] Could not instantiate genai.GenerativeModel: {e}\n" + traceback.format_exc())
     gemini_model = None
 
+# Optional asyncio Gemini path: pooled connections, a per-request deadline, a concurrency
+# cap and hedged requests after the GEMINI_HEDGE_PERCENTILE latency (e.g. 95)
+GEMINI_ASYNC = os.getenv("GEMINI_ASYNC", "0") == "1"
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "30"))
+async_llm = None
+llm_loop = None
+if GEMINI_ASYNC:
+    async_llm = AsyncGeminiClient(
+        GEMINI_API_KEY,
+        MODEL_ID,
+        system_instruction=SYSTEM_INSTRUCTION,
+        generation_config=GENERATION_CONFIG,
+        base_url=os.getenv("GEMINI_API_BASE", GEMINI_API_BASE),
+        timeout=GEMINI_TIMEOUT,
+        max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "16")),
+        max_connections=int(os.getenv("GEMINI_MAX_CONNECTIONS", "32")),
+        hedge_percentile=float(os.getenv("GEMINI_HEDGE_PERCENTILE", "0")) or None,
+    )
+    llm_loop = BackgroundLoop()
+
 # --- Conversation context support ---
-CONVERSATIONS = {}
 MAX_CONTEXT_MESSAGES = int(os.getenv("MAX_CONTEXT_MESSAGES", "6"))
+# Bounded, expiring history per session (SESSION_BACKEND=sqlite shares it across workers)
+CONVERSATIONS = create_session_store(max_messages=MAX_CONTEXT_MESSAGES * 2)
+MAX_CLASSIFY_BATCH = int(os.getenv("MAX_CLASSIFY_BATCH", "1024"))
+GEMINI_ERROR_REPLY = "Sorry, there was a problem with the Gemini API. Please try again later."
+
+# Cache Gemini answers for context-independent questions (GEMINI_CACHE_DB enables on-disk persistence)
+GEMINI_CACHE_ENABLED = os.getenv("GEMINI_CACHE_ENABLED", "1") == "1"
+gemini_cache = None
+if GEMINI_CACHE_ENABLED:
+    try:
+        gemini_cache = ResponseCache(
+            max_entries=int(os.getenv("GEMINI_CACHE_SIZE", "1024")),
+            ttl_seconds=float(os.getenv("GEMINI_CACHE_TTL", "86400")),
+            db_path=os.getenv("GEMINI_CACHE_DB") or None,
+        )
+    except Exception as e:
+        print(f"[startup] Could not initialise Gemini response cache: {e}\n" + traceback.format_exc())
 
-# Check availability of the requested model at startup and cache available models
+# Near-duplicate (paraphrase) cache over Gemini answers; needs the classifier vocabulary
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "0") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "20000"))
+semantic_cache = None
+
+# Optional dynamic batching of concurrent classifier calls (useful with threaded gunicorn workers)
+CLASSIFIER_BATCHING = os.getenv("CLASSIFIER_BATCHING", "0") == "1"
+CLASSIFIER_BATCH_SIZE = int(os.getenv("CLASSIFIER_BATCH_SIZE", "32"))
+CLASSIFIER_BATCH_WINDOW_MS = float(os.getenv("CLASSIFIER_BATCH_WINDOW_MS", "2"))
+
+# Check availability of the requested model and cache available models
 available_model_ids = []
-try:
-    if hasattr(genai, "list_models"):
-        for m in genai.list_models():
-            try:
+
+def check_model_availability():
+    try:
+        if hasattr(genai, "list_models"):
+            for m in genai.list_models():
+                try:
+                    mid = getattr(m, 'name', None) or getattr(m, 'model', None) or str(m)
+                except Exception:
+                    mid = str(m)
+                available_model_ids.append(mid)
+        elif hasattr(genai, "get_models"):
+            for m in genai.get_models():
                 mid = getattr(m, 'name', None) or getattr(m, 'model', None) or str(m)
-            except Exception:
-                mid = str(m)
-            available_model_ids.append(mid)
-    elif hasattr(genai, "get_models"):
-        for m in genai.get_models():
-            mid = getattr(m, 'name', None) or getattr(m, 'model', None) or str(m)
-            available_model_ids.append(mid)
+                available_model_ids.append(mid)
+        else:
+            print("[startup] SDK does not expose list_models/get_models; cannot verify requested model availability.")
+    except Exception:
+        print("[startup] Error while listing models:\n" + traceback.format_exc())
+
+    if MODEL_ID in available_model_ids:
+        print(f"[startup] Requested model '{MODEL_ID}' is available to this API key.")
     else:
-        print("[startup] SDK does not expose list_models/get_models; cannot verify requested model availability.")
-except Exception:
-    print("[startup] Error while listing models:\n" + traceback.format_exc())
+        print(f"[startup] WARNING: Requested model '{MODEL_ID}' is NOT available to this API key.\n"
+              f"Available sample (first 20): {available_model_ids[:20]}")
 
-if MODEL_ID in available_model_ids:
-    print(f"[startup] Requested model '{MODEL_ID}' is available to this API key.")
+if STARTUP_MODE == "lazy":
+    # Listing models is a network round trip; don't block imports on it
+    threading.Thread(target=check_model_availability, name="gemini-model-check", daemon=True).start()
 else:
-    print(f"[startup] WARNING: Requested model '{MODEL_ID}' is NOT available to this API key.\n"
-          f"Available sample (first 20): {available_model_ids[:20]}")
+    check_model_availability()
 
-# Load intents
+# intents.json + change log shared by every worker; /add-intent appends to the log.
+# Other workers see additions within INTENTS_REFRESH_SECONDS.
+intent_store = IntentStore(
+    INTENTS_PATH,
+    compact_every=int(os.getenv("INTENTS_COMPACT_EVERY", "100")),
+    refresh_interval=float(os.getenv("INTENTS_REFRESH_SECONDS", "1")),
+)
+# Load intents into a pre-tokenized index; it is rebuilt only when the intents change
+intent_index = StoreIndexLoader(intent_store, tokenize)
 try:
-    with open(INTENTS_PATH, "r", encoding="utf-8") as f:
-        intents = json.load(f)
+    intents = intent_index.get().intents
 except Exception as e:
     raise Exception(f"Failed to load intents.json: {str(e)}")
 else:
@@ -465,181 +553,310 @@ else:
     except Exception:
         print("[startup] Loaded intents but failed to print tags")
 
-# Attempt to load a trained classifier saved as data.pth for local intent prediction
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "data.pth")
-model_data = None
-local_model = None
-model_all_words = None
+# Attempt to load a trained classifier saved as data.pth for local intent prediction.
+# CLASSIFIER_BACKEND=auto serves a torch-free export built from the current data.pth:
+# the memory-mapped artifact (data.bin, see model_artifact.py), else data.npz (see
+# export_model.py), and falls back to torch otherwise.
+MODEL_PATH = os.getenv("MODEL_PATH", os.path.join(os.path.dirname(__file__), "data.pth"))
+MODEL_NPZ_PATH = os.getenv("MODEL_NPZ_PATH", os.path.join(os.path.dirname(__file__), "data.npz"))
+MODEL_ARTIFACT_PATH = os.getenv("MODEL_ARTIFACT_PATH", os.path.join(os.path.dirname(__file__), "data.bin"))
+MODEL_ARTIFACT_VERIFY = os.getenv("MODEL_ARTIFACT_VERIFY", "1") == "1"
+CLASSIFIER_BACKEND = os.getenv("CLASSIFIER_BACKEND", "auto")
+local_classifier = None
+classifier_batcher = None
 model_tags = None
-if TORCH_AVAILABLE and os.path.exists(MODEL_PATH):
+model_encoder = None
+# (classifier, batcher) actually used for routing; replaced as one reference on hot swap
+serving_classifier = (None, None)
+classifier_loaded = False
+classifier_lock = threading.Lock()
+
+def select_classifier_backend():
+    """Resolve CLASSIFIER_BACKEND to "artifact", "numpy" or "torch"."""
+    if CLASSIFIER_BACKEND != "auto":
+        return CLASSIFIER_BACKEND
+    exports = (("artifact", MODEL_ARTIFACT_PATH, artifact_source_hash, "model_artifact.py"),
+               ("numpy", MODEL_NPZ_PATH, npz_source_hash, "export_model.py"))
+    for backend, path, source_hash, tool in exports:
+        if not os.path.exists(path):
+            continue
+        if not os.path.exists(MODEL_PATH):
+            return backend
+        try:
+            if source_hash(path) == file_sha256(MODEL_PATH):
+                return backend
+            print(f"[startup] {path} is stale (exported from a different data.pth); run {tool} to refresh it")
+        except Exception as e:
+            print(f"[startup] Could not read {path}: {e}")
+    return "torch"
+
+def classifier_loader(backend):
+    """(load function, path) for a backend, or (None, path) when torch is unavailable."""
+    if backend == "artifact":
+        return (lambda path: load_artifact(path, verify=MODEL_ARTIFACT_VERIFY)), MODEL_ARTIFACT_PATH
+    if backend == "numpy":
+        return load_numpy_classifier, MODEL_NPZ_PATH
+    # Try to import torch and local model utilities for a faster, offline fallback
     try:
-        model_data = torch.load(MODEL_PATH, map_location=torch.device('cpu'))
-        input_size = model_data.get('input_size')
-        hidden_size = model_data.get('hidden_size')
-        output_size = model_data.get('output_size')
-        model_all_words = model_data.get('all_words')
-        model_tags = model_data.get('tags')
-        local_model = NeuralNet(input_size, hidden_size, output_size)
-        local_model.load_state_dict(model_data.get('model_state'))
-        local_model.eval()
-        print(f"[startup] Loaded local model from {MODEL_PATH} with {len(model_tags)} tags")
-    except Exception as e:
-        print(f"[startup] Failed to load local model: {e}\n" + traceback.format_exc())
-else:
-    if TORCH_AVAILABLE:
-        print(f"[startup] No local model file at {MODEL_PATH}; skipping model-based intent classifier")
+        from classifier import load_local_classifier
+        return load_local_classifier, MODEL_PATH
+    except Exception:
+        print("[startup] PyTorch or model imports unavailable; model-based intent classifier disabled")
+        return None, MODEL_PATH
+
+def install_classifier(classifier):
+    """Serve `classifier` from now on.
+
+    Requests that already bound the previous classifier (see attach_classifier)
+    finish on it, so a swap never pairs a bag built with one vocabulary with a
+    model trained on another.
+    """
+    global serving_classifier, local_classifier, classifier_batcher, model_tags, model_encoder
+    batcher = None
+    if CLASSIFIER_BATCHING:
+        batcher = MicroBatcher(classifier.predict_proba, max_batch_size=CLASSIFIER_BATCH_SIZE,
+                               max_wait_ms=CLASSIFIER_BATCH_WINDOW_MS)
+    serving_classifier = (classifier, batcher)
+    local_classifier, classifier_batcher = classifier, batcher
+    model_tags = classifier.tags
+    model_encoder = classifier.encoder
+
+def ensure_local_classifier():
+    """Load the local classifier once (NumPy or torch backend); returns it or None."""
+    global semantic_cache, classifier_loaded
+    if classifier_loaded:
+        return local_classifier
+    with classifier_lock:
+        if classifier_loaded:
+            return local_classifier
+        backend = select_classifier_backend()
+        # A torch-free export that fails to load falls back to data.pth
+        for backend in dict.fromkeys([backend, "torch"]):
+            load_classifier, path = classifier_loader(backend)
+            if load_classifier is None:
+                break
+            if not os.path.exists(path):
+                print(f"[startup] No local model file at {path}; skipping model-based intent classifier")
+                continue
+            try:
+                install_classifier(load_classifier(path))
+            except Exception as e:
+                print(f"[startup] Failed to load local model from {path}: {e}\n" + traceback.format_exc())
+                continue
+            print(f"[startup] Loaded local model from {path} ({backend}) with {len(model_tags)} tags")
+            if SEMANTIC_CACHE_ENABLED:
+                semantic_cache = SemanticCache(model_encoder, threshold=SEMANTIC_CACHE_THRESHOLD,
+                                               max_entries=SEMANTIC_CACHE_SIZE)
+            if CLASSIFIER_BATCHING:
+                print(f"[startup] Classifier micro-batching enabled (size={CLASSIFIER_BATCH_SIZE}, "
+                      f"window={CLASSIFIER_BATCH_WINDOW_MS}ms)")
+            break
+        classifier_loaded = True
+    return local_classifier
+
+if STARTUP_MODE != "lazy":
+    ensure_local_classifier()
+
+def swap_retrained_model(model, all_words, tags, info):
+    """Hot-swap a fine-tuned NeuralNet in, on the same backend as the classifier it replaces."""
+    with classifier_lock:
+        if not classifier_loaded:
+            return  # nothing loaded yet (STARTUP_MODE=lazy); the first load reads the new files
+        if isinstance(local_classifier, NumpyClassifier):
+            from export_model import fold_neural_net
+            classifier = NumpyClassifier(fold_neural_net(model.state_dict()), all_words, tags)
+        else:
+            from classifier import LocalClassifier
+            classifier = LocalClassifier(model, all_words, tags)
+        install_classifier(classifier)
+    print(f"[retrain] now serving the fine-tuned model with {len(tags)} tags")
+
+# Fine-tune the classifier in a background thread after /add-intent (needs torch and data.pth).
+# Only the worker that handled the request hot-swaps the fine-tuned model; other gunicorn
+# workers keep classifying with the tags they loaded (new intents still match through the
+# shared intent store) until they restart and load the rewritten data.pth / data.bin.
+RETRAIN_ON_ADD_INTENT = os.getenv("RETRAIN_ON_ADD_INTENT", "1") == "1"
+trainer = None
+if RETRAIN_ON_ADD_INTENT:
+    trainer = IncrementalTrainer(
+        MODEL_PATH,
+        lambda: intent_index.get().intents,
+        swap_retrained_model,
+        npz_path=MODEL_NPZ_PATH,
+        artifact_path=MODEL_ARTIFACT_PATH,
+        epochs=int(os.getenv("RETRAIN_EPOCHS", "200")),
+    )
+
+def bag_classifier(classifier, batcher):
+    """Classify function bound to one classifier: bag vector or (indices, values) -> probabilities."""
+    def classify(bag):
+        if batcher is not None:
+            return batcher.classify(bag)
+        if isinstance(bag, tuple):
+            return classifier.classify_sparse(*bag)
+        return classifier.classify_bag(bag)
+    return classify
 
-def reload_intents():
-    global intents
-    with open(INTENTS_PATH, "r", encoding="utf-8") as f:
-        intents = json.load(f)
+def classify_batch(messages, top_k=3):
+    """Classify many messages with one forward pass of the local model.
+
+    Returns a list of {"message", "tag", "probability", "alternatives"} dicts,
+    or None when the local classifier is unavailable.
+    """
+    if ensure_local_classifier() is None:
+        return None
+    classifier, _ = serving_classifier
+    results = classifier.classify_batch([tokenize(m) for m in messages], top_k=top_k)
+    for msg, result in zip(messages, results):
+        result["message"] = msg
+    return results
+
+def attach_classifier(analysis):
+    """Bind an analysis to the classifier served right now, for the rest of its request.
+
+    Sparse bags need the NumPy backend; the micro-batcher stacks dense vectors."""
+    classifier, batcher = serving_classifier
+    if classifier is not None:
+        analysis.attach_classifier(classifier.encoder, bag_classifier(classifier, batcher), classifier.tags,
+                                   sparse_bag=batcher is None and hasattr(classifier, "classify_sparse"))
+    return analysis
+
+def analyze_message(msg):
+    """Build the request-scoped AnalyzedMessage shared by every routing stage."""
+    return attach_classifier(AnalyzedMessage(msg, tokenize))
+
+def remember_turn(session_id, msg, reply):
+    """Append a user/assistant exchange to the session's conversation history."""
+    if not session_id:
+        return
+    CONVERSATIONS.append(session_id, [("user", msg), ("assistant", reply)])
+
+# Routing metrics, exposed at /metrics in the Prometheus text format (per process)
+METRICS = Registry()
+STAGE_LATENCY = METRICS.histogram("chatbot_stage_latency_seconds",
+                                  "Time spent in each routing stage of one message", ("stage",))
+ANSWERED_BY = METRICS.counter("chatbot_answers_total", "Messages answered, by the stage that answered",
+                              ("answered_by",))
+GEMINI_ERRORS = METRICS.counter("chatbot_gemini_errors_total", "Failed Gemini calls, by reason", ("reason",))
+
+def log_timings(analysis, answered_by):
+    """Record the stage timings and answering stage of one routed message."""
+    for stage, seconds in analysis.timings.items():
+        STAGE_LATENCY.observe(seconds, stage)
+    ANSWERED_BY.inc(answered_by)
+    if route_log.isEnabledFor(logging.INFO):
+        route_log.info("answered_by=%s timings_ms=%s", answered_by, analysis.timings_ms())
 
 # Simple rule-based intent matching
 # ...existing code...
 
-def get_intent_response(msg, threshold=0.25):  # Lowered threshold so intents can match more reliably
-    tokens = tokenize(msg)
-    reload_intents()
-    best_score = 0
-    best_response = None
-    for intent in intents["intents"]:
-        if intent.get("tag") == "default":
-            continue
-        for pattern in intent.get("patterns", []):
-            pattern_tokens = tokenize(pattern)
-            # Debug each pattern tokenization and any non-zero score
-            if not pattern_tokens:
-                print(f"[intent-debug] intent='{intent.get('tag')}' pattern='{pattern}' -> pattern_tokens is empty")
-            else:
-                print(f"[intent-debug] intent='{intent.get('tag')}' pattern='{pattern}' -> pattern_tokens={pattern_tokens}")
-            # Calculate Jaccard similarity for better matching
-            intersection = set(tokens) & set(pattern_tokens)
-            union = set(tokens) | set(pattern_tokens)
-            score = len(intersection) / max(len(union), 1)
-            if score > 0:
-                print(f"[intent-score] intent='{intent.get('tag')}' pattern='{pattern}' score={score} intersection={intersection} union={union}")
-            if score > best_score:
-                best_score = score
-                if intent.get("responses"):
-                    best_response = random.choice(intent["responses"])
-    # Debug/logging: show best score so it's easier to tune the threshold
-    print(f"[intent] msg='{msg}' tokens={tokens} best_score={best_score} threshold={threshold}")
-    if best_score >= threshold:
-        return best_response
+def get_intent_response(msg, threshold=0.25, analysis=None):  # Lowered threshold so intents can match more reliably
+    analysis = analysis or analyze_message(msg)
+    tokens = analysis.tokens
+
+    def log_score(tag, pattern, score, intersection, union):
+        trace_log.debug("intent-score intent='%s' pattern='%s' score=%s intersection=%s union=%s",
+                        tag, pattern, score, intersection, union)
+
+    with analysis.stage("intent_match"):
+        # Only patterns sharing a stem with the message are scored (see IntentIndex.match);
+        # per-pattern scores are only reported for traced requests
+        best_score, best_responses = intent_index.get().match(
+            tokens, on_score=log_score if tracing() else None)
+    # Show the best score so it's easier to tune the threshold
+    intent_log.info("msg='%s' tokens=%s best_score=%s threshold=%s", msg, tokens, best_score, threshold)
+    if best_score >= threshold and best_responses:
+        return random.choice(best_responses)
     # If no intent matches, always fallback to Gemini (never return None)
     return None
 
 
-def predict_model_response(msg, threshold=0.6):
+def predict_model_response(msg, threshold=0.6, analysis=None):
     """Predict intent using the local PyTorch model if available.
     Returns a response string when confident, otherwise None.
     """
-    if not TORCH_AVAILABLE or local_model is None or not model_all_words or not model_tags:
+    analysis = analysis or analyze_message(msg)
+    if analysis.classifier is None and ensure_local_classifier() is not None:
+        # Loaded lazily after this message was analyzed (STARTUP_MODE=lazy)
+        attach_classifier(analysis)
+    if not analysis.can_classify:
         return None
     try:
-        toks = tokenize(msg)
-        X = bag_of_words(toks, model_all_words)
-        X_tensor = torch.from_numpy(X).unsqueeze(0)
-        with torch.no_grad():
-            outputs = local_model(X_tensor.float())
-            probs = torch.softmax(outputs, dim=1)
-            top_prob, top_index = torch.max(probs, dim=1)
-            prob = float(top_prob.item())
-            idx = int(top_index.item())
-            tag = model_tags[idx]
-            print(f"[model] predicted tag={tag} prob={prob}")
-            if prob >= threshold:
-                # find intent responses for this tag
-                for intent in intents.get('intents', []):
-                    if intent.get('tag') == tag and intent.get('responses'):
-                        return random.choice(intent['responses'])
+        tag, prob = analysis.prediction
+        model_log.info("predicted tag=%s prob=%s", tag, prob)
+        if prob >= threshold:
+            # find intent responses for this tag
+            responses = intent_index.get().responses_for(tag)
+            if responses:
+                return random.choice(responses)
     except Exception as e:
-        print(f"[model] prediction error: {e}\n" + traceback.format_exc())
+        model_log.exception("prediction error: %s", e)
     return None
 
 # ...rest of your code remains unchanged...
 
-def route_question(msg, session_id=None):
-
-    # 1. Try rule-based intent matching
-    response = get_intent_response(msg)
-    if response:
-        return response
-
-    # 2. Try local model classifier (department knowledge)
-    model_resp = None
-    model_confidence = 0.0
-    if TORCH_AVAILABLE and local_model is not None and model_all_words and model_tags:
-        try:
-            toks = tokenize(msg)
-            X = bag_of_words(toks, model_all_words)
-            X_tensor = torch.from_numpy(X).unsqueeze(0)
-            with torch.no_grad():
-                outputs = local_model(X_tensor.float())
-                probs = torch.softmax(outputs, dim=1)
-                top_prob, top_index = torch.max(probs, dim=1)
-                model_confidence = float(top_prob.item())
-                idx = int(top_index.item())
-                tag = model_tags[idx]
-                print(f"[model] predicted tag={tag} prob={model_confidence}")
-                if model_confidence >= 0.65:  # Only answer if confidence is high
-                    for intent in intents.get('intents', []):
-                        if intent.get('tag') == tag and intent.get('responses'):
-                            model_resp = random.choice(intent['responses'])
-        except Exception as e:
-            print(f"[model] prediction error: {e}\n" + traceback.format_exc())
-
-    if model_resp:
-        return model_resp
+def extract_text_from_result(result):
+    try:
+        if result is None:
+            return None
+        if isinstance(result, str):
+            return result
+        if hasattr(result, "text") and result.text:
+            return result.text
+        if hasattr(result, "output"):
+            out = result.output
+            if isinstance(out, list) and len(out) > 0:
+                first = out[0]
+                if isinstance(first, dict) and "content" in first:
+                    return first["content"]
+                if hasattr(first, "content"):
+                    return first.content
+        if hasattr(result, "candidates") and result.candidates:
+            first = result.candidates[0]
+            if hasattr(first, "text") and first.text:
+                return first.text
+            if hasattr(first, "content") and first.content:
+                return first.content
+        if isinstance(result, dict):
+            for k in ("text", "output_text", "content"):
+                if k in result and result[k]:
+                    return result[k]
+            if "candidates" in result and isinstance(result["candidates"], list) and result["candidates"]:
+                c0 = result["candidates"][0]
+                if isinstance(c0, dict) and "text" in c0:
+                    return c0["text"]
+        return str(result)
+    except Exception:
+        print("[gemini] error extracting text from result:\n" + traceback.format_exc())
+        return None
 
-    # 3. Fallback to Gemini for all other questions
-    # Build context for Gemini: if no session context, use plain string for max compatibility
-    ctx_msgs = []
-    use_context = False
-    if session_id:
-        history = CONVERSATIONS.get(session_id, [])[-MAX_CONTEXT_MESSAGES:]
-        if history:
-            for role, text in history:
-                ctx_msgs.append({"role": role, "content": text})
-            use_context = True
-    if use_context:
-        ctx_msgs.append({"role": "user", "content": msg})
-    else:
-        ctx_msgs = msg  # plain string for Gemini if no context
+async def call_gemini_async(ctx_msgs):
+    """call_gemini through the pooled asyncio client (GEMINI_ASYNC=1), on the caller's event loop."""
+    try:
+        text = await async_llm.generate(ctx_msgs)
+        gemini_log.info("call attempts: ['async_llm.generate']")
+    except LLMError as e:
+        GEMINI_ERRORS.inc("llm_error")
+        gemini_log.warning("async generate failed: %r", e)
+        return None
+    except Exception as e:
+        # e.g. a 200 reply whose body is not JSON; answer with the error reply, not a 500
+        GEMINI_ERRORS.inc("exception")
+        gemini_log.error("async generate failed: %r", e, exc_info=True)
+        return None
+    if not text:
+        GEMINI_ERRORS.inc("empty_reply")
+    return text
 
-    def extract_text_from_result(result):
+def call_gemini(ctx_msgs, msg):
+    """Ask Gemini for a reply to ctx_msgs (history list or plain string); returns text or None."""
+    if async_llm is not None:
+        # Pooled asyncio client with a hard deadline (and optional hedging) instead of serial retries
         try:
-            if result is None:
-                return None
-            if isinstance(result, str):
-                return result
-            if hasattr(result, "text") and result.text:
-                return result.text
-            if hasattr(result, "output"):
-                out = result.output
-                if isinstance(out, list) and len(out) > 0:
-                    first = out[0]
-                    if isinstance(first, dict) and "content" in first:
-                        return first["content"]
-                    if hasattr(first, "content"):
-                        return first.content
-            if hasattr(result, "candidates") and result.candidates:
-                first = result.candidates[0]
-                if hasattr(first, "text") and first.text:
-                    return first.text
-                if hasattr(first, "content") and first.content:
-                    return first.content
-            if isinstance(result, dict):
-                for k in ("text", "output_text", "content"):
-                    if k in result and result[k]:
-                        return result[k]
-                if "candidates" in result and isinstance(result["candidates"], list) and result["candidates"]:
-                    c0 = result["candidates"][0]
-                    if isinstance(c0, dict) and "text" in c0:
-                        return c0["text"]
-            return str(result)
-        except Exception:
-            print("[gemini] error extracting text from result:\n" + traceback.format_exc())
+            return llm_loop.run(call_gemini_async(ctx_msgs), timeout=GEMINI_TIMEOUT + 1)
+        except concurrent.futures.TimeoutError as e:
+            GEMINI_ERRORS.inc("timeout")
+            gemini_log.warning("async generate failed: %r", e)
             return None
 
     call_attempts = []
@@ -650,39 +867,168 @@ def route_question(msg, session_id=None):
             res = gemini_model.generate_content(ctx_msgs)
             call_attempts.append("gemini_model.generate_content")
         else:
-            res = genai.generate(model=MODEL_ID, input=ctx_msgs, generation_config={
-                "temperature": 0.95,
-                "top_p": 0.85,
-                "max_output_tokens": int(os.getenv("GEMINI_MAX_TOKENS", "2048")),
-            })
+            res = genai.generate(model=MODEL_ID, input=ctx_msgs, generation_config=GENERATION_CONFIG)
             call_attempts.append("genai.generate")
     except Exception as e1:
-        print('[gemini] context call failed, trying plain string fallback:\n' + traceback.format_exc())
+        GEMINI_ERRORS.inc("context_call")
+        gemini_log.warning("context call failed, trying plain string fallback", exc_info=True)
         try:
             if gemini_model is not None:
                 res = gemini_model.generate_content(msg)
                 call_attempts.append("gemini_model.generate_content (plain string)")
             else:
-                res = genai.generate(model=MODEL_ID, input=msg, generation_config={
-                    "temperature": 0.95,
-                    "top_p": 0.85,
-                    "max_output_tokens": int(os.getenv("GEMINI_MAX_TOKENS", "2048")),
-                })
+                res = genai.generate(model=MODEL_ID, input=msg, generation_config=GENERATION_CONFIG)
                 call_attempts.append("genai.generate (plain string)")
         except Exception as e2:
-            print('[gemini] all generate fallbacks failed:\n' + traceback.format_exc())
-    print('[gemini] call attempts:', call_attempts)
+            GEMINI_ERRORS.inc("exception")
+            gemini_log.error("all generate fallbacks failed", exc_info=True)
+    gemini_log.info("call attempts: %s", call_attempts)
     text = extract_text_from_result(res)
-    # Always return Gemini's output, even if it's empty or short
+    if call_attempts and not text:
+        GEMINI_ERRORS.inc("empty_reply")
+    return text
+
+def answer_locally(msg, analysis):
+    """Stages 1-2: rule-based intents, then the local classifier. Returns (reply, stage) or (None, None)."""
+    # 1. Try rule-based intent matching
+    response = get_intent_response(msg, analysis=analysis)
+    if response:
+        return response, "intent"
+
+    # 2. Try local model classifier (department knowledge); only answer if confidence is high
+    model_resp = predict_model_response(msg, threshold=0.65, analysis=analysis)
+    if model_resp:
+        return model_resp, "model"
+    return None, None
+
+def build_gemini_context(msg, session_id):
+    """Return (ctx_msgs, use_context) for the Gemini call."""
+    # Build context for Gemini: if no session context, use plain string for max compatibility
+    ctx_msgs = []
+    use_context = False
     if session_id:
-        CONVERSATIONS.setdefault(session_id, []).append(("user", msg))
-        CONVERSATIONS.setdefault(session_id, []).append(("assistant", text if text is not None else ""))
-        if len(CONVERSATIONS[session_id]) > MAX_CONTEXT_MESSAGES * 2:
-            CONVERSATIONS[session_id] = CONVERSATIONS[session_id][-MAX_CONTEXT_MESSAGES * 2:]
+        history = CONVERSATIONS.history(session_id, MAX_CONTEXT_MESSAGES)
+        if history:
+            for role, text in history:
+                ctx_msgs.append({"role": role, "content": text})
+            use_context = True
+    if use_context:
+        ctx_msgs.append({"role": "user", "content": msg})
+    else:
+        ctx_msgs = msg  # plain string for Gemini if no context
+    return ctx_msgs, use_context
+
+def cached_gemini_answer(analysis, use_context):
+    """Look up a previous Gemini answer for context-independent questions. Returns (reply, stage) or (None, None)."""
+    if use_context or not analysis.tokens:
+        return None, None
+    # Exact cache keyed on the normalized, stemmed tokens of the message
+    if gemini_cache is not None:
+        cached = gemini_cache.get(" ".join(analysis.tokens))
+        if cached is not None:
+            return cached, "gemini_cache"
+    # Paraphrases of previously answered questions can reuse their answer too
+    if semantic_cache is not None:
+        with analysis.stage("semantic_cache"):
+            cached, similarity = semantic_cache.lookup(analysis.tokens)
+        if cached is not None:
+            cache_log.info("hit similarity=%.3f", similarity)
+            return cached, "semantic_cache"
+    return None, None
+
+def store_gemini_answer(msg, session_id, analysis, use_context, text):
+    """Record a Gemini reply in the session history and, when context-independent, the answer caches."""
+    # Always return Gemini's output, even if it's empty or short
+    with analysis.stage("session_update"):
+        remember_turn(session_id, msg, text if text is not None else "")
+    if text and not use_context and analysis.tokens:
+        if gemini_cache is not None:
+            gemini_cache.put(" ".join(analysis.tokens), text)
+        if semantic_cache is not None:
+            semantic_cache.add(analysis.tokens, text)
+
+def route_question(msg, session_id=None):
+    # Tokens, bag vector and model probabilities are computed at most once per request
+    analysis = analyze_message(msg)
+
+    response, stage = answer_locally(msg, analysis)
+    if response:
+        log_timings(analysis, stage)
+        return response
+
+    # 3. Fallback to Gemini for all other questions
+    ctx_msgs, use_context = build_gemini_context(msg, session_id)
+    cached, stage = cached_gemini_answer(analysis, use_context)
+    if cached is not None:
+        with analysis.stage("session_update"):
+            remember_turn(session_id, msg, cached)
+        log_timings(analysis, stage)
+        return cached
+
+    with analysis.stage("gemini"):
+        text = call_gemini(ctx_msgs, msg)
+    store_gemini_answer(msg, session_id, analysis, use_context, text)
+    log_timings(analysis, "gemini")
     if text is not None:
         return text
     # Only show error if Gemini API fails completely
-    return "Sorry, there was a problem with the Gemini API. Please try again later."
+    return GEMINI_ERROR_REPLY
+
+def stream_gemini(ctx_msgs, msg):
+    """Yield Gemini reply text chunks as the model produces them."""
+    if async_llm is not None:
+        yield from llm_loop.iterate(async_llm.stream(ctx_msgs), timeout=GEMINI_TIMEOUT + 1)
+        return
+    if gemini_model is None:
+        text = call_gemini(ctx_msgs, msg)
+        if text:
+            yield text
+        return
+    for chunk in gemini_model.generate_content(ctx_msgs, stream=True):
+        text = extract_text_from_result(chunk)
+        if text:
+            yield text
+
+def route_question_stream(msg, session_id=None):
+    """Like route_question, but yields (event, payload) pairs: "chunk" events while
+    Gemini streams, then one "done" event carrying the full reply. Local and cached
+    answers arrive as a single "done" event."""
+    analysis = analyze_message(msg)
+    response, stage = answer_locally(msg, analysis)
+    if not response:
+        ctx_msgs, use_context = build_gemini_context(msg, session_id)
+        response, stage = cached_gemini_answer(analysis, use_context)
+        if response is not None:
+            with analysis.stage("session_update"):
+                remember_turn(session_id, msg, response)
+    if response:
+        log_timings(analysis, stage)
+        yield "done", {"bot_reply": response, "answered_by": stage}
+        return
+
+    parts = []
+    failed = False
+    with analysis.stage("gemini"):
+        try:
+            for text in stream_gemini(ctx_msgs, msg):
+                parts.append(text)
+                yield "chunk", {"text": text}
+        except Exception as e:
+            failed = True
+            GEMINI_ERRORS.inc("stream")
+            gemini_log.error("streaming failed: %r", e, exc_info=True)
+    text = "".join(parts) if parts else None
+    store_gemini_answer(msg, session_id, analysis, use_context, None if failed else text)
+    log_timings(analysis, "gemini")
+    if failed:
+        yield "error", {"error": GEMINI_ERROR_REPLY, "partial_reply": text or ""}
+    else:
+        yield "done", {"bot_reply": text if text is not None else GEMINI_ERROR_REPLY, "answered_by": "gemini"}
+
+def trace_requested(headers=None):
+    """Whether the client asked for a diagnostic trace of this request (see LOG_TRACE_HEADER)."""
+    headers = request.headers if headers is None else headers
+    return bool(LOG_TRACE_HEADER) and headers.get(LOG_TRACE_HEADER, "").lower() in ("1", "true", "yes")
 
 @app.route("/message", methods=["POST"])
 
@@ -694,14 +1040,58 @@ def message():
     if not content:
         return jsonify({"error": "Message content is required"}), 400
     if session_id and clear_history:
-        CONVERSATIONS.pop(session_id, None)
+        CONVERSATIONS.clear(session_id)
     try:
-        bot_reply = route_question(content, session_id=session_id)
+        with trace(trace_requested()):
+            bot_reply = route_question(content, session_id=session_id)
         return jsonify({"bot_reply": bot_reply})
     except Exception as e:
         print(f"Error in /message endpoint: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/message/stream", methods=["POST"])
+def message_stream():
+    """Server-Sent Events variant of /message for lower time-to-first-byte on Gemini answers."""
+    data = request.get_json()
+    content = data.get("content")
+    session_id = data.get("session_id")
+    clear_history = data.get("clear_history", False)
+    if not content:
+        return jsonify({"error": "Message content is required"}), 400
+    if session_id and clear_history:
+        CONVERSATIONS.clear(session_id)
+
+    traced = trace_requested()
+
+    def events():
+        try:
+            with trace(traced):
+                for event, payload in route_question_stream(content, session_id=session_id):
+                    yield f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            print(f"Error in /message/stream endpoint: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def add_new_intent(tag, patterns, responses):
+    """Store a new intent and queue the classifier fine-tune; returns the /add-intent reply."""
+    # Append the new intent to the intent store's change log
+    intent_store.add_intent({
+        "tag": tag,
+        "patterns": patterns,
+        "responses": responses
+    })
+    # The current model keeps serving until the fine-tuned one is swapped in
+    reason = trainer.unavailable_reason() if trainer is not None else "RETRAIN_ON_ADD_INTENT is off"
+    if reason is None:
+        trainer.request(tag, patterns)
+    reply = {"success": True, "message": f"Intent '{tag}' added successfully.", "retraining": reason is None}
+    if reason is not None:
+        reply["retraining_skipped"] = reason
+    return reply
+
 # ...existing code...
 @app.route("/add-intent", methods=["POST"])
 def add_intent():
@@ -711,22 +1101,71 @@ def add_intent():
     responses = data.get("responses", [])
     if not tag or not patterns or not responses:
         return jsonify({"error": "Tag, patterns, and responses are required"}), 400
-    # Add new intent to intents.json
-    reload_intents()
-    intents["intents"].append({
-        "tag": tag,
-        "patterns": patterns,
-        "responses": responses
-    })
-    with open(INTENTS_PATH, "w", encoding="utf-8") as f:
-        json.dump(intents, f, ensure_ascii=False, indent=4)
-    return jsonify({"success": True, "message": f"Intent '{tag}' added successfully."})
+    return jsonify(add_new_intent(tag, patterns, responses))
+
+@app.route("/retrain-status", methods=["GET"])
+def retrain_status():
+    if trainer is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **trainer.stats()})
+
+@app.route("/classify-batch", methods=["POST"])
+def classify_batch_route():
+    data = request.get_json()
+    messages = data.get("messages")
+    top_k = data.get("top_k", 3)
+    if not isinstance(messages, list) or not all(isinstance(m, str) for m in messages):
+        return jsonify({"error": "messages must be a list of strings"}), 400
+    if len(messages) > MAX_CLASSIFY_BATCH:
+        return jsonify({"error": f"At most {MAX_CLASSIFY_BATCH} messages per batch"}), 400
+    if not isinstance(top_k, int) or isinstance(top_k, bool) or top_k < 1:
+        return jsonify({"error": "top_k must be a positive integer"}), 400
+    results = classify_batch(messages, top_k=top_k)
+    if results is None:
+        return jsonify({"error": "Local classifier is not available"}), 503
+    return jsonify({"results": results})
+
+@app.route("/batcher-stats", methods=["GET"])
+def batcher_stats():
+    if classifier_batcher is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **classifier_batcher.stats()})
+
+@app.route("/cache-stats", methods=["GET"])
+def cache_stats():
+    stats = {"enabled": gemini_cache is not None}
+    if gemini_cache is not None:
+        stats.update(gemini_cache.stats())
+    if semantic_cache is not None:
+        stats["semantic"] = semantic_cache.stats()
+    stats["tokenize"] = tokenize_cache_info()
+    return jsonify(stats)
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(METRICS.render(), mimetype="text/plain; version=0.0.4")
 
 # Health check route for root
 @app.route("/", methods=["GET"])
 def health():
     return "Backend is running!", 200
 
+def create_app():
+    """WSGI factory used by gunicorn.conf.py.
+
+    Builds the intent index, loads the local classifier and runs one message
+    through tokenize/bag/classify, so nothing is left to build on the first
+    request. With preload_app this happens once in the gunicorn master and the
+    forked workers share the result copy-on-write (and the data.bin mapping).
+    The micro-batcher thread is left to start in each worker.
+    """
+    index = intent_index.get()
+    if index.patterns:
+        classify_batch([index.patterns[0][1]])  # also loads the classifier
+    else:
+        ensure_local_classifier()
+    return app
+
 # Start server
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8080))
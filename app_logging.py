@@ -0,0 +1,154 @@
+import atexit
+import contextvars
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from contextlib import contextmanager
+
+ROOT_LOGGER = "chatbot"
+TRACE_CATEGORY = "trace"
+
+_trace_enabled = contextvars.ContextVar("log_trace_enabled", default=False)
+_pipeline = None
+
+
+def get_logger(category):
+    """Logger for one category (e.g. "intent", "gemini"); records print as "[category] message"."""
+    return logging.getLogger(f"{ROOT_LOGGER}.{category}")
+
+
+def tracing():
+    """True while the current request asked for a diagnostic trace."""
+    return _trace_enabled.get()
+
+
+@contextmanager
+def trace(enabled=True):
+    """Enable trace logging (and bypass sampling) for the code run inside the block."""
+    token = _trace_enabled.set(bool(enabled))
+    try:
+        yield
+    finally:
+        _trace_enabled.reset(token)
+
+
+def parse_mapping(spec, convert=str):
+    """Parse "intent=0.1,route=0.5" into {"intent": convert("0.1"), ...}."""
+    mapping = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            key, value = item.split("=", 1)
+            mapping[key.strip()] = convert(value.strip())
+    return mapping
+
+
+class SamplingFilter(logging.Filter):
+    """Keep roughly `rate` of a category's records below WARNING; warnings, errors and traced requests always pass."""
+
+    def __init__(self, rate, rng=random.random):
+        super().__init__()
+        self.rate = rate
+        self.rng = rng
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or tracing() or self.rng() < self.rate
+
+
+class CategoryFormatter(logging.Formatter):
+    """Format records as "[category] message", matching the app's existing print output."""
+
+    def format(self, record):
+        category = record.name[len(ROOT_LOGGER) + 1:] or ROOT_LOGGER
+        text = f"[{category}] {record.getMessage()}"
+        if record.exc_info:
+            text += "\n" + self.formatException(record.exc_info)
+        return text
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """Request threads only format and enqueue records; one listener thread writes them out."""
+
+    def __init__(self, stream=None, queue_size=10000):
+        self.stream = stream or sys.stdout
+        self.queue_size = queue_size
+        self.handler = DroppingQueueHandler(queue.Queue(queue_size))
+        self.handler.setFormatter(CategoryFormatter())
+        self.listener = None
+        self._start_listener()
+
+    def _start_listener(self):
+        output = logging.StreamHandler(self.stream)
+        # Records arrive already formatted by DroppingQueueHandler.prepare
+        output.setFormatter(logging.Formatter("%(message)s"))
+        self.listener = logging.handlers.QueueListener(self.handler.queue, output)
+        self.listener.start()
+
+    def after_fork(self):
+        if self.listener is None:
+            return  # stopped, e.g. replaced by a later configure_logging()
+        # The listener thread does not survive fork(); the old queue's lock may be held
+        self.handler.queue = queue.Queue(self.queue_size)
+        self._start_listener()
+
+    def stop(self):
+        """Flush queued records and stop the listener thread."""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def stats(self):
+        return {"queued": self.handler.queue.qsize(), "dropped": self.handler.dropped}
+
+
+def configure_logging(level="INFO", category_levels=None, sample_rates=None, queue_size=10000, stream=None):
+    """Route every chatbot.* logger through a non-blocking queue; returns the LogPipeline.
+
+    level is the default threshold, category_levels overrides it per category
+    ({"gemini": "DEBUG"}) and sample_rates keeps a fraction of each category's
+    records below WARNING ({"route": 0.1}). The trace category is never
+    sampled and is enabled by trace() regardless of level.
+    """
+    global _pipeline
+    root = logging.getLogger(ROOT_LOGGER)
+    if _pipeline is not None:
+        root.removeHandler(_pipeline.handler)
+        _pipeline.stop()
+    pipeline = _pipeline = LogPipeline(stream=stream, queue_size=queue_size)
+    root.addHandler(pipeline.handler)
+    root.setLevel(level)
+    root.propagate = False
+
+    # Forget levels and sampling from a previous configuration
+    for name, existing in list(logging.Logger.manager.loggerDict.items()):
+        if name.startswith(ROOT_LOGGER + ".") and isinstance(existing, logging.Logger):
+            existing.setLevel(logging.NOTSET)
+            for old_filter in [f for f in existing.filters if isinstance(f, SamplingFilter)]:
+                existing.removeFilter(old_filter)
+
+    for category, category_level in (category_levels or {}).items():
+        get_logger(category).setLevel(category_level)
+    get_logger(TRACE_CATEGORY).setLevel(logging.DEBUG)
+    for category, rate in (sample_rates or {}).items():
+        if category != TRACE_CATEGORY and rate < 1.0:
+            get_logger(category).addFilter(SamplingFilter(rate))
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=pipeline.after_fork)
+    atexit.register(pipeline.stop)
+    return pipeline
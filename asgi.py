@@ -0,0 +1,146 @@
+"""ASGI entry point serving /message, /add-intent and / with async handlers.
+
+    GEMINI_ASYNC=1 GEMINI_MAX_CONCURRENCY=2048 GEMINI_MAX_CONNECTIONS=2048 \\
+        uvicorn asgi:app --host 0.0.0.0 --port 8080 --backlog 4096 --timeout-keep-alive 60
+
+The Flask app holds a worker thread for a whole request, Gemini wait
+included, so gunicorn caps in-flight conversations at workers x threads.
+Here a request waiting on Gemini is a suspended coroutine. The local stages
+(tokenize, intent match, classifier, session and cache bookkeeping) run on a
+bounded thread pool (ASGI_CPU_THREADS), and the Gemini call is awaited on the
+event loop through app.py's pooled AsyncGeminiClient. One process can hold
+thousands of conversations. GEMINI_MAX_CONCURRENCY limits how many of them
+call Gemini at the same time.
+
+Routing, caches, sessions, metrics and logging all come from app.py.
+Importing this module imports app.py and warms it (create_app). Without
+GEMINI_ASYNC=1 the blocking Gemini SDK runs on the thread pool instead, so
+concurrent Gemini calls are capped at the pool size. benchmarks/asgi_load.py
+compares this entry point with the gunicorn setup.
+"""
+import asyncio
+import contextlib
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+import app as chatbot
+from app_logging import trace
+
+CPU_THREADS = int(os.getenv("ASGI_CPU_THREADS", "4"))
+cpu_pool = ThreadPoolExecutor(max_workers=CPU_THREADS, thread_name_prefix="asgi-cpu")
+
+chatbot.create_app()
+
+
+async def offload(fn, *args):
+    """Run fn(*args) on the CPU pool, in the request's context (e.g. its trace flag)."""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(cpu_pool, functools.partial(context.run, fn, *args))
+
+
+def answer_without_gemini(msg, session_id, analysis):
+    """The part of app.route_question before the Gemini call, as one pool job.
+
+    Returns (reply, stage, ctx_msgs, use_context); reply is None when Gemini has to answer.
+    """
+    response, stage = chatbot.answer_locally(msg, analysis)
+    if response:
+        return response, stage, None, False
+    ctx_msgs, use_context = chatbot.build_gemini_context(msg, session_id)
+    cached, stage = chatbot.cached_gemini_answer(analysis, use_context)
+    if cached is not None:
+        with analysis.stage("session_update"):
+            chatbot.remember_turn(session_id, msg, cached)
+    return cached, stage, ctx_msgs, use_context
+
+
+async def route_question(msg, session_id=None):
+    """app.route_question, awaiting Gemini instead of blocking a thread on it."""
+    analysis = chatbot.analyze_message(msg)
+    response, stage, ctx_msgs, use_context = await offload(answer_without_gemini, msg, session_id, analysis)
+    if response is not None:
+        chatbot.log_timings(analysis, stage)
+        return response
+
+    with analysis.stage("gemini"):
+        if chatbot.async_llm is not None:
+            text = await chatbot.call_gemini_async(ctx_msgs)
+        else:
+            text = await offload(chatbot.call_gemini, ctx_msgs, msg)
+    await offload(chatbot.store_gemini_answer, msg, session_id, analysis, use_context, text)
+    chatbot.log_timings(analysis, "gemini")
+    if text is not None:
+        return text
+    return chatbot.GEMINI_ERROR_REPLY
+
+
+async def read_json(request):
+    """The request body as a dict, or None when it is not a JSON object."""
+    try:
+        data = await request.json()
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+async def message(request):
+    data = await read_json(request)
+    if data is None:
+        return JSONResponse({"error": "Request body must be a JSON object"}, status_code=400)
+    content = data.get("content")
+    session_id = data.get("session_id")
+    clear_history = data.get("clear_history", False)
+    if not content:
+        return JSONResponse({"error": "Message content is required"}, status_code=400)
+    try:
+        if session_id and clear_history:
+            await offload(chatbot.CONVERSATIONS.clear, session_id)
+        with trace(chatbot.trace_requested(request.headers)):
+            bot_reply = await route_question(content, session_id=session_id)
+        return JSONResponse({"bot_reply": bot_reply})
+    except Exception as e:
+        print(f"Error in /message endpoint: {str(e)}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def add_intent(request):
+    data = await read_json(request)
+    if data is None:
+        return JSONResponse({"error": "Request body must be a JSON object"}, status_code=400)
+    tag = data.get("tag")
+    patterns = data.get("patterns", [])
+    responses = data.get("responses", [])
+    if not tag or not patterns or not responses:
+        return JSONResponse({"error": "Tag, patterns, and responses are required"}, status_code=400)
+    return JSONResponse(await offload(chatbot.add_new_intent, tag, patterns, responses))
+
+
+async def health(request):
+    return PlainTextResponse("Backend is running!")
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    yield
+    if chatbot.async_llm is not None:
+        await chatbot.async_llm.aclose()
+    cpu_pool.shutdown(wait=False)
+
+
+app = Starlette(
+    routes=[
+        Route("/message", message, methods=["POST"]),
+        Route("/add-intent", add_intent, methods=["POST"]),
+        Route("/", health, methods=["GET"]),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])],
+    lifespan=lifespan,
+)
@@ -0,0 +1,99 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from metrics import Histogram
+
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-vector classifier calls into batched forward passes.
+
+    Callers block in classify() while a background thread collects requests
+    that arrive within max_wait_ms of the first one (or until max_batch_size
+    is reached), runs predict_fn once on the stacked matrix and hands each
+    caller its own row.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=2.0):
+        self.predict_fn = predict_fn  # callable: (n, vocab) matrix -> (n, classes) probabilities
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.latency = Histogram()  # seconds from submit to result, per request
+        self.batches = 0
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so (re)start lazily in each worker process
+        if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+                return
+            self._queue = queue.Queue()
+            self._worker = threading.Thread(target=self._run, name="classifier-batcher", daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def submit(self, bag):
+        """Queue one bag-of-words vector and return a Future for its probabilities."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((np.asarray(bag, dtype=np.float32), future, time.perf_counter()))
+        return future
+
+    def classify(self, bag, timeout=None):
+        """Blocking single-vector classification through the batcher."""
+        return self.submit(bag).result(timeout=timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                probs, error = self.predict_fn(np.stack([bag for bag, _, _ in batch])), None
+            except Exception as e:
+                probs, error = None, e
+            # Record metrics before waking callers so stats() is never behind results
+            done = time.perf_counter()
+            self.batches += 1
+            self.batch_sizes.observe(len(batch))
+            for _, _, submitted in batch:
+                self.latency.observe(done - submitted)
+            for i, (_, future, _) in enumerate(batch):
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(probs[i])
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize(),
+            "batches": self.batches,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batch_size": self.batch_sizes.snapshot(),
+            "latency_seconds": self.latency.snapshot(),
+        }
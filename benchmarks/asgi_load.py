@@ -0,0 +1,206 @@
+"""Concurrent conversations: the ASGI entry point (asgi.py under uvicorn) vs the gunicorn setup.
+
+    python -m benchmarks.asgi_load --concurrency 32 256 2048 --stub-latency 2 --output asgi.json
+
+Both servers run as subprocesses against one stubbed Gemini
+(benchmarks.stub_gemini) with the same settings: GEMINI_ASYNC=1, caches off,
+in-memory sessions and GEMINI_MAX_CONCURRENCY/CONNECTIONS high enough for
+the largest level.
+
+- gunicorn: this repo's gunicorn.conf.py (Flask app, preloaded) with
+  --gunicorn-workers x --gunicorn-threads request slots.
+- asgi: one uvicorn process serving asgi:app.
+
+An asyncio client keeps N conversations open, each with its own session id.
+Every conversation sends its next question as soon as the previous reply
+arrives, for --duration seconds per level. --llm-fraction of the questions
+are out of domain, so they wait --stub-latency seconds on the stub like a
+real Gemini call. The rest are answered locally.
+
+Reported per server and level: replies/s, latency p50/p95/p99, errors
+(refused, timed out or non-200), the most Gemini calls the stub saw in flight
+at once, and the server's total PSS sampled mid-level. Prints a table, then
+the full JSON report.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.corpus import ROOT, build_corpus
+from benchmarks.gunicorn_workers import GunicornServer, free_port, memory_kb
+from benchmarks.routing_load import percentiles
+from benchmarks.stub_gemini import StubGeminiServer
+from llm_client import POOL_SHARD_SIZE
+
+
+class UvicornServer:
+    """uvicorn serving asgi:app in a subprocess."""
+
+    def __init__(self, env, port, backlog=4096):
+        self.port = port
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "asgi:app", "--host", "127.0.0.1", "--port", str(port),
+             "--backlog", str(backlog), "--timeout-keep-alive", "60", "--no-access-log", "--log-level", "warning"],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def worker_pids(self):
+        return []
+
+    def stop(self):
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+
+
+def wait_healthy(url, proc, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode}")
+        try:
+            if httpx.get(url + "/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become healthy within {timeout}s")
+
+
+def server_pss_mb(server):
+    pids = [server.proc.pid] + server.worker_pids()
+    return sum(memory_kb(pid)["pss_kb"] for pid in pids) / 1024
+
+
+async def drive(url, corpus, concurrency, duration, timeout, on_midpoint):
+    """Keep `concurrency` conversations busy for `duration` seconds."""
+    latencies, errors = [], {}
+    loop = asyncio.get_running_loop()
+    # One small pool per POOL_SHARD_SIZE conversations; a single large httpx pool would
+    # make the client, not the server, the bottleneck (see llm_client.POOL_SHARD_SIZE)
+    limits = httpx.Limits(max_connections=POOL_SHARD_SIZE, max_keepalive_connections=POOL_SHARD_SIZE)
+    ssl_context = httpx.create_ssl_context()
+    async with contextlib.AsyncExitStack() as stack:
+        clients = [await stack.enter_async_context(httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits,
+                                                                     verify=ssl_context))
+                   for _ in range(-(-concurrency // POOL_SHARD_SIZE))]
+        stop_at = loop.time() + duration
+
+        async def conversation(user):
+            client = clients[user % len(clients)]
+            i = user
+            while loop.time() < stop_at:
+                question = corpus[i % len(corpus)]["content"]
+                i += concurrency
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/message", json={"content": question, "session_id": f"conv-{user}"})
+                except httpx.HTTPError as e:
+                    errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                    continue
+                if response.status_code != 200:
+                    errors[f"HTTP {response.status_code}"] = errors.get(f"HTTP {response.status_code}", 0) + 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        async def midpoint():
+            await asyncio.sleep(duration / 2)
+            return on_midpoint()
+
+        start = time.perf_counter()
+        results = await asyncio.gather(midpoint(), *(conversation(user) for user in range(concurrency)))
+        wall = time.perf_counter() - start
+    return {"concurrency": concurrency, "replies": len(latencies), "errors": errors, "wall_s": wall,
+            "replies_per_s": len(latencies) / wall, "latency": percentiles(latencies),
+            "server_pss_mb": results[0]}
+
+
+def run_server(name, args, env, corpus, stub):
+    port = free_port()
+    if name == "gunicorn":
+        server = GunicornServer(dict(env, GUNICORN_WORKERS=str(args.gunicorn_workers),
+                                     GUNICORN_THREADS=str(args.gunicorn_threads)), port)
+    else:
+        server = UvicornServer(dict(env, ASGI_CPU_THREADS=str(args.asgi_cpu_threads)), port)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        if name == "gunicorn":
+            server.wait_ready(args.gunicorn_workers, args.boot_timeout)
+        wait_healthy(url, server.proc, args.boot_timeout)
+        levels = []
+        for concurrency in args.concurrency:
+            print(f"[asgi-load] {name}: {concurrency} conversations ...", file=sys.stderr)
+            stub.max_in_flight = stub.in_flight
+            level = asyncio.run(drive(url, corpus, concurrency, args.duration, args.timeout,
+                                      lambda: server_pss_mb(server)))
+            level["gemini_max_in_flight"] = stub.max_in_flight
+            levels.append(level)
+        return levels
+    finally:
+        server.stop()
+
+
+def print_table(report):
+    columns = ["server", "convs", "replies/s", "p50_ms", "p95_ms", "p99_ms", "errors", "llm_inflight", "pss_mb"]
+    print("  ".join(f"{name:>12}" for name in columns))
+    for name, levels in report["servers"].items():
+        for level in levels:
+            latency = level["latency"]
+            cells = [name, level["concurrency"], level["replies_per_s"], latency.get("p50_ms"),
+                     latency.get("p95_ms"), latency.get("p99_ms"), sum(level["errors"].values()),
+                     level["gemini_max_in_flight"], level["server_pss_mb"]]
+            print("  ".join(f"{'-':>12}" if c is None else f"{c:>12.1f}" if isinstance(c, float) else f"{c:>12}"
+                            for c in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ASGI vs gunicorn under many concurrent conversations")
+    parser.add_argument("--servers", nargs="+", default=["gunicorn", "asgi"], choices=["gunicorn", "asgi"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[32, 256, 2048],
+                        help="open conversations per level")
+    parser.add_argument("--duration", type=float, default=20, help="seconds per level")
+    parser.add_argument("--stub-latency", type=float, default=2.0, help="seconds per stubbed Gemini call")
+    parser.add_argument("--llm-fraction", type=float, default=0.5, help="share of out-of-domain questions")
+    parser.add_argument("--questions", type=int, default=2000)
+    parser.add_argument("--timeout", type=float, default=120, help="client timeout per request")
+    parser.add_argument("--gunicorn-workers", type=int, default=4)
+    parser.add_argument("--gunicorn-threads", type=int, default=8)
+    parser.add_argument("--asgi-cpu-threads", type=int, default=4)
+    parser.add_argument("--boot-timeout", type=float, default=300)
+    parser.add_argument("--output", help="write the JSON report here as well as stdout")
+    args = parser.parse_args()
+
+    corpus = build_corpus(os.path.join(ROOT, "intents.json"), args.questions, out_of_domain_fraction=args.llm_fraction)
+    report = {"stub_latency_s": args.stub_latency, "llm_fraction": args.llm_fraction, "duration_s": args.duration,
+              "gunicorn": {"workers": args.gunicorn_workers, "threads": args.gunicorn_threads},
+              "asgi": {"cpu_threads": args.asgi_cpu_threads}, "servers": {}}
+    max_in_flight = str(max(args.concurrency))
+    with StubGeminiServer(latency=args.stub_latency) as stub:
+        env = dict(os.environ, STARTUP_MODE="lazy", GEMINI_ASYNC="1", GEMINI_API_BASE=stub.base_url,
+                   GEMINI_MAX_CONCURRENCY=max_in_flight, GEMINI_MAX_CONNECTIONS=max_in_flight,
+                   GEMINI_TIMEOUT=str(args.timeout), GEMINI_CACHE_ENABLED="0", SEMANTIC_CACHE_ENABLED="0",
+                   SESSION_BACKEND="memory", RETRAIN_ON_ADD_INTENT="0", LOG_LEVEL="WARNING", PYTHONPATH=ROOT)
+        env.setdefault("GEMINI_API_KEY", "benchmark")
+        for name in args.servers:
+            report["servers"][name] = run_server(name, args, env, corpus, stub)
+        report["stub_requests"] = len(stub.requests)
+
+    print_table(report)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Cold-start benchmark: time to import app and to answer the first requests.
+
+Each STARTUP_MODE is measured in a fresh interpreter so nothing is warm:
+
+    python -m benchmarks.cold_start --modes eager lazy --runs 3
+
+Reported per mode (seconds, median over runs): import of app.py, first
+intent-matched /message, first /message that misses the intents and so runs
+the local classifier (then the stubbed Gemini fallback),
+and whether torch had been imported before the classifier request.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from benchmarks.stub_gemini import StubGeminiServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+t = time.perf_counter()
+response = client.post("/message", json={"content": sys.argv[1], "session_id": "cold-start"})
+assert response.status_code == 200, response.get_data(as_text=True)
+intent_hit = time.perf_counter() - t
+torch_before_classifier = "torch" in sys.modules
+t = time.perf_counter()
+response = client.post("/message", json={"content": sys.argv[2], "session_id": "cold-start"})
+assert response.status_code == 200, response.get_data(as_text=True)
+classifier_request = time.perf_counter() - t
+print("RESULT " + json.dumps({
+    "import_s": imported - start,
+    "first_intent_hit_s": intent_hit,
+    "first_classifier_request_s": classifier_request,
+    "torch_imported_before_classifier": torch_before_classifier,
+}))
+"""
+
+
+def run_once(mode, intent_message, classifier_message, gemini_base):
+    # Questions that fall through to Gemini are answered by the local stub, not the real API
+    env = dict(os.environ, STARTUP_MODE=mode, GEMINI_ASYNC="1", GEMINI_API_BASE=gemini_base,
+               GEMINI_CACHE_DB="", SESSION_BACKEND="memory")
+    env.setdefault("GEMINI_API_KEY", "benchmark")
+    proc = subprocess.run([sys.executable, "-c", CHILD, intent_message, classifier_message],
+                          cwd=ROOT, env=env, capture_output=True, text=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    raise RuntimeError(f"{mode} run failed:\n{proc.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure app import and first-response latency")
+    parser.add_argument("--modes", nargs="+", default=["eager", "lazy"])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--intent-message", default="hello")
+    parser.add_argument("--classifier-message", default="what are the library opening hours please")
+    args = parser.parse_args()
+
+    report = {}
+    with StubGeminiServer() as stub:
+        results = {mode: [run_once(mode, args.intent_message, args.classifier_message, stub.base_url)
+                          for _ in range(args.runs)] for mode in args.modes}
+    for mode, runs in results.items():
+        report[mode] = {key: statistics.median(run[key] for run in runs)
+                        for key in ("import_s", "first_intent_hit_s", "first_classifier_request_s")}
+        report[mode]["torch_imported_before_classifier"] = any(
+            run["torch_imported_before_classifier"] for run in runs)
+        report[mode]["runs"] = args.runs
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
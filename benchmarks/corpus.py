@@ -0,0 +1,94 @@
+"""Build a JSONL question corpus for replay benchmarks.
+
+    python -m benchmarks.corpus --size 2000 --output questions.jsonl
+
+Every line is a /message request body plus bookkeeping fields:
+{"content": "...", "tag": "<intent tag or null>", "kind": "pattern" | "perturbed" | "out_of_domain"}.
+Questions are intents.json patterns, verbatim or lightly perturbed (a word
+dropped, a filler added, case or punctuation changed, or two letters
+swapped), plus a share of out-of-domain questions that no intent covers and
+so exercise the Gemini fallback.
+"""
+import argparse
+import json
+import os
+import random
+
+from intent_store import IntentStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FILLERS = ["please", "hey", "can you tell me", "i want to know", "quick question:"]
+OUT_OF_DOMAIN_TEMPLATES = ["what is {}", "explain {} in simple terms", "give me a short history of {}",
+                           "how does {} work", "write a haiku about {}", "why do people care about {}"]
+OUT_OF_DOMAIN_TOPICS = ["quantum gravity", "photosynthesis", "the french revolution", "black holes",
+                        "sourdough baking", "plate tectonics", "jazz harmony", "the stock market",
+                        "volcanoes", "origami", "the roman empire", "coral reefs", "chess openings"]
+
+
+def perturb(pattern, rng):
+    words = pattern.split()
+    choice = rng.random()
+    if choice < 0.25 and len(words) > 2:
+        words.pop(rng.randrange(len(words)))
+    elif choice < 0.5:
+        words.insert(0, rng.choice(FILLERS))
+    elif choice < 0.75:
+        words = [w.upper() if rng.random() < 0.3 else w for w in words]
+    elif words:
+        i = rng.randrange(len(words))
+        word = words[i]
+        if len(word) > 3:
+            j = rng.randrange(len(word) - 1)
+            words[i] = word[:j] + word[j + 1] + word[j] + word[j + 2:]  # typo: swap two letters
+    return " ".join(words) + rng.choice(["", "?", "!", "."])
+
+
+def build_corpus(intents_path, size, seed=42, verbatim_fraction=0.25, out_of_domain_fraction=0.15):
+    rng = random.Random(seed)
+    intents = IntentStore(intents_path).snapshot()["intents"]
+    pool = [(p, i["tag"]) for i in intents if i["tag"] != "default" for p in i.get("patterns", [])]
+    corpus = []
+    for _ in range(size):
+        roll = rng.random()
+        if roll < out_of_domain_fraction:
+            question = rng.choice(OUT_OF_DOMAIN_TEMPLATES).format(rng.choice(OUT_OF_DOMAIN_TOPICS))
+            corpus.append({"content": question, "tag": None, "kind": "out_of_domain"})
+            continue
+        pattern, tag = rng.choice(pool)
+        if roll < out_of_domain_fraction + verbatim_fraction:
+            corpus.append({"content": pattern, "tag": tag, "kind": "pattern"})
+        else:
+            corpus.append({"content": perturb(pattern, rng), "tag": tag, "kind": "perturbed"})
+    return corpus
+
+
+def write_corpus(corpus, path):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in corpus:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def load_corpus(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a JSONL question corpus from intents.json")
+    parser.add_argument("--intents", default=os.path.join(ROOT, "intents.json"))
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--verbatim-fraction", type=float, default=0.25)
+    parser.add_argument("--out-of-domain-fraction", type=float, default=0.15)
+    parser.add_argument("--output", default="questions.jsonl")
+    args = parser.parse_args()
+    corpus = build_corpus(args.intents, args.size, args.seed, args.verbatim_fraction, args.out_of_domain_fraction)
+    write_corpus(corpus, args.output)
+    kinds = {}
+    for record in corpus:
+        kinds[record["kind"]] = kinds.get(record["kind"], 0) + 1
+    print(json.dumps({"output": args.output, "questions": len(corpus), "kinds": kinds}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""How startup, routing latency, memory and training scale with the intent corpus.
+
+    python -m benchmarks.corpus_scaling --sizes 40:200 1000:10000 10000:100000 --output scaling.json
+
+For every INTENTS:PATTERNS point a synthetic corpus is generated (see
+benchmarks.synthetic_intents) and then:
+
+1. train.py --mode vectorized runs on it in a fresh process, with wall-clock
+   time and peak RSS recorded. train.py builds a dense patterns x vocabulary
+   matrix, so points above --train-max-cells are not trained. They are served
+   by an untrained model of the same shape, which costs the same per message.
+2. A fresh process imports app.py on the corpus (INTENTS_PATH/MODEL_PATH, NumPy
+   backend, stubbed Gemini). It reports startup, intents.json load and
+   inverted-index build times (rebuilt with cold tokenize caches), classifier
+   load time and peak RSS. It then routes --questions questions built from the
+   corpus (see benchmarks.corpus) and records per-stage and end-to-end p50/p95/p99.
+
+Prints a table, then the full JSON report.
+"""
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import ROOT, build_corpus, write_corpus
+from benchmarks.stub_gemini import StubGeminiServer
+from benchmarks.synthetic_intents import generate_intents
+
+SERVE_CHILD = r"""
+import json, resource, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.ensure_local_classifier()
+startup = time.perf_counter() - start
+classifier_load_s = startup - (imported - start)
+import nltk_utils
+from intent_index import IntentIndex
+from intent_store import IntentStore
+t = time.perf_counter()
+snapshot = IntentStore(app.INTENTS_PATH).snapshot()
+load_s = time.perf_counter() - t
+nltk_utils.clear_tokenize_cache()
+t = time.perf_counter()
+index = IntentIndex(snapshot, nltk_utils.tokenize)
+index_build_s = time.perf_counter() - t
+rss_after_startup = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+from benchmarks.routing_load import StageRecorder, percentiles
+with open(sys.argv[1], encoding="utf-8") as f:
+    questions = [json.loads(line)["content"] for line in f]
+recorder = StageRecorder(app)
+latencies = []
+for question in questions:
+    t = time.perf_counter()
+    app.route_question(question)
+    latencies.append(time.perf_counter() - t)
+stages, answered_by = recorder.take()
+print("RESULT " + json.dumps({
+    "import_s": imported - start, "startup_s": startup, "classifier_load_s": classifier_load_s,
+    "intents_load_s": load_s,
+    "index_build_s": index_build_s, "indexed_patterns": len(index.patterns),
+    "vocabulary": len(app.local_classifier.all_words) if app.local_classifier else 0, "backend": type(app.local_classifier).__name__,
+    "rss_after_startup_mb": rss_after_startup,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "route": percentiles(latencies), "stages": stages, "answered_by": answered_by,
+}))
+"""
+
+
+def run_child(cmd, cwd, env):
+    """Run cmd; returns (returncode, stdout, stderr, wall seconds, peak RSS in MB of that child alone)."""
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        start = time.perf_counter()
+        proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=out, stderr=err)
+        _, status, usage = os.wait4(proc.pid, 0)
+        seconds = time.perf_counter() - start
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        out.seek(0)
+        err.seek(0)
+        return (proc.returncode, out.read().decode("utf-8", "replace"), err.read().decode("utf-8", "replace"),
+                seconds, usage.ru_maxrss / 1024)
+
+
+def write_untrained_model(intents_path, workdir):
+    """data.pth/data.npz with the shape train.py would produce, without building the dense matrix."""
+    import train
+    from export_model import export_npz
+    from intent_store import IntentStore
+    from model import NeuralNet
+
+    intents = IntentStore(intents_path).snapshot()
+    all_words = train.vocabulary(train.tokenize_patterns(intents))
+    tags = sorted(set(intent["tag"] for intent in intents["intents"]))
+    train.set_seed()
+    model = NeuralNet(len(all_words), 8, len(tags))
+    model.eval()
+    pth = os.path.join(workdir, "data.pth")
+    train.save_model(model, pth, len(all_words), 8, len(tags), all_words, tags)
+    export_npz(pth, os.path.join(workdir, "data.npz"))
+    return len(all_words)
+
+
+def run_point(num_intents, num_patterns, args, env):
+    workdir = tempfile.mkdtemp(prefix=f"scaling-{num_intents}-{num_patterns}-")
+    intents_path = os.path.join(workdir, "intents.json")
+    t = time.perf_counter()
+    corpus = generate_intents(num_intents, num_patterns, seed=args.seed)
+    with open(intents_path, "w", encoding="utf-8") as f:
+        json.dump(corpus, f)
+    result = {"intents": num_intents, "patterns": num_patterns, "generate_s": time.perf_counter() - t,
+              "intents_json_mb": os.path.getsize(intents_path) / 2 ** 20}
+
+    # Vocabulary size decides whether train.py's dense matrix fits; estimate it from the words used
+    words = {w.lower().strip("?") for i in corpus["intents"] for p in i["patterns"] for w in p.split()}
+    result["train_cells"] = num_patterns * len(words)
+    if result["train_cells"] <= args.train_max_cells:
+        code, out, err, seconds, rss = run_child(
+            [sys.executable, os.path.join(ROOT, "train.py"), "--mode", "vectorized", "--epochs", str(args.train_epochs),
+             "--batch-size", str(args.train_batch_size), "--patience", str(args.train_epochs)], workdir, env)
+        if code != 0:
+            raise RuntimeError(f"train.py failed at {num_intents}:{num_patterns}:\n{err[-2000:]}")
+        result["train"] = {"wall_s": seconds, "epochs": args.train_epochs, "peak_rss_mb": rss}
+    else:
+        with contextlib.redirect_stdout(sys.stderr):  # keep stdout for the report
+            write_untrained_model(intents_path, workdir)
+        result["train"] = {"skipped": f"{result['train_cells']:.3g} matrix cells > --train-max-cells"}
+
+    questions_path = os.path.join(workdir, "questions.jsonl")
+    write_corpus(build_corpus(intents_path, args.questions, seed=args.seed), questions_path)
+    serve_env = dict(env, INTENTS_PATH=intents_path, MODEL_PATH=os.path.join(workdir, "data.pth"),
+                     MODEL_NPZ_PATH=os.path.join(workdir, "data.npz"))
+    code, out, err, seconds, _ = run_child([sys.executable, "-c", SERVE_CHILD, questions_path], ROOT, serve_env)
+    for line in out.splitlines():
+        if line.startswith("RESULT "):
+            result.update(json.loads(line[len("RESULT "):]))
+            break
+    else:
+        raise RuntimeError(f"serving run failed at {num_intents}:{num_patterns}:\n{err[-2000:]}")
+    if not args.keep:
+        for name in os.listdir(workdir):
+            os.remove(os.path.join(workdir, name))
+        os.rmdir(workdir)
+    return result
+
+
+def print_table(results):
+    def stage(row, name, key="p50_ms"):
+        return row["stages"].get(name, {}).get(key)
+
+    columns = [
+        ("intents", lambda r: r["intents"]), ("patterns", lambda r: r["patterns"]),
+        ("vocab", lambda r: r["vocabulary"]), ("startup_s", lambda r: r["startup_s"]),
+        ("index_s", lambda r: r["index_build_s"]), ("tok_p50ms", lambda r: stage(r, "tokenize")),
+        ("match_p50ms", lambda r: stage(r, "intent_match")), ("match_p99ms", lambda r: stage(r, "intent_match", "p99_ms")),
+        ("clf_p50ms", lambda r: stage(r, "classify")), ("route_p50ms", lambda r: r["route"]["p50_ms"]),
+        ("route_p99ms", lambda r: r["route"]["p99_ms"]), ("rss_mb", lambda r: r["peak_rss_mb"]),
+        ("train_s", lambda r: r["train"].get("wall_s")), ("train_rss_mb", lambda r: r["train"].get("peak_rss_mb")),
+    ]
+    print("  ".join(f"{name:>12}" for name, _ in columns))
+    for row in results:
+        cells = []
+        for _, get in columns:
+            value = get(row)
+            cells.append(f"{'-':>12}" if value is None else f"{value:>12.3f}" if isinstance(value, float)
+                         else f"{value:>12}")
+        print("  ".join(cells))
+
+
+def parse_size(text):
+    intents, patterns = text.split(":")
+    return int(intents), int(patterns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep intent-corpus size and measure every hot path")
+    parser.add_argument("--sizes", type=parse_size, nargs="+",
+                        default=[parse_size(s) for s in ("40:200", "200:1000", "1000:5000", "2500:25000",
+                                                         "5000:50000", "10000:100000")],
+                        help="INTENTS:PATTERNS points")
+    parser.add_argument("--questions", type=int, default=300, help="routed questions per point")
+    parser.add_argument("--train-epochs", type=int, default=20)
+    parser.add_argument("--train-batch-size", type=int, default=32)
+    parser.add_argument("--train-max-cells", type=float, default=5e7,
+                        help="skip train.py when patterns x vocabulary exceeds this (float32 cells)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="keep the generated corpora and models")
+    parser.add_argument("--output", help="write the JSON report here as well as stdout")
+    args = parser.parse_args()
+
+    results = []
+    with StubGeminiServer() as stub:
+        env = dict(os.environ, STARTUP_MODE="lazy", GEMINI_ASYNC="1", GEMINI_API_BASE=stub.base_url,
+                   GEMINI_CACHE_ENABLED="0", SEMANTIC_CACHE_ENABLED="0", SESSION_BACKEND="memory",
+                   RETRAIN_ON_ADD_INTENT="0", CLASSIFIER_BACKEND="numpy", LOG_LEVEL="WARNING",
+                   PYTHONPATH=ROOT)
+        env.setdefault("GEMINI_API_KEY", "benchmark")
+        for num_intents, num_patterns in args.sizes:
+            print(f"[scaling] {num_intents} intents / {num_patterns} patterns ...", file=sys.stderr)
+            results.append(run_point(num_intents, num_patterns, args, env))
+
+    print_table(results)
+    text = json.dumps({"questions_per_point": args.questions, "train_epochs": args.train_epochs,
+                       "results": results}, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""Per-worker memory and worker spawn time under gunicorn, with and without preload_app.
+
+    python -m benchmarks.gunicorn_workers --workers 4 --output workers.json
+    python -m benchmarks.gunicorn_workers --backends torch --size 10000:100000
+
+Every mode x classifier-backend combination starts gunicorn with this repo's
+gunicorn.conf.py (GUNICORN_PRELOAD=0 or 1) against a stubbed Gemini, then:
+
+1. Boot: time from launch until the first and until all --workers workers
+   are ready (post_worker_init, after create_app() has warmed the app).
+2. Traffic: --requests questions from benchmarks.corpus over HTTP, so workers
+   touch their structures the way real traffic does before memory is read.
+3. Memory, from /proc/<pid>/smaps_rollup, for the master and each worker:
+   RSS, PSS (shared pages split between the processes mapping them) and
+   USS (private pages). USS is what one more worker costs, and total PSS is
+   the real footprint of the whole server.
+4. Respawn: SIGKILL one worker --respawns times and time until its
+   replacement is ready, which is what a crash or max_requests costs.
+
+--size INTENTS:PATTERNS serves a synthetic corpus (see
+benchmarks.synthetic_intents) with an untrained model of the right shape, to
+see how the shared index and weights scale. Linux only (smaps_rollup, fork).
+Prints a table, then the full JSON report.
+"""
+import argparse
+import contextlib
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.corpus import ROOT, build_corpus
+from benchmarks.routing_load import make_sender, run_load
+from benchmarks.stub_gemini import StubGeminiServer
+
+READY_PREFIX = "[gunicorn] worker "
+
+
+def memory_kb(pid):
+    """RSS, PSS and USS (private clean + dirty) of one process, in KiB."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {"rss_kb": fields["Rss"], "pss_kb": fields["Pss"],
+            "uss_kb": fields["Private_Clean"] + fields["Private_Dirty"]}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class GunicornServer:
+    """A gunicorn master in a subprocess; records when each worker reports ready."""
+
+    def __init__(self, env, port):
+        self.port = port
+        self.ready = []  # (monotonic time, worker pid)
+        self.output = []
+        self._changed = threading.Condition()
+        self.started_at = time.perf_counter()
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py")],
+            cwd=ROOT, env=dict(env, GUNICORN_BIND=f"127.0.0.1:{port}"),
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        for line in self.proc.stdout:
+            now = time.perf_counter()
+            with self._changed:
+                self.output.append(line.rstrip())
+                if line.startswith(READY_PREFIX):
+                    self.ready.append((now, int(line[len(READY_PREFIX):].split()[0])))
+                self._changed.notify_all()
+
+    def wait_ready(self, count, timeout):
+        """Block until `count` workers in total have reported ready."""
+        deadline = time.perf_counter() + timeout
+        with self._changed:
+            while len(self.ready) < count:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0 or self.proc.poll() is not None:
+                    raise RuntimeError("gunicorn workers did not start:\n" + "\n".join(self.output[-40:]))
+                self._changed.wait(min(remaining, 0.5))
+            return self.ready[count - 1][0]
+
+    def worker_pids(self):
+        with open(f"/proc/{self.proc.pid}/task/{self.proc.pid}/children") as f:
+            return [int(pid) for pid in f.read().split()]
+
+    def stop(self):
+        self.proc.send_signal(signal.SIGTERM)
+        try:
+            self.proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+
+
+def run_mode(preload, backend, corpus, args, env):
+    env = dict(env, GUNICORN_PRELOAD="1" if preload else "0", CLASSIFIER_BACKEND=backend)
+    server = GunicornServer(env, free_port())
+    try:
+        first = server.wait_ready(1, args.boot_timeout)
+        last = server.wait_ready(args.workers, args.boot_timeout)
+        result = {"preload": preload, "backend": backend,
+                  "boot": {"first_worker_ready_s": first - server.started_at,
+                           "all_workers_ready_s": last - server.started_at}}
+
+        send = make_sender("http", url=f"http://127.0.0.1:{server.port}")
+        load = run_load(send, corpus, args.workers * args.threads, args.requests)
+        if load["errors"]:
+            raise RuntimeError(f"requests failed: {load['first_error']}")
+        result["load"] = {"requests_per_s": load["requests_per_s"], "latency": load["latency"]}
+
+        workers = [memory_kb(pid) for pid in server.worker_pids()]
+        master = memory_kb(server.proc.pid)
+        result["memory"] = {
+            "master": master, "workers": workers,
+            "worker_rss_mb": np.mean([w["rss_kb"] for w in workers]) / 1024,
+            "worker_pss_mb": np.mean([w["pss_kb"] for w in workers]) / 1024,
+            "worker_uss_mb": np.mean([w["uss_kb"] for w in workers]) / 1024,
+            "total_pss_mb": (master["pss_kb"] + sum(w["pss_kb"] for w in workers)) / 1024,
+        }
+
+        respawns = []
+        for _ in range(args.respawns):
+            seen = len(server.ready)
+            victim = server.worker_pids()[0]
+            killed_at = time.perf_counter()
+            os.kill(victim, signal.SIGKILL)
+            respawns.append(server.wait_ready(seen + 1, args.boot_timeout) - killed_at)
+        if respawns:
+            result["respawn_s"] = {"median": float(np.median(respawns)), "max": max(respawns)}
+        return result
+    finally:
+        server.stop()
+
+
+def corpus_env(size, workdir):
+    """Synthetic intents.json plus an untrained model of matching shape (all three formats)."""
+    from benchmarks.corpus_scaling import write_untrained_model
+    from benchmarks.synthetic_intents import generate_intents
+    from model_artifact import export_artifact
+
+    num_intents, num_patterns = size
+    intents_path = os.path.join(workdir, "intents.json")
+    with open(intents_path, "w", encoding="utf-8") as f:
+        json.dump(generate_intents(num_intents, num_patterns), f)
+    with contextlib.redirect_stdout(sys.stderr):  # keep stdout for the report
+        write_untrained_model(intents_path, workdir)
+        export_artifact(os.path.join(workdir, "data.pth"), os.path.join(workdir, "data.bin"))
+    return intents_path, {"INTENTS_PATH": intents_path, "MODEL_PATH": os.path.join(workdir, "data.pth"),
+                          "MODEL_NPZ_PATH": os.path.join(workdir, "data.npz"),
+                          "MODEL_ARTIFACT_PATH": os.path.join(workdir, "data.bin")}
+
+
+def print_table(results):
+    columns = [
+        ("preload", lambda r: "yes" if r["preload"] else "no"), ("backend", lambda r: r["backend"]),
+        ("boot_all_s", lambda r: r["boot"]["all_workers_ready_s"]),
+        ("respawn_s", lambda r: r.get("respawn_s", {}).get("median")),
+        ("worker_rss", lambda r: r["memory"]["worker_rss_mb"]), ("worker_pss", lambda r: r["memory"]["worker_pss_mb"]),
+        ("worker_uss", lambda r: r["memory"]["worker_uss_mb"]),
+        ("master_pss", lambda r: r["memory"]["master"]["pss_kb"] / 1024),
+        ("total_pss", lambda r: r["memory"]["total_pss_mb"]), ("req_per_s", lambda r: r["load"]["requests_per_s"]),
+    ]
+    print("  ".join(f"{name:>11}" for name, _ in columns))
+    for row in results:
+        cells = []
+        for _, get in columns:
+            value = get(row)
+            cells.append(f"{'-':>11}" if value is None else f"{value:>11.3f}" if isinstance(value, float)
+                         else f"{value:>11}")
+        print("  ".join(cells))
+
+
+def parse_size(text):
+    intents, patterns = text.split(":")
+    return int(intents), int(patterns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="gunicorn per-worker memory and spawn time, preload vs not")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=2)
+    parser.add_argument("--backends", nargs="+", default=["artifact", "torch"],
+                        choices=["artifact", "numpy", "torch"], help="CLASSIFIER_BACKEND values to compare")
+    parser.add_argument("--modes", nargs="+", default=["no-preload", "preload"], choices=["no-preload", "preload"])
+    parser.add_argument("--size", type=parse_size, help="INTENTS:PATTERNS synthetic corpus instead of intents.json")
+    parser.add_argument("--requests", type=int, default=400, help="questions sent before memory is read")
+    parser.add_argument("--respawns", type=int, default=3)
+    parser.add_argument("--stub-latency", type=float, default=0.05, help="seconds per stubbed Gemini call")
+    parser.add_argument("--boot-timeout", type=float, default=300)
+    parser.add_argument("--output", help="write the JSON report here as well as stdout")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="gunicorn-workers-")
+    intents_path, paths = os.path.join(ROOT, "intents.json"), {}
+    if args.size:
+        intents_path, paths = corpus_env(args.size, workdir)
+    corpus = build_corpus(intents_path, args.requests)
+
+    results = []
+    with StubGeminiServer(latency=args.stub_latency) as stub:
+        env = dict(os.environ, STARTUP_MODE="lazy", GEMINI_ASYNC="1", GEMINI_API_BASE=stub.base_url,
+                   GEMINI_CACHE_ENABLED="0", SEMANTIC_CACHE_ENABLED="0", SESSION_BACKEND="memory",
+                   RETRAIN_ON_ADD_INTENT="0", LOG_LEVEL="WARNING", GUNICORN_WORKERS=str(args.workers),
+                   GUNICORN_THREADS=str(args.threads), PYTHONPATH=ROOT, **paths)
+        env.setdefault("GEMINI_API_KEY", "benchmark")
+        for backend in args.backends:
+            for mode in args.modes:
+                print(f"[gunicorn-workers] {mode} / {backend} ...", file=sys.stderr)
+                results.append(run_mode(mode == "preload", backend, corpus, args, env))
+
+    for name in os.listdir(workdir):
+        os.remove(os.path.join(workdir, name))
+    os.rmdir(workdir)
+
+    print_table(results)
+    text = json.dumps({"workers": args.workers, "threads": args.threads, "requests": args.requests,
+                       "corpus": "{}:{}".format(*args.size) if args.size else "intents.json",
+                       "results": results}, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Compare the torch classifier (data.pth) with the NumPy export (data.npz).
+
+    python export_model.py            # refresh data.npz first if needed
+    python -m benchmarks.numpy_classifier --iterations 2000
+
+Each backend is loaded in a fresh interpreter and reports import + load time,
+peak RSS after loading, and per-call predict_proba latency (median / p99)
+for a single bag and for a batch, as JSON.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, resource, sys, time
+backend, iterations, batch_size = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+start = time.perf_counter()
+if backend == "torch":
+    from classifier import load_local_classifier
+    classifier = load_local_classifier("data.pth")
+else:
+    from numpy_classifier import load_numpy_classifier
+    classifier = load_numpy_classifier("data.npz")
+load_s = time.perf_counter() - start
+import numpy as np
+rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+rng = np.random.RandomState(0)
+bags = (rng.rand(batch_size, len(classifier.all_words)) < 0.03).astype(np.float32)
+
+def timed(fn):
+    fn()  # warm up
+    samples = []
+    for _ in range(iterations):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    samples.sort()
+    return {"median_us": samples[len(samples) // 2] * 1e6,
+            "p99_us": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e6}
+
+print("RESULT " + json.dumps({
+    "import_and_load_s": load_s,
+    "peak_rss_mb": rss_mb,
+    "torch_imported": "torch" in sys.modules,
+    "single": timed(lambda: classifier.classify_bag(bags[0])),
+    f"batch_{batch_size}": timed(lambda: classifier.predict_proba(bags)),
+}))
+"""
+
+
+def run_backend(backend, iterations, batch_size):
+    proc = subprocess.run([sys.executable, "-c", CHILD, backend, str(iterations), str(batch_size)],
+                          cwd=ROOT, capture_output=True, text=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    raise RuntimeError(f"{backend} run failed:\n{proc.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark torch vs NumPy classifier inference")
+    parser.add_argument("--backends", nargs="+", default=["torch", "numpy"])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+    report = {backend: run_backend(backend, args.iterations, args.batch_size) for backend in args.backends}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
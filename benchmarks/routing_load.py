@@ -0,0 +1,210 @@
+"""Replay a question corpus through the router and report latency, throughput and memory.
+
+    python -m benchmarks.routing_load --concurrency 1 4 16 --stub-latency 0.2 --output run.json
+    python -m benchmarks.routing_load --corpus questions.jsonl --targets route_question flask
+
+Gemini is replaced by benchmarks.stub_gemini (async client, fixed latency),
+so runs are offline and repeatable. Targets:
+
+- route_question: app.route_question called directly.
+- flask: POST /message through the Flask test client (JSON parsing and
+  response building included).
+- http: POST /message to an already running server at --url (e.g. under
+  gunicorn). Start it with GEMINI_ASYNC=1 and GEMINI_API_BASE pointing at a
+  stub on --stub-port so both sides use the same stubbed LLM.
+
+Each target is first replayed once sequentially, then driven by 1..N client
+threads. Reported: per-stage p50/p95/p99 (from AnalyzedMessage timings, for
+in-process targets), end-to-end p50/p95/p99, requests/sec, which stage
+answered, and peak RSS. The JSON report is meant to be diffed between runs.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.corpus import ROOT, build_corpus, load_corpus
+from benchmarks.stub_gemini import StubGeminiServer
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def percentiles(seconds):
+    """p50/p95/p99/mean in milliseconds."""
+    if not seconds:
+        return {"count": 0}
+    ms = np.asarray(seconds) * 1000
+    return {"count": len(ms), "p50_ms": float(np.percentile(ms, 50)), "p95_ms": float(np.percentile(ms, 95)),
+            "p99_ms": float(np.percentile(ms, 99)), "mean_ms": float(ms.mean())}
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+class StageRecorder:
+    """Wraps app.log_timings to collect every routed message's stage timings."""
+
+    def __init__(self, app_module):
+        self.app = app_module
+        self.original = app_module.log_timings
+        self.records = []
+        app_module.log_timings = self._record
+
+    def _record(self, analysis, answered_by):
+        self.records.append((answered_by, dict(analysis.timings)))
+        self.original(analysis, answered_by)
+
+    def take(self):
+        records, self.records = self.records, []
+        stages, answered_by = {}, {}
+        for stage, timings in records:
+            answered_by[stage] = answered_by.get(stage, 0) + 1
+            for name, seconds in timings.items():
+                stages.setdefault(name, []).append(seconds)
+        return {name: percentiles(samples) for name, samples in sorted(stages.items())}, answered_by
+
+
+def make_sender(target, app_module=None, url=None, timeout=60):
+    """Return send(question, session_id) for one target; clients are per thread."""
+    local = threading.local()
+
+    if target == "route_question":
+        return lambda question, session_id: app_module.route_question(question, session_id=session_id)
+
+    if target == "flask":
+        def send(question, session_id):
+            if not hasattr(local, "client"):
+                local.client = app_module.app.test_client()
+            response = local.client.post("/message", json={"content": question, "session_id": session_id})
+            if response.status_code != 200:
+                raise RuntimeError(f"/message returned {response.status_code}: {response.get_data(as_text=True)}")
+        return send
+
+    if target == "http":
+        import httpx
+
+        def send(question, session_id):
+            if not hasattr(local, "client"):
+                local.client = httpx.Client(base_url=url, timeout=timeout)
+            response = local.client.post("/message", json={"content": question, "session_id": session_id})
+            response.raise_for_status()
+        return send
+
+    raise ValueError(f"Unknown target '{target}'")
+
+
+def run_load(send, corpus, concurrency, requests, sessions=0):
+    """Send `requests` questions from `concurrency` threads; returns latencies and throughput."""
+    latencies, errors = [], []
+    next_index = iter(range(requests))
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                i = next(next_index, None)
+            if i is None:
+                return
+            question = corpus[i % len(corpus)]["content"]
+            session_id = f"load-{i % sessions}" if sessions else None
+            start = time.perf_counter()
+            try:
+                send(question, session_id)
+            except Exception as e:
+                errors.append(repr(e))
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    return {"concurrency": concurrency, "requests": requests, "errors": len(errors),
+            "first_error": errors[0] if errors else None, "wall_s": wall,
+            "requests_per_s": len(latencies) / wall if wall else 0.0, "latency": percentiles(latencies)}
+
+
+def benchmark_target(target, send, corpus, args, recorder=None):
+    if recorder is not None:
+        recorder.take()  # drop records from warm-up
+    sequential = run_load(send, corpus, 1, len(corpus), args.sessions)
+    if recorder is not None:
+        sequential["stages"], sequential["answered_by"] = recorder.take()
+    runs = []
+    for concurrency in args.concurrency:
+        run = run_load(send, corpus, concurrency, args.requests or len(corpus), args.sessions)
+        if recorder is not None:
+            run["stages"], run["answered_by"] = recorder.take()
+        run["peak_rss_mb"] = peak_rss_mb()
+        runs.append(run)
+    return {"sequential_replay": sequential, "load": runs}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Routing latency and throughput with a stubbed Gemini")
+    parser.add_argument("--corpus", help="JSONL questions (see benchmarks.corpus); built from intents.json if omitted")
+    parser.add_argument("--size", type=int, default=500, help="questions to build without --corpus")
+    parser.add_argument("--targets", nargs="+", default=["route_question", "flask"],
+                        choices=["route_question", "flask", "http"])
+    parser.add_argument("--url", help="base URL of a running server, for the http target")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=0, help="requests per concurrency level (default: corpus size)")
+    parser.add_argument("--sessions", type=int, default=0, help="distinct session ids to spread requests over")
+    parser.add_argument("--stub-latency", type=float, default=0.2, help="seconds per stubbed Gemini call")
+    parser.add_argument("--stub-port", type=int, default=0)
+    parser.add_argument("--gemini-cache", action="store_true", help="keep the Gemini answer cache enabled")
+    parser.add_argument("--output", help="write the JSON report here as well as stdout")
+    args = parser.parse_args()
+    if "http" in args.targets and not args.url:
+        parser.error("the http target needs --url")
+
+    corpus = load_corpus(args.corpus) if args.corpus else build_corpus(os.path.join(ROOT, "intents.json"), args.size)
+    report = {"corpus": args.corpus or f"synthetic:{len(corpus)}", "questions": len(corpus),
+              "stub_latency_s": args.stub_latency, "sessions": args.sessions,
+              "gemini_cache": args.gemini_cache, "peak_rss_mb_before_app": peak_rss_mb(), "targets": {}}
+
+    with StubGeminiServer(port=args.stub_port, latency=args.stub_latency) as stub:
+        app_module = recorder = None
+        in_process = [t for t in args.targets if t != "http"]
+        if in_process:
+            os.environ.update({
+                "GEMINI_ASYNC": "1", "GEMINI_API_BASE": stub.base_url, "STARTUP_MODE": "lazy",
+                "GEMINI_CACHE_ENABLED": "1" if args.gemini_cache else "0", "SESSION_BACKEND": "memory",
+                "RETRAIN_ON_ADD_INTENT": "0", "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+            })
+            os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+            start = time.perf_counter()
+            import app as app_module
+            app_module.ensure_local_classifier()
+            report["app_import_s"] = time.perf_counter() - start
+            report["peak_rss_mb_after_app"] = peak_rss_mb()
+            recorder = StageRecorder(app_module)
+        for target in args.targets:
+            send = make_sender(target, app_module, args.url)
+            send(corpus[0]["content"], None)  # warm up
+            report["targets"][target] = benchmark_target(target, send, corpus, args,
+                                                         recorder if target != "http" else None)
+        report["stub_requests"] = len(stub.requests)
+    report["peak_rss_mb"] = peak_rss_mb()
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Replay logged questions through SemanticCache and report hit rate and lookup latency.
+
+Usage (from the repo root):
+    python -m benchmarks.semantic_cache [--log questions.jsonl] [--thresholds 0.8 0.9 0.95]
+
+The log is JSONL with one {"content": "..."} object per line (the /message
+request body); an optional "tag" field lets the benchmark count hits whose
+cached answer came from a question with a different tag. Without --log a
+replay is synthesized from intents.json patterns with light perturbations.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import torch
+
+from benchmarks.corpus import build_corpus, load_corpus as load_replay
+from nltk_utils import tokenize, BagOfWordsEncoder
+from semantic_cache import SemanticCache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def synthesize_replay(intents_path, n, seed=42):
+    # Only intent questions: the hit-rate check needs a tag for every question
+    return build_corpus(intents_path, n, seed=seed, verbatim_fraction=0.0, out_of_domain_fraction=0.0)
+
+
+def replay_hit_rate(encoder, questions, threshold):
+    cache = SemanticCache(encoder, threshold=threshold)
+    hits = wrong = 0
+    for q in questions:
+        tokens = q["tokens"]
+        answer, _ = cache.lookup(tokens)
+        if answer is not None:
+            hits += 1
+            if q.get("tag") is not None and answer != q["tag"]:
+                wrong += 1
+        else:
+            cache.add(tokens, q.get("tag") or q["content"])
+    tagged = all(q.get("tag") is not None for q in questions)
+    return {
+        "threshold": threshold,
+        "questions": len(questions),
+        "hit_rate": hits / len(questions) if questions else 0.0,
+        "wrong_tag_hit_rate": (wrong / hits if hits else 0.0) if tagged else None,
+        "entries": len(cache),
+    }
+
+
+def lookup_latency(encoder, entries, lookups=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    cache = SemanticCache(encoder, threshold=0.99, max_entries=entries)
+    words = encoder.words_vocab + [f"oov{i}" for i in range(5000)]
+    for _ in range(entries):
+        cache.add([words[i] for i in rng.integers(0, len(words), size=4)], "answer")
+    queries = [[words[i] for i in rng.integers(0, len(words), size=4)] for _ in range(lookups)]
+    timings = []
+    for tokens in queries:
+        start = time.perf_counter()
+        cache.lookup(tokens)
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1000
+    return {"entries": entries, "p50_ms": float(np.percentile(timings, 50)),
+            "p99_ms": float(np.percentile(timings, 99))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", help="JSONL replay of logged questions")
+    parser.add_argument("--model", default=os.path.join(ROOT, "data.pth"))
+    parser.add_argument("--synthetic", type=int, default=5000, help="questions to synthesize without --log")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.8, 0.9, 0.95])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--output", help="write the JSON report here as well as stdout")
+    args = parser.parse_args()
+
+    all_words = torch.load(args.model, map_location="cpu")["all_words"]
+    encoder = BagOfWordsEncoder(all_words)
+    questions = load_replay(args.log) if args.log else synthesize_replay(os.path.join(ROOT, "intents.json"), args.synthetic)
+    for q in questions:
+        q["tokens"] = tokenize(q["content"])
+
+    report = {
+        "replay": args.log or "synthetic",
+        "hit_rate": [replay_hit_rate(encoder, questions, t) for t in args.thresholds],
+        "lookup_latency": [lookup_latency(encoder, n) for n in args.sizes],
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
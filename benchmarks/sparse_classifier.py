@@ -0,0 +1,88 @@
+"""Dense vs sparse-input vs int8 classifier inference as the vocabulary grows.
+
+    python -m benchmarks.sparse_classifier --vocab-sizes 200 1000 10000 100000 --hidden 8
+
+Models are random NeuralNet-shaped NumpyClassifiers (vocab -> hidden ->
+hidden -> tags). Each query has --active-words vocabulary hits, the typical
+size of a tokenized question. "dense" builds the full bag vector and runs the
+matmul (what classify_bag does); "sparse" sums the weight rows of the active
+words (classify_sparse). Prints a table, then the same numbers as JSON.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from numpy_classifier import NumpyClassifier, quantized_copy
+
+
+def median_us(fn, iterations):
+    fn()  # warm up
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2] * 1e6
+
+
+def random_classifier(vocab_size, hidden, tags, rng):
+    layers = [(rng.randn(vocab_size, hidden), rng.randn(hidden)),
+              (rng.randn(hidden, hidden), rng.randn(hidden)),
+              (rng.randn(hidden, tags), rng.randn(tags))]
+    return NumpyClassifier(layers, [f"w{i}" for i in range(vocab_size)], [f"t{i}" for i in range(tags)])
+
+
+def run(vocab_size, hidden, tags, active_words, iterations, queries, rng):
+    float_model = random_classifier(vocab_size, hidden, tags, rng)
+    int8_model = quantized_copy(float_model)
+    query_ids = [np.sort(rng.choice(vocab_size, size=active_words, replace=False)) for _ in range(queries)]
+
+    def dense(model):
+        def fn():
+            for ids in query_ids:
+                bag = np.zeros(vocab_size, dtype=np.float32)
+                bag[ids] = 1.0
+                model.classify_bag(bag)
+        return fn
+
+    def sparse(model):
+        def fn():
+            for ids in query_ids:
+                model.classify_sparse(ids)
+        return fn
+
+    result = {"vocab_size": vocab_size}
+    for name, model in (("float32", float_model), ("int8", int8_model)):
+        result[f"{name}_dense_us"] = median_us(dense(model), iterations) / queries
+        result[f"{name}_sparse_us"] = median_us(sparse(model), iterations) / queries
+        result[f"{name}_weight_kb"] = model.weight_bytes() / 1024
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sparse-input and int8 classifier inference")
+    parser.add_argument("--vocab-sizes", type=int, nargs="+", default=[200, 1000, 5000, 20000, 100000])
+    parser.add_argument("--hidden", type=int, default=8)
+    parser.add_argument("--tags", type=int, default=37)
+    parser.add_argument("--active-words", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=20, help="queries per timed iteration")
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(0)
+    results = [run(v, args.hidden, args.tags, args.active_words, args.iterations, args.queries, rng)
+               for v in args.vocab_sizes]
+    columns = ["vocab_size", "float32_dense_us", "float32_sparse_us", "int8_dense_us", "int8_sparse_us",
+               "float32_weight_kb", "int8_weight_kb"]
+    print("  ".join(f"{c:>17}" for c in columns))
+    for row in results:
+        print("  ".join(f"{row[c]:>17.1f}" if isinstance(row[c], float) else f"{row[c]:>17}" for c in columns))
+    print(json.dumps({"hidden": args.hidden, "tags": args.tags, "active_words": args.active_words,
+                      "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
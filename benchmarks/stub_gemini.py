@@ -0,0 +1,139 @@
+"""Local stand-in for the Gemini REST API, for tests and benchmarks.
+
+Serves POST /v1beta/models/<model>:generateContent (and
+:streamGenerateContent?alt=sse, one word per event) with a configurable
+latency and records every request body it receives.
+
+    python -m benchmarks.stub_gemini --port 8765 --latency 0.5
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Server(ThreadingHTTPServer):
+    request_queue_size = 4096  # listen backlog; the default of 5 drops connections under load tests
+    daemon_threads = True
+
+
+def candidate(text):
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+
+
+class StubGeminiServer:
+    """Threaded HTTP server answering generateContent calls after `latency` seconds.
+
+    latency may be a number or a callable taking the request number (0-based)
+    and returning seconds, e.g. to make only the first request slow.
+    stream_event(chunk) formats the data of each streamed event (e.g. to send
+    malformed JSON); by default it is the chunk's candidate JSON.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, reply=None, chunk_latency=0.0,
+                 stream_event=None):
+        self.latency = latency
+        self.chunk_latency = chunk_latency  # extra delay between streamed chunks
+        self.stream_event = stream_event or (lambda chunk: json.dumps(candidate(chunk)))
+        self.reply = reply or (lambda body: "stub answer: " + body["contents"][-1]["parts"][0]["text"])
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _delay_for(self, number):
+        return self.latency(number) if callable(self.latency) else self.latency
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so clients can reuse connections
+            # Headers and body go out as separate writes; without TCP_NODELAY, Nagle plus the
+            # client's delayed ACK adds ~40ms to every keep-alive response
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with stub._lock:
+                    number = len(stub.requests)
+                    stub.requests.append({"path": self.path, "body": body})
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    time.sleep(stub._delay_for(number))
+                    path = self.path.split("?", 1)[0]
+                    if path.endswith(":streamGenerateContent"):
+                        self._stream(stub.reply(body))
+                    elif path.endswith(":generateContent"):
+                        self._send(200, candidate(stub.reply(body)))
+                    else:
+                        self._send(404, {"error": {"message": "not found"}})
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            def _stream(self, text):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                words = text.split(" ")
+                for i, word in enumerate(words):
+                    if i:
+                        time.sleep(stub.chunk_latency)
+                    chunk = word if i == len(words) - 1 else word + " "
+                    self.wfile.write(f"data: {stub.stream_event(chunk)}\r\n\r\n".encode("utf-8"))
+                    self.wfile.flush()
+
+            def _send(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stub of the Gemini API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per response")
+    args = parser.parse_args()
+    server = StubGeminiServer(args.host, args.port, latency=args.latency)
+    print(f"Stub Gemini API on {server.base_url} (GEMINI_API_BASE), latency {args.latency}s")
+    server._server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Generate an intents.json-shaped corpus of arbitrary size.
+
+    python -m benchmarks.synthetic_intents --intents 1000 --patterns 10000 --output /tmp/intents.json
+
+Words are pronounceable pseudo-words (consonant-vowel syllables, never an
+English stop word) so tokenize/stem keep them distinct. Each intent owns a few
+keywords, and the rest of every pattern is drawn from one shared vocabulary
+with Zipf-distributed frequencies. Frequent words therefore appear across
+many intents, as "department" or "course" do in the real corpus. By default
+the vocabulary grows with the corpus following Heaps' law,
+V = heaps_k * sqrt(total tokens). heaps_k=7 reproduces the real corpus, about
+200 stems for 184 patterns.
+"""
+import argparse
+import json
+
+import numpy as np
+
+CONSONANTS = "bdfgklmnprstvz"
+VOWELS = "aiou"  # no "e"/"y" endings, which the Porter stemmer rewrites
+
+
+def pseudo_words(count, rng):
+    syllables = [c + v for c in CONSONANTS for v in VOWELS]
+    words, seen = [], set()
+    while len(words) < count:
+        word = "".join(rng.choice(syllables, size=rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+def heaps_vocabulary_size(num_patterns, words_per_pattern=4.5, heaps_k=7.0):
+    return max(50, int(heaps_k * np.sqrt(num_patterns * words_per_pattern)))
+
+
+def generate_intents(num_intents, num_patterns, vocab_size=None, keywords_per_intent=4, zipf_exponent=1.1,
+                     min_words=2, max_words=7, seed=0):
+    """Return {"intents": [...]} with num_patterns patterns spread evenly over num_intents tags."""
+    rng = np.random.RandomState(seed)
+    vocab_size = vocab_size or heaps_vocabulary_size(num_patterns)
+    vocab = pseudo_words(vocab_size, rng)
+    weights = 1.0 / np.arange(1, vocab_size + 1) ** zipf_exponent
+    weights /= weights.sum()
+
+    per_intent = np.full(num_intents, num_patterns // num_intents)
+    per_intent[:num_patterns % num_intents] += 1
+    intents = []
+    for i, count in enumerate(per_intent):
+        keywords = [vocab[j] for j in rng.choice(vocab_size, size=min(keywords_per_intent, vocab_size),
+                                                  replace=False)]
+        patterns = []
+        for _ in range(max(count, 1)):
+            length = rng.randint(min_words, max_words + 1)
+            own = rng.randint(1, min(3, length) + 1)
+            words = [keywords[j] for j in rng.randint(0, len(keywords), size=own)]
+            words += [vocab[j] for j in rng.choice(vocab_size, size=length - own, p=weights)]
+            rng.shuffle(words)
+            patterns.append(" ".join(words).capitalize() + "?")
+        intents.append({"tag": f"intent_{i:05d}", "patterns": patterns,
+                        "responses": [f"Synthetic answer {i} ({keywords[0]})."]})
+    return {"intents": intents}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic intents.json")
+    parser.add_argument("--intents", type=int, default=1000)
+    parser.add_argument("--patterns", type=int, default=10000)
+    parser.add_argument("--vocab-size", type=int, default=None, help="default: Heaps' law estimate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="synthetic_intents.json")
+    args = parser.parse_args()
+    corpus = generate_intents(args.intents, args.patterns, args.vocab_size, seed=args.seed)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(corpus, f, indent=1)
+    print(f"Wrote {args.intents} intents / {args.patterns} patterns to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Wall-clock and epochs-to-converge for train.py's two training modes.
+
+    python -m benchmarks.train_modes --epochs 1000 --patience 50
+
+All runs use the same seed, model size and held-out split of intents.json:
+
+- loader: the DataLoader loop (train.train_model) for all epochs; its
+  epochs-to-converge applies the same patience rule to its validation-loss
+  trace after the fact.
+- vectorized_full: train_model_vectorized for all epochs, without early
+  stopping, to isolate the per-batch overhead.
+- vectorized_early_stop: train_model_vectorized with early stopping.
+
+Prints a JSON report.
+"""
+import argparse
+import json
+import time
+
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader
+
+import train
+from model import NeuralNet
+
+
+def converged_epoch(val_losses, patience, min_delta):
+    """Best epoch (1-based) under the early-stopping rule, and the epoch it would have stopped at."""
+    best_loss, best_epoch = float("inf"), 0
+    for epoch, loss in enumerate(val_losses, start=1):
+        if loss < best_loss - min_delta:
+            best_loss, best_epoch = loss, epoch
+        elif epoch - best_epoch >= patience:
+            return best_epoch, epoch
+    return best_epoch, len(val_losses)
+
+
+def fresh_model(input_size, output_size, hidden_size=8, learning_rate=0.001):
+    train.set_seed()
+    model = NeuralNet(input_size, hidden_size, output_size)
+    return model, nn.CrossEntropyLoss(), torch.optim.Adam(model.parameters(), lr=learning_rate)
+
+
+def run_loader(X_fit, y_fit, X_val, y_val, output_size, args):
+    model, criterion, optimizer = fresh_model(X_fit.shape[1], output_size)
+    X_val_t, y_val_t = torch.as_tensor(X_val), torch.as_tensor(y_val, dtype=torch.long)
+    val_losses = []
+    loader = DataLoader(train.ChatDataset(X_fit, y_fit), batch_size=args.batch_size or len(X_fit),
+                        shuffle=True, drop_last=True)
+    start = time.perf_counter()
+    train.train_model(model, loader, criterion, optimizer, torch.device("cpu"), args.epochs,
+                      on_epoch=lambda epoch, loss: val_losses.append(
+                          train.evaluate(model, X_val_t, y_val_t, criterion)[0]))
+    seconds = time.perf_counter() - start
+    best_epoch, stop_epoch = converged_epoch(val_losses, args.patience, args.min_delta)
+    return {"wall_clock_s": seconds, "epochs": args.epochs, "best_epoch": best_epoch,
+            "would_stop_at": stop_epoch,
+            "val_accuracy": train.evaluate(model, X_val_t, y_val_t, criterion)[1]}
+
+
+def run_vectorized(X_fit, y_fit, X_val, y_val, output_size, args, early_stop):
+    model, criterion, optimizer = fresh_model(X_fit.shape[1], output_size)
+    start = time.perf_counter()
+    model, info = train.train_model_vectorized(
+        model, X_fit, y_fit, criterion, optimizer, torch.device("cpu"), args.epochs, args.batch_size,
+        X_val if early_stop else None, y_val if early_stop else None, args.patience, args.min_delta)
+    seconds = time.perf_counter() - start
+    X_val_t, y_val_t = torch.as_tensor(X_val), torch.as_tensor(y_val, dtype=torch.long)
+    report = {"wall_clock_s": seconds, "epochs": info["epochs"],
+              "val_accuracy": train.evaluate(model, X_val_t, y_val_t, criterion)[1]}
+    if early_stop:
+        report["best_epoch"] = info.get("best_epoch")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare DataLoader and vectorized training")
+    parser.add_argument("--intents", default="intents.json")
+    parser.add_argument("--epochs", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--val-fraction", type=float, default=0.15)
+    parser.add_argument("--patience", type=int, default=50)
+    parser.add_argument("--min-delta", type=float, default=1e-4)
+    args = parser.parse_args()
+
+    X, y, _, tags = train.prepare_data(args.intents)
+    X_fit, y_fit, X_val, y_val = train.holdout_split(X, y, args.val_fraction)
+    report = {
+        "patterns": {"train": len(X_fit), "validation": len(X_val)},
+        "batch_size": args.batch_size,
+        "loader": run_loader(X_fit, y_fit, X_val, y_val, len(tags), args),
+        "vectorized_full": run_vectorized(X_fit, y_fit, X_val, y_val, len(tags), args, early_stop=False),
+        "vectorized_early_stop": run_vectorized(X_fit, y_fit, X_val, y_val, len(tags), args, early_stop=True),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
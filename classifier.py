@@ -0,0 +1,58 @@
+import torch
+
+from model import NeuralNet
+from nltk_utils import BagOfWordsEncoder
+
+
+class LocalClassifier:
+    """Serving wrapper around a trained NeuralNet and its vocabulary/tags."""
+
+    def __init__(self, model, all_words, tags):
+        self.model = model
+        self.model.eval()
+        self.all_words = all_words
+        self.tags = tags
+        self.encoder = BagOfWordsEncoder(all_words)
+
+    def predict_proba(self, bags):
+        """Class probabilities for a (n, vocab) matrix of bags in one forward pass."""
+        X_tensor = torch.as_tensor(bags, dtype=torch.float32)
+        if X_tensor.dim() == 1:
+            X_tensor = X_tensor.unsqueeze(0)
+        with torch.inference_mode():
+            outputs = self.model(X_tensor)
+            return torch.softmax(outputs, dim=1).numpy()
+
+    def classify_bag(self, bag):
+        """Class probabilities for a single bag-of-words vector."""
+        return self.predict_proba(bag)[0]
+
+    def classify_batch(self, tokenized_messages, top_k=3):
+        """Classify many tokenized messages with a single forward pass.
+
+        Returns one dict per message with the top tag, its probability and the
+        top_k alternatives (including the winner) in descending order.
+        """
+        if not tokenized_messages:
+            return []
+        probs = torch.from_numpy(self.predict_proba(self.encoder.encode_batch(tokenized_messages)))
+        k = max(1, min(top_k, len(self.tags)))
+        top_probs, top_indices = torch.topk(probs, k, dim=1)
+        results = []
+        for row_probs, row_indices in zip(top_probs.tolist(), top_indices.tolist()):
+            alternatives = [{"tag": self.tags[idx], "probability": prob}
+                            for prob, idx in zip(row_probs, row_indices)]
+            results.append({
+                "tag": alternatives[0]["tag"],
+                "probability": alternatives[0]["probability"],
+                "alternatives": alternatives,
+            })
+        return results
+
+
+def load_local_classifier(path):
+    """Load a classifier saved by train.save_model (data.pth)."""
+    model_data = torch.load(path, map_location=torch.device('cpu'))
+    model = NeuralNet(model_data.get('input_size'), model_data.get('hidden_size'), model_data.get('output_size'))
+    model.load_state_dict(model_data.get('model_state'))
+    return LocalClassifier(model, model_data.get('all_words'), model_data.get('tags'))
@@ -0,0 +1,105 @@
+"""Export data.pth to a torch-free NumPy artifact (data.npz).
+
+    python export_model.py [data.pth] [data.npz]
+    python export_model.py --int8 data.pth data.int8.npz
+
+BatchNorm layers are folded into the Linear layer before them and dropout is
+dropped, so numpy_classifier.NumpyClassifier can serve the model with plain
+matmuls. With --int8 the weights are stored as per-column int8, and the export
+is refused unless the quantized model agrees with the float one on the
+intents.json patterns and random sparse bags (see quantization_parity).
+"""
+import argparse
+import os
+
+import numpy as np
+import torch
+
+from intent_store import IntentStore
+from nltk_utils import tokenize
+from numpy_classifier import (NPZ_FORMAT_VERSION, NumpyClassifier, file_sha256, quantization_parity,
+                              quantized_copy)
+
+
+def fold_batch_norm(weight, bias, bn_state, eps=1e-5):
+    """Fold eval-mode BatchNorm1d into the preceding Linear; returns (weight (in, out), bias)."""
+    scale = bn_state["weight"] / torch.sqrt(bn_state["running_var"] + eps)
+    folded_weight = weight * scale[:, None]
+    folded_bias = (bias - bn_state["running_mean"]) * scale + bn_state["bias"]
+    return folded_weight.t(), folded_bias
+
+
+def fold_neural_net(state):
+    """(weight, bias) per layer of a model.NeuralNet state dict, with BatchNorm folded in."""
+    def batch_norm(name):
+        return {key: state[f"{name}.{key}"].double() for key in ("weight", "bias", "running_mean", "running_var")}
+
+    layers = [
+        fold_batch_norm(state["fc1.weight"].double(), state["fc1.bias"].double(), batch_norm("batch_norm1")),
+        fold_batch_norm(state["fc2.weight"].double(), state["fc2.bias"].double(), batch_norm("batch_norm2")),
+        (state["fc3.weight"].double().t(), state["fc3.bias"].double()),
+    ]
+    return [(w.numpy().astype(np.float32), b.numpy().astype(np.float32)) for w, b in layers]
+
+
+def parity_bags(encoder, intents_path="intents.json", random_bags=1000, active_words=4, seed=0):
+    """Evaluation inputs for the quantization gate: every intent pattern plus random sparse bags."""
+    tokenized = []
+    if os.path.exists(intents_path):
+        for intent in IntentStore(intents_path).snapshot().get("intents", []):
+            tokenized.extend(tokenize(pattern) for pattern in intent.get("patterns", []))
+    bags = [encoder.encode_batch(tokenized)] if tokenized else []
+    rng = np.random.RandomState(seed)
+    random_matrix = np.zeros((random_bags, len(encoder)), dtype=np.float32)
+    for row in random_matrix:
+        row[rng.choice(len(encoder), size=min(active_words, len(encoder)), replace=False)] = 1.0
+    bags.append(random_matrix)
+    return np.vstack(bags)
+
+
+def export_npz(pth_path, npz_path, int8=False, min_agreement=0.99, max_prob_diff=0.05):
+    model_data = torch.load(pth_path, map_location=torch.device('cpu'))
+    classifier = NumpyClassifier(fold_neural_net(model_data["model_state"]),
+                                 model_data["all_words"], model_data["tags"])
+    if int8:
+        quantized = quantized_copy(classifier)
+        report = quantization_parity(classifier, quantized, parity_bags(classifier.encoder),
+                                     min_agreement=min_agreement, max_prob_diff=max_prob_diff)
+        print(f"int8 parity: decision agreement {report['decision_agreement']:.4f}, "
+              f"top-1 agreement {report['top1_agreement']:.4f}, "
+              f"max probability change {report['max_prob_diff']:.4f}")
+        if not report["passed"]:
+            raise ValueError(f"int8 model failed the accuracy parity gate: {report}")
+        classifier = quantized
+    arrays = {"format_version": np.int32(NPZ_FORMAT_VERSION), "num_layers": np.int32(len(classifier.layers))}
+    for i, (weight, bias, scale) in enumerate(classifier.layers):
+        arrays[f"w{i}"] = weight
+        arrays[f"b{i}"] = bias
+        if scale is not None:
+            arrays[f"s{i}"] = scale
+    np.savez_compressed(
+        npz_path,
+        all_words=np.array(model_data["all_words"], dtype=str),
+        tags=np.array(model_data["tags"], dtype=str),
+        source_sha256=np.array(file_sha256(pth_path)),
+        **arrays,
+    )
+    print(f"Exported {pth_path} -> {npz_path} ({len(classifier.layers)} layers, "
+          f"{len(classifier.tags)} tags, {'int8' if int8 else 'float32'})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export data.pth to a NumPy artifact")
+    parser.add_argument("pth_path", nargs="?", default="data.pth")
+    parser.add_argument("npz_path", nargs="?", default=None)
+    parser.add_argument("--int8", action="store_true", help="store int8 weights (gated on accuracy parity)")
+    parser.add_argument("--min-agreement", type=float, default=0.99)
+    parser.add_argument("--max-prob-diff", type=float, default=0.05)
+    args = parser.parse_args()
+    npz_path = args.npz_path or ("data.int8.npz" if args.int8 else "data.npz")
+    export_npz(args.pth_path, npz_path, int8=args.int8,
+               min_agreement=args.min_agreement, max_prob_diff=args.max_prob_diff)
+
+
+if __name__ == "__main__":
+    main()
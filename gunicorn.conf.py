@@ -0,0 +1,52 @@
+"""gunicorn settings; picked up automatically by `gunicorn` run from this directory.
+
+    gunicorn                       # app:create_app(), preloaded in the master
+    GUNICORN_PRELOAD=0 gunicorn    # every worker imports and warms the app itself
+
+With preload_app the master imports app.py once and create_app() builds the
+intent index, loads the classifier (torch, or the data.bin mapping) and warms
+the tokenizer before any worker exists. Workers are then plain fork()s. They
+share those pages copy-on-write, so a worker costs its private pages only and
+spawns (or respawns after max_requests / a crash) in milliseconds.
+
+Copy-on-write only holds while pages are not written. The garbage collector
+writes to every object it scans, so the master disables it while loading and
+freezes everything loaded into the permanent generation before forking.
+Workers re-enable it for their own objects. See benchmarks/gunicorn_workers.py
+for per-worker RSS/PSS and spawn times with and without preloading.
+
+Code changes need a full restart (not HUP) when preloading.
+"""
+import gc
+import os
+
+# gRPC (google.generativeai) is only fork-safe with fork support on; must be set before it loads
+os.environ.setdefault("GRPC_ENABLE_FORK_SUPPORT", "1")
+os.environ.setdefault("GRPC_POLL_STRATEGY", "poll")
+
+wsgi_app = "app:create_app()"
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8080')}")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))  # Gemini calls can take tens of seconds
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+if preload_app:
+    # Avoid leaving freed holes in (and collecting) the pages workers will share
+    gc.disable()
+
+
+def pre_fork(server, worker):
+    if server.cfg.preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
+
+
+def post_worker_init(worker):
+    # benchmarks/gunicorn_workers.py times worker spawns from this line
+    print(f"[gunicorn] worker {worker.pid} ready", flush=True)
@@ -0,0 +1,170 @@
+import itertools
+import threading
+
+import numpy as np
+
+
+class IntentIndex:
+    """Immutable, pre-tokenized view of an intents document.
+
+    Patterns are tokenized once at build time so matching a message only
+    costs tokenizing the message itself. The inverted index and the pattern
+    sizes are kept in flat NumPy arrays. Messages sharing tokens with many
+    patterns are scored from those buffers without touching per-pattern Python
+    objects, so after a gunicorn preload_app fork the index pages stay shared
+    instead of being copied into every worker by reference counting.
+    """
+
+    # Messages with at most this many posting hits are scored by a plain loop (see match)
+    loop_max_hits = 64
+
+    def __init__(self, intents, tokenizer, content_hash=None):
+        self.intents = intents
+        self.content_hash = content_hash
+        self.patterns = []  # (tag, pattern, frozenset of stemmed tokens, intent responses)
+        self.responses = {}  # tag -> list of responses
+        postings = {}  # stemmed token -> ascending pattern ids containing it
+        for intent in intents.get("intents", []):
+            tag = intent.get("tag")
+            responses = list(intent.get("responses") or [])
+            if responses:
+                # Tags may repeat across intents; the last one with responses wins,
+                # matching the old linear lookup in route_question.
+                self.responses[tag] = responses
+            for pattern in intent.get("patterns", []):
+                pattern_tokens = frozenset(tokenizer(pattern))
+                if not pattern_tokens:
+                    print(f"[intent-index] intent='{tag}' pattern='{pattern}' -> pattern_tokens is empty")
+                pattern_id = len(self.patterns)
+                for token in pattern_tokens:
+                    postings.setdefault(token, []).append(pattern_id)
+                self.patterns.append((tag, pattern, pattern_tokens, responses))
+
+        # Postings of token_ids[token] are posting_ids[posting_offsets[i]:posting_offsets[i + 1]]
+        self.token_ids = {token: i for i, token in enumerate(postings)}
+        self.posting_offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+        np.cumsum([len(ids) for ids in postings.values()], out=self.posting_offsets[1:])
+        self.posting_ids = np.fromiter(itertools.chain.from_iterable(postings.values()), dtype=np.int32,
+                                       count=int(self.posting_offsets[-1]))
+        self.pattern_sizes = np.fromiter((len(p[2]) for p in self.patterns), dtype=np.int64, count=len(self.patterns))
+        self.has_responses = np.fromiter((bool(p[3]) for p in self.patterns), dtype=bool, count=len(self.patterns))
+        self._skip_masks = {}  # skip_tags -> boolean mask over patterns
+        self._skip_mask(("default",))
+
+    def responses_for(self, tag):
+        return self.responses.get(tag, [])
+
+    def _skip_mask(self, skip_tags):
+        mask = self._skip_masks.get(skip_tags)
+        if mask is None:
+            skip = set(skip_tags)
+            mask = np.fromiter((p[0] in skip for p in self.patterns), dtype=bool, count=len(self.patterns))
+            self._skip_masks[skip_tags] = mask
+        return mask
+
+    def _postings(self, token_set):
+        """Concatenated posting lists of the known tokens in token_set (one entry per shared token)."""
+        offsets, ids = self.posting_offsets, self.posting_ids
+        slices = [ids[offsets[i]:offsets[i + 1]] for i in (self.token_ids.get(t) for t in token_set) if i is not None]
+        return np.concatenate(slices) if slices else ids[:0]
+
+    def candidates(self, token_set):
+        """Ascending ids of patterns sharing at least one token with token_set."""
+        return np.unique(self._postings(token_set)).tolist()
+
+    def match(self, tokens, skip_tags=("default",), on_score=None):
+        """Best Jaccard match for tokens, scoring only patterns from the inverted index.
+
+        Returns (best_score, best_responses). Patterns outside the candidate set
+        score 0 and can never beat the initial best, and candidates are ranked in
+        pattern order, so the result is identical to match_linear. on_score, if
+        given, is called with (tag, pattern, score, intersection, union) for every
+        non-zero score. Few candidates are scored by a loop, many by array operations.
+        """
+        token_set = set(tokens)
+        # A pattern's id appears once per token it shares with the message: its count is the intersection
+        hits = self._postings(token_set)
+        if on_score is not None or len(hits) <= self.loop_max_hits:
+            return self._match_loop(token_set, sorted(set(hits.tolist())), skip_tags, on_score)
+        candidates, intersection = np.unique(hits, return_counts=True)
+        if skip_tags:
+            keep = ~self._skip_mask(tuple(skip_tags))[candidates]
+            candidates, intersection = candidates[keep], intersection[keep]
+        if not len(candidates):
+            return 0, None
+        union = len(token_set) + self.pattern_sizes[candidates] - intersection
+        scores = intersection / np.maximum(union, 1)
+        # The best changes at every candidate beating all earlier ones (earlier patterns win ties);
+        # its responses are those of the last such candidate that has any
+        earlier_best = np.maximum.accumulate(np.concatenate(([0.0], scores[:-1])))
+        improved = np.flatnonzero(scores > earlier_best)
+        if not len(improved):
+            return 0, None
+        best_score = float(scores[improved[-1]])
+        with_responses = improved[self.has_responses[candidates[improved]]]
+        if not len(with_responses):
+            return best_score, None
+        return best_score, self.patterns[int(candidates[with_responses[-1]])][3]
+
+    def _match_loop(self, token_set, candidates, skip_tags, on_score=None):
+        """match() as a loop over candidate patterns; the only path that can report scores."""
+        best_score = 0
+        best_responses = None
+        for pattern_id in candidates:
+            tag, pattern, pattern_tokens, responses = self.patterns[pattern_id]
+            if tag in skip_tags:
+                continue
+            intersection = token_set & pattern_tokens
+            union = token_set | pattern_tokens
+            score = len(intersection) / max(len(union), 1)
+            if on_score is not None:
+                on_score(tag, pattern, score, intersection, union)
+            if score > best_score:
+                best_score = score
+                if responses:
+                    best_responses = responses
+                if score >= 1.0:
+                    # Nothing later can score strictly higher than a perfect match
+                    break
+        return best_score, best_responses
+
+    def match_linear(self, tokens, skip_tags=("default",)):
+        """Reference full scan over every pattern; kept for parity checks."""
+        token_set = set(tokens)
+        best_score = 0
+        best_responses = None
+        for tag, pattern, pattern_tokens, responses in self.patterns:
+            if tag in skip_tags:
+                continue
+            score = len(token_set & pattern_tokens) / max(len(token_set | pattern_tokens), 1)
+            if score > best_score:
+                best_score = score
+                if responses:
+                    best_responses = responses
+        return best_score, best_responses
+
+
+class StoreIndexLoader:
+    """Keeps an IntentIndex in sync with an IntentStore.
+
+    Store snapshots are copy-on-write, so the index is rebuilt only when the
+    store hands out a different snapshot object.
+    """
+
+    def __init__(self, store, tokenizer):
+        self.store = store
+        self.tokenizer = tokenizer
+        self._lock = threading.Lock()
+        self._index = None
+
+    def get(self):
+        intents = self.store.snapshot()
+        index = self._index
+        if index is not None and index.intents is intents:
+            return index
+        with self._lock:
+            if self._index is None or self._index.intents is not intents:
+                self._index = IntentIndex(intents, self.tokenizer, content_hash=f"v{self.store.version}")
+                print(f"[intent-index] built index with {len(self._index.patterns)} patterns "
+                      f"from {len(self._index.responses)} tags")
+            return self._index
@@ -0,0 +1,170 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialized
+    fcntl = None
+
+
+class IntentStore:
+    """intents.json plus an append-only change log, safe to share between processes.
+
+    Writers take an exclusive flock on `<path>.lock` and append one JSON line
+    per change to `<path>.log` (fsynced), so a write costs O(change) rather
+    than rewriting the whole corpus. Once the log holds `compact_every`
+    records it is folded into a new intents.json, written to a temporary file
+    and renamed over the old one. The snapshot records the last folded
+    sequence number ("log_seq"), so a crash between the rename and truncating
+    the log never applies a change twice.
+
+    Readers get an immutable snapshot dict from memory; the files are only
+    re-checked (a stat, then just the new log lines) every `refresh_interval`
+    seconds, and changes made through this instance are visible immediately.
+    """
+
+    def __init__(self, path, compact_every=100, refresh_interval=1.0, clock=time.monotonic):
+        self.path = path
+        self.log_path = path + ".log"
+        self.lock_path = path + ".lock"
+        self.compact_every = compact_every
+        self.refresh_interval = refresh_interval
+        self.clock = clock
+        self._lock = threading.RLock()
+        self._snapshot = None
+        self._snapshot_key = None  # stat of intents.json the snapshot was built from
+        self._log_offset = 0  # bytes of the log already applied
+        self._log_records = 0
+        self._seq = 0
+        self._checked_at = None
+        self.version = 0  # bumped on every change seen by this instance
+
+    @contextmanager
+    def _file_lock(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _stat_key(self):
+        st = os.stat(self.path)
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _load_base(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        self._snapshot_key = self._stat_key()
+        self._snapshot = base
+        self._seq = base.get("log_seq", 0)
+        self._log_offset = 0
+        self._log_records = 0
+        self.version += 1
+
+    def _apply(self, snapshot, record):
+        if record["op"] != "add":
+            raise ValueError(f"Unknown intent change '{record['op']}'")
+        # Copy-on-write, so snapshots already handed to readers never change
+        updated = dict(snapshot)
+        updated["intents"] = list(snapshot.get("intents", [])) + [record["intent"]]
+        return updated
+
+    def _read_log(self):
+        """Apply complete log lines written since the last read."""
+        try:
+            with open(self.log_path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size < self._log_offset:
+                    return False  # truncated by a compaction elsewhere
+                f.seek(self._log_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return self._log_offset == 0
+        end = data.rfind(b"\n") + 1  # a writer may be mid-line; leave partial lines for later
+        snapshot, seq, records = self._snapshot, self._seq, self._log_records
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                return False  # log was compacted and rewritten under us
+            records += 1
+            if record["seq"] <= seq:
+                continue  # already folded into the snapshot
+            if record["seq"] != seq + 1:
+                return False
+            snapshot = self._apply(snapshot, record)
+            seq = record["seq"]
+        self._seq, self._log_records = seq, records
+        if snapshot is not self._snapshot:
+            self._snapshot = snapshot
+            self.version += 1
+        self._log_offset += end
+        return True
+
+    def _refresh(self):
+        if self._snapshot is None or self._stat_key() != self._snapshot_key:
+            self._load_base()
+        if not self._read_log():
+            self._load_base()
+            self._read_log()
+        self._checked_at = self.clock()
+
+    def snapshot(self):
+        """The current intents document. Treat it as read-only."""
+        now = self.clock()
+        if self._snapshot is not None and now - self._checked_at < self.refresh_interval:
+            return self._snapshot
+        with self._lock:
+            if self._snapshot is None or now - self._checked_at >= self.refresh_interval:
+                self._refresh()
+            return self._snapshot
+
+    def add_intent(self, intent):
+        """Append one intent; returns the new snapshot."""
+        with self._file_lock():
+            self._refresh()
+            record = {"seq": self._seq + 1, "op": "add", "intent": intent}
+            with open(self.log_path, "ab") as f:
+                f.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._read_log()
+            if self._log_records >= self.compact_every:
+                self._compact()
+            return self._snapshot
+
+    def compact(self):
+        """Fold the change log into intents.json now."""
+        with self._file_lock():
+            self._refresh()
+            self._compact()
+
+    def _compact(self):
+        document = dict(self._snapshot)
+        document["log_seq"] = self._seq
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(document, f, ensure_ascii=False, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        open(self.log_path, "wb").close()
+        print(f"[intent-store] compacted {self._log_records} logged changes into {self.path}")
+        self._snapshot_key = self._stat_key()
+        self._log_offset = 0
+        self._log_records = 0
+        self._checked_at = self.clock()
+
+    def stats(self):
+        return {"version": self.version, "log_seq": self._seq, "log_records": self._log_records,
+                "compact_every": self.compact_every}
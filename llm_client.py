@@ -0,0 +1,257 @@
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import httpx
+
+
+GEMINI_API_BASE = "https://generativelanguage.googleapis.com"
+# httpcore scans every connection of a pool for each request it schedules, which
+# turns quadratic with hundreds of connections; larger limits get more pools instead
+POOL_SHARD_SIZE = 32
+
+
+class LLMError(Exception):
+    pass
+
+
+def to_gemini_contents(messages):
+    """Convert a plain string or [{"role", "content"}] history into Gemini REST contents."""
+    if isinstance(messages, str):
+        return [{"role": "user", "parts": [{"text": messages}]}]
+    return [{"role": "model" if m["role"] in ("assistant", "model") else "user",
+             "parts": [{"text": m["content"]}]} for m in messages]
+
+
+def extract_candidate_text(payload):
+    """Concatenate the text parts of the first candidate of a generateContent response."""
+    try:
+        parts = payload["candidates"][0]["content"]["parts"]
+    except (KeyError, IndexError, TypeError):
+        return None
+    text = "".join(part.get("text", "") for part in parts)
+    return text or None
+
+
+class AsyncGeminiClient:
+    """asyncio Gemini client with a deadline, optional hedging and a concurrency cap.
+
+    Pooled httpx.AsyncClients (one per POOL_SHARD_SIZE connections, used
+    round-robin) are reused for every call. When hedge_percentile is set and
+    enough latencies have been observed, a second identical request is sent if
+    the first has not answered within that percentile of recent latencies;
+    whichever succeeds first wins.
+    """
+
+    def __init__(self, api_key, model_id, system_instruction=None, generation_config=None,
+                 base_url=GEMINI_API_BASE, timeout=30.0, max_concurrency=16, max_connections=32,
+                 hedge_percentile=None, hedge_min_samples=20, latency_window=200):
+        self.api_key = api_key
+        self.model_id = model_id if model_id.startswith("models/") else f"models/{model_id}"
+        self.system_instruction = system_instruction
+        self.generation_config = generation_config or {}
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.latencies = deque(maxlen=latency_window)
+        self._clients = []
+        self._next_client = itertools.count()
+        self._semaphore = None
+        self._loop = None
+        self.stats = {"requests": 0, "errors": 0, "timeouts": 0, "hedges": 0, "hedge_wins": 0}
+
+    def _ensure_client(self):
+        # The pool and semaphore belong to the event loop that created them
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            shards = -(-self.max_connections // POOL_SHARD_SIZE)
+            per_shard = -(-self.max_connections // shards)
+            ssl_context = httpx.create_ssl_context()  # loading CA certificates takes ~40ms; do it once
+            self._clients = [httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                verify=ssl_context,
+                limits=httpx.Limits(max_connections=per_shard, max_keepalive_connections=per_shard),
+            ) for _ in range(shards)]
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._clients[next(self._next_client) % len(self._clients)]
+
+    def build_request(self, messages):
+        body = {"contents": to_gemini_contents(messages)}
+        if self.system_instruction:
+            body["systemInstruction"] = {"parts": [{"text": self.system_instruction}]}
+        config = {}
+        for key, rest_key in (("temperature", "temperature"), ("top_p", "topP"),
+                              ("max_output_tokens", "maxOutputTokens")):
+            if key in self.generation_config:
+                config[rest_key] = self.generation_config[key]
+        if config:
+            body["generationConfig"] = config
+        return body
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging, or None when hedging is off or still warming up."""
+        if not self.hedge_percentile or len(self.latencies) < self.hedge_min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        rank = min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile / 100.0))
+        return ordered[rank]
+
+    async def _request(self, path, body):
+        client = self._ensure_client()
+        async with self._semaphore:
+            self.stats["requests"] += 1
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, json=body, headers={"x-goog-api-key": self.api_key})
+            except httpx.HTTPError as e:
+                self.stats["errors"] += 1
+                raise LLMError(f"request failed: {e!r}") from e
+            if response.status_code != 200:
+                self.stats["errors"] += 1
+                raise LLMError(f"HTTP {response.status_code}: {response.text[:200]}")
+            self.latencies.append(time.perf_counter() - start)
+            return extract_candidate_text(response.json())
+
+    async def _hedged(self, path, body):
+        primary = asyncio.ensure_future(self._request(path, body))
+        delay = self.hedge_delay()
+        tasks = {primary}
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    self.stats["hedges"] += 1
+                    tasks.add(asyncio.ensure_future(self._request(path, body)))
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            if not primary.done():
+                primary.cancel()
+
+    async def generate(self, messages, timeout=None):
+        """Generate a reply for a prompt/history within a deadline (seconds)."""
+        path = f"/v1beta/{self.model_id}:generateContent"
+        deadline = timeout if timeout is not None else self.timeout
+        try:
+            return await asyncio.wait_for(self._hedged(path, self.build_request(messages)), deadline)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise LLMError(f"no response within {deadline}s")
+
+    async def stream(self, messages, timeout=None):
+        """Yield reply text chunks as streamGenerateContent produces them, within a deadline."""
+        path = f"/v1beta/{self.model_id}:streamGenerateContent"
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout if timeout is not None else self.timeout)
+        client = self._ensure_client()
+        async with self._semaphore:
+            self.stats["requests"] += 1
+            try:
+                async with client.stream("POST", path, params={"alt": "sse"}, json=self.build_request(messages),
+                                         headers={"x-goog-api-key": self.api_key}) as response:
+                    if response.status_code != 200:
+                        await response.aread()
+                        self.stats["errors"] += 1
+                        raise LLMError(f"HTTP {response.status_code}: {response.text[:200]}")
+                    lines = response.aiter_lines()
+                    while True:
+                        try:
+                            line = await asyncio.wait_for(lines.__anext__(), max(deadline - loop.time(), 0))
+                        except StopAsyncIteration:
+                            break
+                        except asyncio.TimeoutError:
+                            self.stats["timeouts"] += 1
+                            raise LLMError("stream did not finish before the deadline")
+                        if line.startswith("data:"):
+                            try:
+                                event = json.loads(line[5:])
+                            except ValueError as e:
+                                self.stats["errors"] += 1
+                                raise LLMError(f"malformed stream event: {line[:200]}") from e
+                            text = extract_candidate_text(event)
+                            if text:
+                                yield text
+            except httpx.HTTPError as e:
+                self.stats["errors"] += 1
+                raise LLMError(f"stream failed: {e!r}") from e
+
+    async def aclose(self):
+        clients, self._clients, self._loop = self._clients, [], None
+        for client in clients:
+            await client.aclose()
+
+
+class BackgroundLoop:
+    """An asyncio event loop on a daemon thread, so synchronous Flask handlers can
+    share one AsyncGeminiClient (and its connection pool) across requests."""
+
+    def __init__(self):
+        self._loop = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        # Threads do not survive fork, so start one per worker process
+        if self._loop is not None and self._pid == os.getpid():
+            return self._loop
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-loop", daemon=True).start()
+                self._loop, self._pid = loop, os.getpid()
+        return self._loop
+
+    def run(self, coro, timeout=None):
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            # Cancel the abandoned call so it stops holding a concurrency slot on the loop
+            future.cancel()
+            raise
+
+    def iterate(self, agen, timeout=None):
+        """Drive an async generator from synchronous code, one item at a time."""
+        loop = self._ensure_loop()
+        pending = None
+        try:
+            while True:
+                pending = asyncio.run_coroutine_threadsafe(agen.__anext__(), loop)
+                try:
+                    item = pending.result(timeout)
+                except StopAsyncIteration:
+                    return
+                pending = None
+                yield item
+        finally:
+            if pending is not None:
+                pending.cancel()  # a timed-out __anext__ is still running on the loop
+            self.run(_settle_and_close(agen), timeout)
+
+
+async def _settle_and_close(agen):
+    # A cancelled __anext__ takes a few loop steps to unwind; aclose() before that
+    # raises "asynchronous generator is already running"
+    while agen.ag_running:
+        await asyncio.sleep(0.001)
+    await agen.aclose()
@@ -0,0 +1,80 @@
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class AnalyzedMessage:
+    """Request-scoped analysis of one incoming message.
+
+    Tokens, the bag-of-words vector and classifier probabilities are computed
+    lazily and at most once, so every routing stage can share them. Time spent
+    in each stage is recorded in `timings` (seconds).
+    """
+
+    def __init__(self, text, tokenizer, encoder=None, classifier=None, tags=None, sparse_bag=False):
+        self.text = text
+        self.tokenizer = tokenizer
+        self.encoder = encoder
+        self.classifier = classifier  # callable: bag vector -> probability vector
+        self.tags = tags
+        self.sparse_bag = sparse_bag  # bag is an (indices, values) pair instead of a dense vector
+        self.timings = {}
+        self._tokens = None
+        self._bag = None
+        self._probabilities = None
+
+    def attach_classifier(self, encoder, classifier, tags, sparse_bag=False):
+        """Provide the classifier after construction (e.g. when it is loaded lazily)."""
+        self.encoder = encoder
+        self.classifier = classifier
+        self.tags = tags
+        self.sparse_bag = sparse_bag
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block and add it to timings[name]."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    @property
+    def tokens(self):
+        if self._tokens is None:
+            with self.stage("tokenize"):
+                self._tokens = self.tokenizer(self.text)
+        return self._tokens
+
+    @property
+    def bag(self):
+        if self._bag is None and self.encoder is not None:
+            tokens = self.tokens
+            with self.stage("encode"):
+                self._bag = self.encoder.encode(tokens, sparse=self.sparse_bag)
+        return self._bag
+
+    @property
+    def can_classify(self):
+        return self.classifier is not None and self.encoder is not None and bool(self.tags)
+
+    @property
+    def probabilities(self):
+        if self._probabilities is None and self.can_classify:
+            bag = self.bag
+            with self.stage("classify"):
+                self._probabilities = np.asarray(self.classifier(bag), dtype=np.float32)
+        return self._probabilities
+
+    @property
+    def prediction(self):
+        """(tag, probability) of the top class, or (None, 0.0) without a classifier."""
+        probs = self.probabilities
+        if probs is None:
+            return None, 0.0
+        idx = int(np.argmax(probs))
+        return self.tags[idx], float(probs[idx])
+
+    def timings_ms(self):
+        return {name: round(seconds * 1000, 3) for name, seconds in self.timings.items()}
@@ -0,0 +1,141 @@
+import bisect
+import threading
+
+
+# Default latency buckets in seconds (0.1 ms .. 10 s)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Thread-safe cumulative histogram with fixed upper-bound buckets."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[slot] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        """Return {"buckets": [(upper_bound, cumulative_count), ...], "sum", "count"}.
+
+        The overflow bucket is reported with the upper bound "+Inf" so the
+        snapshot stays JSON-serializable.
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative, running = [], 0
+        for bound, c in zip(self.buckets + ("+Inf",), counts):
+            running += c
+            cumulative.append((bound, running))
+        return {"buckets": cumulative, "sum": total, "count": count}
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [(n, str(v)) for n, v in zip(names, values)] + list(extra)
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{n}="{v}"' for (n, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == "+Inf":
+        return value
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Thread-safe monotonically increasing counter, one value per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [(self.name, _format_labels(self.labelnames, labels), value) for labels, value in values]
+
+
+class HistogramVec:
+    """One Histogram per label combination, created on first use."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *labelvalues):
+        histogram = self._histograms.get(labelvalues)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(labelvalues, Histogram(self.buckets))
+        return histogram
+
+    def observe(self, value, *labelvalues):
+        self.labels(*labelvalues).observe(value)
+
+    def samples(self):
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+        samples = []
+        for labels, histogram in histograms:
+            snap = histogram.snapshot()
+            for bound, count in snap["buckets"]:
+                le = ("le", _format_value(bound))
+                samples.append((self.name + "_bucket", _format_labels(self.labelnames, labels, [le]), count))
+            samples.append((self.name + "_sum", _format_labels(self.labelnames, labels), snap["sum"]))
+            samples.append((self.name + "_count", _format_labels(self.labelnames, labels), snap["count"]))
+        return samples
+
+
+class Registry:
+    """A set of metrics rendered together in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self.register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(HistogramVec(name, help_text, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in metric.samples())
+        return "\n".join(lines) + "\n"
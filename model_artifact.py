@@ -0,0 +1,236 @@
+"""Versioned binary classifier artifact (data.bin), opened with mmap.
+
+    python model_artifact.py [data.pth] [data.bin]
+    python model_artifact.py data.int8.npz data.int8.bin
+
+Layout (little-endian):
+
+    0   magic b"CHATMDL\\0"
+    8   uint32 format version
+    12  uint32 length of the JSON directory
+    16  32-byte sha256 of everything after this header (directory + sections)
+    48  JSON directory: source_sha256, num_layers and, per section, its
+        offset, dtype and shape
+    ... sections, each 64-byte aligned
+
+Sections are the folded layer weights (w{i}, b{i}, and s{i} for int8 layers)
+and two string tables, vocab_* and tags_*. A string table is one UTF-8 blob
+plus a uint32 offsets array. The vocabulary also gets an open-addressing hash
+index (crc32, linear probing), so words are looked up straight from the
+mapped file.
+
+The loader maps the file read-only and wraps the sections with
+np.frombuffer. Nothing is parsed or copied into the Python heap, and every
+worker process shares the same page-cache pages.
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from nltk_utils import BagOfWordsEncoder
+from numpy_classifier import NumpyClassifier, file_sha256, load_numpy_classifier, npz_source_hash
+
+ARTIFACT_MAGIC = b"CHATMDL\x00"
+ARTIFACT_FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sII32s")
+ALIGNMENT = 64
+
+
+def _uint32_view(array):
+    """Index a uint32 array as Python ints (much faster than numpy scalar indexing); no copy on little-endian hosts."""
+    return memoryview(np.ascontiguousarray(array, dtype=np.uint32)).cast("B").cast("I")
+
+
+class StringTable:
+    """Read-only sequence of strings stored as a UTF-8 blob and an offsets array.
+
+    With `slots` (the hash index written by build_string_table) it also
+    supports get(word) -> position, so it can stand in for the vocabulary dict
+    of a BagOfWordsEncoder.
+    """
+
+    def __init__(self, offsets, data, slots=None):
+        self.offsets = _uint32_view(offsets)
+        self.blob = memoryview(data)
+        self.slots = None if slots is None else _uint32_view(slots)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("string table index out of range")
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def get(self, word, default=None):
+        if self.slots is None:
+            raise TypeError("string table was written without a hash index")
+        key = word.encode("utf-8")
+        slots, offsets, blob = self.slots, self.offsets, self.blob
+        mask = len(slots) - 1
+        slot = zlib.crc32(key) & mask
+        while True:
+            entry = slots[slot]
+            if entry == 0:
+                return default
+            idx = entry - 1
+            if blob[offsets[idx]:offsets[idx + 1]] == key:
+                return idx
+            slot = (slot + 1) & mask
+
+    def __contains__(self, word):
+        return self.get(word) is not None
+
+
+def build_string_table(strings, with_index=False):
+    """Arrays for a StringTable: offsets, data and, with_index, hash slots (entry = position + 1)."""
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    arrays = {"offsets": offsets, "data": np.frombuffer(b"".join(encoded), dtype=np.uint8)}
+    if with_index:
+        size = 1 << max(1, (2 * len(encoded) - 1).bit_length())  # load factor <= 0.5
+        slots = np.zeros(size, dtype="<u4")
+        for idx, key in enumerate(encoded):
+            slot = zlib.crc32(key) & (size - 1)
+            while slots[slot]:
+                slot = (slot + 1) & (size - 1)
+            slots[slot] = idx + 1
+        arrays["slots"] = slots
+    return arrays
+
+
+def write_artifact(path, layers, all_words, tags, source_sha256=""):
+    """Write NumpyClassifier-style layers and labels to `path` (atomically, via rename)."""
+    sections = {}
+    for i, (weight, bias, scale) in enumerate(layers):
+        sections[f"w{i}"] = np.ascontiguousarray(weight)
+        sections[f"b{i}"] = np.ascontiguousarray(bias, dtype="<f4")
+        if scale is not None:
+            sections[f"s{i}"] = np.ascontiguousarray(scale, dtype="<f4")
+    for name, strings, with_index in (("vocab", all_words, True), ("tags", tags, False)):
+        for key, array in build_string_table(strings, with_index).items():
+            sections[f"{name}_{key}"] = array
+
+    # Section offsets depend on the directory length, which depends on the offsets; iterate until stable
+    directory_length = 0
+    while True:
+        position = HEADER.size + directory_length
+        entries = {}
+        for name, array in sections.items():
+            position = -(-position // ALIGNMENT) * ALIGNMENT
+            entries[name] = {"offset": position, "dtype": array.dtype.str, "shape": list(array.shape)}
+            position += array.nbytes
+        directory = json.dumps({"source_sha256": source_sha256, "num_layers": len(layers),
+                                "sections": entries}, separators=(",", ":")).encode("utf-8")
+        if len(directory) <= directory_length:
+            break
+        directory_length = len(directory) + 64  # slack so the offsets' digit count can grow
+
+    content = bytearray(position - HEADER.size)
+    content[:len(directory)] = directory
+    content[len(directory):directory_length] = b" " * (directory_length - len(directory))
+    for name, array in sections.items():
+        start = entries[name]["offset"] - HEADER.size
+        content[start:start + array.nbytes] = array.tobytes()
+    digest = hashlib.sha256(content).digest()
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(ARTIFACT_MAGIC, ARTIFACT_FORMAT_VERSION, directory_length, digest))
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_directory(path):
+    """(header fields, directory) of an artifact, reading only its first bytes."""
+    with open(path, "rb") as f:
+        magic, version, directory_length, digest = HEADER.unpack(f.read(HEADER.size))
+        if magic != ARTIFACT_MAGIC:
+            raise ValueError(f"{path} is not a model artifact")
+        if version != ARTIFACT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported model artifact version {version} in {path}")
+        directory = json.loads(f.read(directory_length))
+    return {"version": version, "content_sha256": digest.hex()}, directory
+
+
+def artifact_source_hash(path):
+    """sha256 of the data.pth the artifact was converted from."""
+    return read_directory(path)[1]["source_sha256"]
+
+
+def load_artifact(path, verify=True):
+    """Map `path` and return a NumpyClassifier whose weights and vocabulary live in the mapping.
+
+    verify checks the content hash, which reads (and so pages in) the whole file.
+    """
+    header, directory = read_directory(path)
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if verify and hashlib.sha256(memoryview(mapped)[HEADER.size:]).hexdigest() != header["content_sha256"]:
+        raise ValueError(f"{path} is corrupt (content hash mismatch)")
+
+    def section(name):
+        entry = directory["sections"][name]
+        dtype = np.dtype(entry["dtype"])
+        count = int(np.prod(entry["shape"], dtype=np.int64))
+        return np.frombuffer(mapped, dtype=dtype, count=count, offset=entry["offset"]).reshape(entry["shape"])
+
+    sections = directory["sections"]
+    layers = [(section(f"w{i}"), section(f"b{i}"), section(f"s{i}") if f"s{i}" in sections else None)
+              for i in range(directory["num_layers"])]
+    vocab = StringTable(section("vocab_offsets"), section("vocab_data"), section("vocab_slots"))
+    tags = list(StringTable(section("tags_offsets"), section("tags_data")))
+    classifier = NumpyClassifier(layers, vocab, tags, encoder=BagOfWordsEncoder(vocab, index=vocab))
+    classifier.content_sha256 = header["content_sha256"]
+    classifier.source_sha256 = directory["source_sha256"]
+    return classifier
+
+
+def export_artifact(source_path, artifact_path):
+    """Convert data.pth, or an existing data.npz export (e.g. a parity-gated int8 one), to a binary artifact."""
+    if source_path.endswith(".npz"):
+        classifier = load_numpy_classifier(source_path)
+        source_sha256 = npz_source_hash(source_path)
+    else:
+        import torch
+
+        from export_model import fold_neural_net
+
+        model_data = torch.load(source_path, map_location=torch.device('cpu'))
+        classifier = NumpyClassifier(fold_neural_net(model_data["model_state"]),
+                                     model_data["all_words"], model_data["tags"])
+        source_sha256 = file_sha256(source_path)
+    write_artifact(artifact_path, classifier.layers, classifier.all_words, classifier.tags,
+                   source_sha256=source_sha256)
+    print(f"Converted {source_path} -> {artifact_path} ({os.path.getsize(artifact_path)} bytes, "
+          f"{len(classifier.all_words)} words, {len(classifier.tags)} tags, "
+          f"{'int8' if classifier.quantized else 'float32'})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert data.pth to the mmap-able binary model artifact")
+    parser.add_argument("source_path", nargs="?", default="data.pth", help="data.pth or a data.npz export")
+    parser.add_argument("artifact_path", nargs="?", default="data.bin")
+    args = parser.parse_args()
+    export_artifact(args.source_path, args.artifact_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,36 @@
 import numpy as np
 import nltk
+import os
 import string
 import re
+from functools import lru_cache
 from nltk.stem.porter import PorterStemmer
 from nltk.corpus import stopwords
 from nltk.tokenize.treebank import TreebankWordDetokenizer
 
 stemmer = PorterStemmer()
 
+# NLTK resources used by the pipeline, as (nltk.data path, download package)
+NLTK_RESOURCES = [
+    ("tokenizers/punkt", "punkt"),
+    ("tokenizers/punkt_tab", "punkt_tab"),
+    ("corpora/stopwords", "stopwords"),
+]
+
+def ensure_nltk_data(resources=NLTK_RESOURCES):
+    """Download NLTK resources only when they are not already installed locally.
+
+    nltk.download contacts the index server even for installed packages, which
+    makes every cold start pay a network round trip.
+    """
+    for path, package in resources:
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            nltk.download(package, quiet=True)
+
 # Download resources if not already downloaded
-nltk.download("punkt")
-nltk.download("stopwords")
+ensure_nltk_data()
 
 stop_words = set(stopwords.words("english"))
 punctuation = set(string.punctuation)
@@ -47,22 +67,53 @@ contractions = {
     "mustn't": "must not",
 }
 
+# Shared, precompiled helpers for the tokenize pipeline
+detokenizer = TreebankWordDetokenizer()
+whitespace_re = re.compile(r"\s+")
+punctuation_re = re.compile(r"[^\w\s]")
+
+# Cache sizes; chatbot traffic is highly repetitive so whole messages are memoized
+TOKENIZE_CACHE_SIZE = int(os.getenv("TOKENIZE_CACHE_SIZE", "4096"))
+STEM_CACHE_SIZE = int(os.getenv("STEM_CACHE_SIZE", "16384"))
+
 def expand_contractions(sentence):
     words = sentence.split()
+    if not any(word in contractions for word in words):
+        return sentence  # Nothing to expand; skip the detokenize round trip
     expanded_words = [contractions[word] if word in contractions else word for word in words]
-    return TreebankWordDetokenizer().detokenize(expanded_words)
+    return detokenizer.detokenize(expanded_words)
+
+@lru_cache(maxsize=TOKENIZE_CACHE_SIZE)
+def _tokenize_normalized(sentence):
+    sentence = expand_contractions(sentence)  # Expand contractions
+    sentence = punctuation_re.sub("", sentence)  # Remove punctuation
+    return tuple(stem(word) for word in nltk.word_tokenize(sentence) if word not in stop_words)
 
 # Clean & tokenize text
 def tokenize(sentence):
-    sentence = sentence.lower()
-    sentence = expand_contractions(sentence)  # Expand contractions
-    sentence = re.sub(r"\s+", " ", sentence)  # Normalize spaces
-    sentence = re.sub(r"[^\w\s]", "", sentence)  # Remove punctuation
-    return [stem(word) for word in nltk.word_tokenize(sentence) if word not in stop_words]
+    sentence = whitespace_re.sub(" ", sentence.lower()).strip()  # Normalize case & spaces
+    return list(_tokenize_normalized(sentence))
+
+@lru_cache(maxsize=STEM_CACHE_SIZE)
+def _stem_lower(word):
+    return stemmer.stem(word)
 
 # Stem a word
 def stem(word):
-    return stemmer.stem(word.lower())
+    return _stem_lower(word.lower())
+
+def tokenize_cache_info():
+    """Hit/miss counters for the message and stem caches, for sizing them."""
+    info = {}
+    for name, cached in (("tokenize", _tokenize_normalized), ("stem", _stem_lower)):
+        stats = cached.cache_info()
+        info[name] = {"hits": stats.hits, "misses": stats.misses,
+                      "size": stats.currsize, "maxsize": stats.maxsize}
+    return info
+
+def clear_tokenize_cache():
+    _tokenize_normalized.cache_clear()
+    _stem_lower.cache_clear()
 
 # Bag of words with optional frequency weighting
 def bag_of_words(tokenized_sentence, words_vocab, use_frequency=False):
@@ -80,3 +131,62 @@ def bag_of_words(tokenized_sentence, words_vocab, use_frequency=False):
             else:
                 bag[idx] = 1.0  # binary presence
     return bag
+
+
+class BagOfWordsEncoder:
+    """Vocabulary hash map that builds bag-of-words vectors in O(sentence length).
+
+    Produces the same vectors as bag_of_words (tokens are stemmed again so
+    vectors line up with the trained vocabulary), but looks words up in a dict
+    instead of scanning the whole vocabulary for every sentence. `index` may
+    be any prebuilt word -> position lookup with .get(), such as
+    model_artifact.StringTable, so no per-process dict is built.
+    """
+
+    def __init__(self, words_vocab, index=None):
+        if index is None:
+            self.words_vocab = list(words_vocab)
+            self.index = {word: idx for idx, word in enumerate(self.words_vocab)}
+        else:
+            self.words_vocab = words_vocab
+            self.index = index
+
+    def __len__(self):
+        return len(self.words_vocab)
+
+    def _indices(self, tokenized_sentence):
+        index = self.index
+        ids = [index.get(stem(word)) for word in tokenized_sentence]
+        return [i for i in ids if i is not None]
+
+    def encode(self, tokenized_sentence, use_frequency=False, sparse=False):
+        """Encode one tokenized sentence.
+
+        Returns a dense float32 vector, or an (indices, counts) pair of arrays
+        sorted by vocabulary index when sparse=True.
+        """
+        ids = np.asarray(self._indices(tokenized_sentence), dtype=np.int64)
+        if sparse:
+            indices, counts = np.unique(ids, return_counts=True)
+            values = counts.astype(np.float32) if use_frequency else np.ones(len(indices), dtype=np.float32)
+            return indices, values
+        bag = np.zeros(len(self.words_vocab), dtype=np.float32)
+        if use_frequency:
+            np.add.at(bag, ids, 1.0)  # frequency weight
+        else:
+            bag[ids] = 1.0  # binary presence
+        return bag
+
+    def encode_batch(self, tokenized_sentences, use_frequency=False):
+        """Encode many tokenized sentences into a single (n_sentences, vocab) matrix."""
+        rows, cols = [], []
+        for row, sentence in enumerate(tokenized_sentences):
+            ids = self._indices(sentence)
+            rows.extend([row] * len(ids))
+            cols.extend(ids)
+        matrix = np.zeros((len(tokenized_sentences), len(self.words_vocab)), dtype=np.float32)
+        if use_frequency:
+            np.add.at(matrix, (rows, cols), 1.0)
+        else:
+            matrix[rows, cols] = 1.0
+        return matrix
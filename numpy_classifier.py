@@ -0,0 +1,176 @@
+import hashlib
+
+import numpy as np
+
+from nltk_utils import BagOfWordsEncoder
+
+
+NPZ_FORMAT_VERSION = 1
+
+
+def file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def softmax(logits):
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    np.exp(shifted, out=shifted)
+    shifted /= shifted.sum(axis=1, keepdims=True)
+    return shifted
+
+
+def quantize_int8(weight):
+    """Symmetric per-output-column int8 quantization: weight ~= q * scale."""
+    max_abs = np.abs(weight).max(axis=0)
+    scale = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+    q = np.clip(np.rint(weight / scale), -127, 127).astype(np.int8)
+    return q, scale
+
+
+class NumpyClassifier:
+    """Torch-free drop-in for classifier.LocalClassifier.
+
+    `layers` is a list of (weight, bias) or (weight, bias, scale) tuples with
+    weight shaped (in, out); BatchNorm is already folded into them by
+    export_model, so inference is matmul + bias + ReLU for every layer but the
+    last, then softmax. A layer with a scale holds int8 weights (weight * scale
+    approximates the float layer).
+
+    Since weights are stored input-major, the first layer for a sparse bag is
+    just the sum of the weight rows of its active words (classify_sparse),
+    which costs O(active words) instead of O(vocabulary).
+    """
+
+    def __init__(self, layers, all_words, tags, encoder=None):
+        self.layers = []
+        for layer in layers:
+            weight, bias = layer[0], layer[1]
+            scale = layer[2] if len(layer) > 2 else None
+            if scale is None:
+                weight = np.ascontiguousarray(weight, dtype=np.float32)
+            else:
+                weight = np.ascontiguousarray(weight, dtype=np.int8)
+                scale = np.asarray(scale, dtype=np.float32)
+            self.layers.append((weight, np.asarray(bias, dtype=np.float32), scale))
+        self.model = None  # no torch module behind this classifier
+        # A prebuilt encoder (e.g. over model_artifact's mapped string table) keeps all_words as given
+        self.all_words = all_words if encoder is not None else list(all_words)
+        self.tags = list(tags)
+        self.encoder = encoder or BagOfWordsEncoder(self.all_words)
+
+    @property
+    def quantized(self):
+        return any(scale is not None for _, _, scale in self.layers)
+
+    def weight_bytes(self):
+        return sum(w.nbytes + b.nbytes + (s.nbytes if s is not None else 0) for w, b, s in self.layers)
+
+    def _forward(self, x, start=0):
+        """Apply layers[start:] to x, with ReLU after every layer but the last."""
+        last = len(self.layers) - 1
+        for i in range(start, len(self.layers)):
+            weight, bias, scale = self.layers[i]
+            x = x @ weight if scale is None else (x @ weight.astype(np.float32)) * scale
+            x += bias
+            if i < last:
+                np.maximum(x, 0.0, out=x)
+        return x
+
+    def logits(self, bags):
+        x = np.asarray(bags, dtype=np.float32)
+        if x.ndim == 1:
+            x = x[np.newaxis, :]
+        return self._forward(x)
+
+    def predict_proba(self, bags):
+        """Class probabilities for a (n, vocab) matrix of bags in one forward pass."""
+        return softmax(self.logits(bags))
+
+    def classify_bag(self, bag):
+        """Class probabilities for a single bag-of-words vector."""
+        return self.predict_proba(bag)[0]
+
+    def classify_sparse(self, indices, values=None):
+        """Class probabilities for a bag given as active vocabulary indices (and optional counts)."""
+        weight, bias, scale = self.layers[0]
+        rows = weight[np.asarray(indices, dtype=np.int64)]
+        if values is None:
+            hidden = rows.sum(axis=0, dtype=np.int32 if scale is not None else np.float32).astype(np.float32)
+        else:
+            hidden = np.asarray(values, dtype=np.float32) @ rows.astype(np.float32, copy=False)
+        if scale is not None:
+            hidden *= scale
+        hidden += bias
+        if len(self.layers) > 1:
+            np.maximum(hidden, 0.0, out=hidden)
+        return softmax(self._forward(hidden[np.newaxis, :], start=1))[0]
+
+    def classify_batch(self, tokenized_messages, top_k=3):
+        """Same output as LocalClassifier.classify_batch, without torch."""
+        if not tokenized_messages:
+            return []
+        probs = self.predict_proba(self.encoder.encode_batch(tokenized_messages))
+        k = max(1, min(top_k, len(self.tags)))
+        top_indices = np.argsort(-probs, axis=1, kind="stable")[:, :k]
+        results = []
+        for row_probs, row_indices in zip(probs, top_indices):
+            alternatives = [{"tag": self.tags[idx], "probability": float(row_probs[idx])}
+                            for idx in row_indices]
+            results.append({
+                "tag": alternatives[0]["tag"],
+                "probability": alternatives[0]["probability"],
+                "alternatives": alternatives,
+            })
+        return results
+
+
+def load_numpy_classifier(path):
+    """Load a classifier exported by export_model.py (data.npz, float32 or int8)."""
+    with np.load(path, allow_pickle=False) as data:
+        version = int(data["format_version"])
+        if version != NPZ_FORMAT_VERSION:
+            raise ValueError(f"Unsupported model artifact version {version} in {path}")
+        layers = [(data[f"w{i}"], data[f"b{i}"], data[f"s{i}"] if f"s{i}" in data.files else None)
+                  for i in range(int(data["num_layers"]))]
+        return NumpyClassifier(layers, data["all_words"].tolist(), data["tags"].tolist())
+
+
+def quantized_copy(classifier):
+    """An int8 version of a float NumpyClassifier (biases stay float32)."""
+    layers = []
+    for weight, bias, scale in classifier.layers:
+        if scale is None:
+            weight, scale = quantize_int8(weight)
+        layers.append((weight, bias, scale))
+    return NumpyClassifier(layers, classifier.all_words, classifier.tags)
+
+
+def quantization_parity(reference, quantized, bags, confidence=0.6, min_agreement=0.99, max_prob_diff=0.05):
+    """Compare a quantized classifier with its float reference on `bags`.
+
+    The gated number is decision agreement: routing only uses a prediction at
+    or above `confidence` (predict_model_response's threshold), so a bag
+    agrees when both models give the same confident tag or both abstain.
+    Top-1 flips among low-probability near-ties are reported but not gated.
+    """
+    expected = reference.predict_proba(bags)
+    actual = quantized.predict_proba(bags)
+
+    def decisions(probs):
+        return np.where(probs.max(axis=1) >= confidence, probs.argmax(axis=1), -1)
+
+    agreement = float((decisions(expected) == decisions(actual)).mean())
+    diff = float(np.abs(expected - actual).max())
+    return {
+        "decision_agreement": agreement,
+        "top1_agreement": float((expected.argmax(axis=1) == actual.argmax(axis=1)).mean()),
+        "max_prob_diff": diff,
+        "passed": agreement >= min_agreement and diff <= max_prob_diff,
+    }
+
+
+def npz_source_hash(path):
+    """sha256 of the data.pth an exported artifact was built from."""
+    with np.load(path, allow_pickle=False) as data:
+        return str(data["source_sha256"])
@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """Size-bounded LRU cache with per-entry TTL and optional SQLite persistence.
+
+    Entries live in an OrderedDict for O(1) lookups; when db_path is given every
+    write is mirrored to SQLite and unexpired entries are reloaded on startup,
+    so cached answers survive restarts.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=86400, db_path=None, clock=time.time):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.db_path = db_path
+        self._db = None
+        self._db_pid = None
+        if db_path:
+            self._connection().execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.commit()
+            self._load()
+
+    def _connection(self):
+        # A connection must not be used across fork(), e.g. after gunicorn preload_app; reopen per process
+        if self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _load(self):
+        now = self.clock()
+        self._connection().execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+        rows = self._db.execute(
+            "SELECT key, value, expires_at FROM response_cache ORDER BY created_at DESC LIMIT ?",
+            (self.max_entries,),
+        ).fetchall()
+        self._db.commit()
+        for key, value, expires_at in reversed(rows):
+            self._entries[key] = (value, expires_at)
+
+    def get(self, key):
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                self._delete(key)
+                if self._db is not None:
+                    self._connection().commit()
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        now = self.clock()
+        expires_at = now + self.ttl_seconds
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            if self._db is not None:
+                self._connection().execute(
+                    "INSERT OR REPLACE INTO response_cache (key, value, expires_at, created_at) VALUES (?, ?, ?, ?)",
+                    (key, value, expires_at, now),
+                )
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._delete(oldest)
+                self.evictions += 1
+            if self._db is not None:
+                self._connection().commit()
+
+    def _delete(self, key):
+        self._entries.pop(key, None)
+        if self._db is not None:
+            self._connection().execute("DELETE FROM response_cache WHERE key = ?", (key,))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "persistent": self._db is not None,
+        }
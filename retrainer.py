@@ -0,0 +1,188 @@
+import importlib.util
+import os
+import threading
+import time
+import traceback
+
+import numpy as np
+
+from nltk_utils import tokenize
+
+
+def extend_neural_net(model, input_size, output_size):
+    """Grow a NeuralNet's vocabulary (fc1 inputs) and tag set (fc3 outputs) in place.
+
+    Every trained weight is kept. New input columns start at zero, so words
+    the model has never seen do not move existing predictions until they are
+    trained; new output rows use nn.Linear's default initialisation.
+    """
+    import torch
+    import torch.nn as nn
+
+    old_inputs, hidden = model.fc1.in_features, model.fc1.out_features
+    old_outputs = model.fc3.out_features
+    with torch.no_grad():
+        if input_size > old_inputs:
+            fc1 = nn.Linear(input_size, hidden)
+            fc1.weight.zero_()
+            fc1.weight[:, :old_inputs] = model.fc1.weight
+            fc1.bias.copy_(model.fc1.bias)
+            model.fc1 = fc1
+        if output_size > old_outputs:
+            fc3 = nn.Linear(model.fc3.in_features, output_size)
+            fc3.weight[:old_outputs] = model.fc3.weight
+            fc3.bias[:old_outputs] = model.fc3.bias
+            model.fc3 = fc3
+    return model
+
+
+def extend_labels(all_words, tags, xy):
+    """Append the stems and tags of (tokens, tag) pairs that the model does not know yet.
+
+    Existing entries keep their index, so the trained weights stay aligned.
+    """
+    import train
+
+    known_words, known_tags = set(all_words), set(tags)
+    new_words = [w for w in train.vocabulary(xy) if w not in known_words]
+    new_tags = sorted(set(tag for _, tag in xy) - known_tags)
+    return list(all_words) + new_words, list(tags) + new_tags
+
+
+class IncrementalTrainer:
+    """Warm-start fine-tuning of data.pth on the current intents, in a background thread.
+
+    request() only records what changed; the worker extends the saved model
+    with any new words/tags, fine-tunes it on every pattern with
+    train.train_model_vectorized, writes data.pth (and data.npz / data.bin
+    when npz_path / artifact_path are set) via rename, then calls
+    on_trained(model, all_words, tags, info).
+    Requests arriving while a run is in progress are coalesced into one
+    follow-up run.
+
+    The saved model already fits the old patterns, so a validation split
+    would mostly measure forgetting and early stopping would roll the new
+    intent back; instead the new patterns are repeated new_pattern_weight
+    times (old ones are replayed once) for a fixed number of epochs.
+    """
+
+    def __init__(self, model_path, load_intents, on_trained, npz_path=None, epochs=200, batch_size=8,
+                 learning_rate=0.005, new_pattern_weight=3, artifact_path=None):
+        self.model_path = model_path
+        self.load_intents = load_intents  # callable returning the intents.json dict
+        self.on_trained = on_trained
+        self.npz_path = npz_path
+        self.artifact_path = artifact_path
+        self.epochs = epochs
+        self.batch_size = batch_size
+        self.learning_rate = learning_rate
+        self.new_pattern_weight = new_pattern_weight
+        self._pending = threading.Event()
+        self._new_patterns = set()  # (tag, pattern) pairs added since the last run
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.last_run = None
+
+    def unavailable_reason(self):
+        """Why a retrain cannot run in this process (no torch, no saved model), or None."""
+        if importlib.util.find_spec("torch") is None:
+            return "PyTorch is not installed"
+        if not os.path.exists(self.model_path):
+            return f"no trained model at {self.model_path}"
+        return None
+
+    def request(self, tag=None, patterns=()):
+        """Schedule a retrain, emphasising the given new patterns; returns immediately."""
+        with self._lock:
+            self._new_patterns.update((tag, pattern) for pattern in patterns)
+            if self._worker is None or self._worker_pid != os.getpid() or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="incremental-trainer", daemon=True)
+                self._worker_pid = os.getpid()
+                self._worker.start()
+        self._pending.set()
+
+    def _run(self):
+        while True:
+            self._pending.wait()
+            self._pending.clear()
+            self.running = True
+            try:
+                self.retrain()
+            except Exception as e:
+                self.failures += 1
+                print(f"[retrain] failed: {e}\n" + traceback.format_exc())
+            finally:
+                self.running = False
+
+    def retrain(self):
+        """Fine-tune synchronously and hand the new model to on_trained."""
+        import torch
+        import torch.nn as nn
+        import train
+        from model import NeuralNet
+
+        start = time.perf_counter()
+        model_data = torch.load(self.model_path, map_location=torch.device('cpu'))
+        model = NeuralNet(model_data["input_size"], model_data["hidden_size"], model_data["output_size"])
+        model.load_state_dict(model_data["model_state"])
+
+        with self._lock:
+            new_patterns, self._new_patterns = self._new_patterns, set()
+        new_keys = {(tag, tuple(tokenize(pattern))) for tag, pattern in new_patterns}
+        xy = train.tokenize_patterns(self.load_intents())
+        all_words, tags = extend_labels(model_data["all_words"], model_data["tags"], xy)
+        extend_neural_net(model, len(all_words), len(tags))
+
+        X, y = train.encode_patterns(xy, all_words, tags)
+        is_new = np.array([(tag, tuple(tokens)) in new_keys for tokens, tag in xy], dtype=bool)
+        X_fit = np.vstack([X] + [X[is_new]] * (self.new_pattern_weight - 1))
+        y_fit = np.concatenate([y] + [y[is_new]] * (self.new_pattern_weight - 1))
+        criterion = nn.CrossEntropyLoss()
+        optimizer = torch.optim.Adam(model.parameters(), lr=self.learning_rate)
+        model, info = train.train_model_vectorized(model, X_fit, y_fit, criterion, optimizer,
+                                                   torch.device("cpu"), self.epochs, self.batch_size)
+        X_t, y_t = torch.as_tensor(X), torch.as_tensor(y, dtype=torch.long)
+        info["accuracy"] = train.evaluate(model, X_t, y_t, criterion)[1]
+        if is_new.any():
+            info["new_pattern_accuracy"] = train.evaluate(model, X_t[is_new], y_t[is_new], criterion)[1]
+        model.eval()
+
+        # Per-process temporary names: gunicorn workers may retrain at the same time, and a
+        # shared name would let one worker's os.replace publish another's half-written file
+        tmp_path = f"{self.model_path}.{os.getpid()}.tmp"
+        train.save_model(model, tmp_path, len(all_words), model_data["hidden_size"], len(tags), all_words, tags)
+        os.replace(tmp_path, self.model_path)
+        if self.npz_path:
+            from export_model import export_npz
+            tmp_npz = f"{self.npz_path}.{os.getpid()}.tmp.npz"
+            export_npz(self.model_path, tmp_npz)
+            os.replace(tmp_npz, self.npz_path)
+        if self.artifact_path:
+            from model_artifact import export_artifact
+            export_artifact(self.model_path, self.artifact_path)  # written to a temporary file and renamed
+
+        info.update({
+            "seconds": time.perf_counter() - start,
+            "new_words": len(all_words) - len(model_data["all_words"]),
+            "new_tags": tags[len(model_data["tags"]):],
+            "finished_at": time.time(),
+        })
+        self.runs += 1
+        self.last_run = info
+        print(f"[retrain] fine-tuned in {info['seconds']:.1f}s over {info['epochs']} epochs; "
+              f"+{info['new_words']} words, new tags {info['new_tags']}")
+        self.on_trained(model, all_words, tags, info)
+        return info
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "pending": self._pending.is_set(),
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_run": self.last_run,
+        }
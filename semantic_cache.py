@@ -0,0 +1,103 @@
+import threading
+import zlib
+
+import numpy as np
+
+from nltk_utils import stem
+
+
+class SemanticCache:
+    """Near-duplicate answer cache over bag-of-words vectors.
+
+    Questions are embedded with the classifier vocabulary (BagOfWordsEncoder)
+    plus `hash_dims` feature-hashed slots for out-of-vocabulary stems, so two
+    questions only match when their unknown words agree too. Entry vectors are
+    binary and L2-normalized, stored feature-major in one NumPy matrix
+    (features x entries); since a query only has a handful of active features,
+    its cosine against every entry is the sum of those few matrix rows, which
+    stays sub-millisecond at tens of thousands of entries. When full, the
+    oldest entry is overwritten.
+    """
+
+    def __init__(self, encoder, threshold=0.9, max_entries=20000, hash_dims=256):
+        self.encoder = encoder
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hash_dims = hash_dims
+        self.dim = len(encoder) + hash_dims
+        self._matrix = np.zeros((self.dim, min(max_entries, 1024)), dtype=np.float32)
+        self._features = [None] * self._matrix.shape[1]  # active feature ids per entry
+        self._answers = [None] * self._matrix.shape[1]
+        self._size = 0
+        self._next = 0  # slot to write next (ring buffer once full)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def features(self, tokens):
+        """Sorted ids of the active features of a tokenized question."""
+        vocab_size = len(self.encoder)
+        ids = set()
+        for token in tokens:
+            word = stem(token)
+            idx = self.encoder.index.get(word)
+            if idx is None:
+                idx = vocab_size + zlib.crc32(word.encode("utf-8")) % self.hash_dims
+            ids.add(idx)
+        return np.array(sorted(ids), dtype=np.int64)
+
+    def _grow(self):
+        capacity = min(self._matrix.shape[1] * 2, self.max_entries)
+        matrix = np.zeros((self.dim, capacity), dtype=np.float32)
+        matrix[:, :self._size] = self._matrix[:, :self._size]
+        self._matrix = matrix
+        extra = capacity - len(self._answers)
+        self._features.extend([None] * extra)
+        self._answers.extend([None] * extra)
+
+    def lookup(self, tokens):
+        """Return (answer, similarity) of the closest cached question above threshold, else (None, best)."""
+        ids = self.features(tokens)
+        with self._lock:
+            if len(ids) == 0 or self._size == 0:
+                self.misses += 1
+                return None, 0.0
+            scores = self._matrix[ids, :self._size].sum(axis=0) / np.sqrt(len(ids))
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            if similarity >= self.threshold:
+                self.hits += 1
+                return self._answers[best], similarity
+            self.misses += 1
+            return None, similarity
+
+    def add(self, tokens, answer):
+        ids = self.features(tokens)
+        if len(ids) == 0:
+            return False
+        with self._lock:
+            if self._size < self.max_entries and self._size == self._matrix.shape[1]:
+                self._grow()
+            slot = self._next
+            if self._features[slot] is not None:
+                self._matrix[self._features[slot], slot] = 0.0  # clear the overwritten entry
+            self._matrix[ids, slot] = 1.0 / np.sqrt(len(ids))
+            self._features[slot] = ids
+            self._answers[slot] = answer
+            self._size = max(self._size, slot + 1)
+            self._next = (slot + 1) % self.max_entries
+        return True
+
+    def __len__(self):
+        return self._size
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
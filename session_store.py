@@ -0,0 +1,172 @@
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+
+
+class SessionStore(ABC):
+    """Conversation history per session_id, with idle expiry and a session cap.
+
+    Backends keep at most `max_messages` (role, text) pairs per session, drop
+    sessions idle for longer than `idle_ttl` seconds and evict the least
+    recently used sessions beyond `max_sessions`.
+    """
+
+    def __init__(self, max_messages=12, idle_ttl=3600, max_sessions=10000, clock=time.time):
+        self.max_messages = max_messages
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.clock = clock
+
+    @abstractmethod
+    def history(self, session_id, limit=None):
+        """Return the most recent (role, text) pairs for a session, oldest first."""
+
+    @abstractmethod
+    def append(self, session_id, messages):
+        """Append (role, text) pairs to a session and mark it as active."""
+
+    @abstractmethod
+    def clear(self, session_id):
+        """Forget a session's history."""
+
+    @abstractmethod
+    def __len__(self):
+        """Number of live sessions."""
+
+
+class MemorySessionStore(SessionStore):
+    """In-process store: an LRU-ordered dict of bounded deques."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._sessions = OrderedDict()  # session_id -> (deque of (role, text), last_seen)
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        # Sessions are ordered by last activity, so expired ones are at the front
+        while self._sessions:
+            session_id, (_, last_seen) = next(iter(self._sessions.items()))
+            if now - last_seen <= self.idle_ttl and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.popitem(last=False)
+
+    def history(self, session_id, limit=None):
+        now = self.clock()
+        with self._lock:
+            self._evict(now)
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return []
+            messages = list(entry[0])
+        return messages[-limit:] if limit else messages
+
+    def append(self, session_id, messages):
+        now = self.clock()
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is not None and now - entry[1] <= self.idle_ttl:
+                history = entry[0]
+            else:
+                history = deque(maxlen=self.max_messages)
+            history.extend(messages)
+            self._sessions[session_id] = (history, now)
+            self._evict(now)
+
+    def clear(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Store shared by every worker process through one SQLite file (WAL mode)."""
+
+    def __init__(self, path, evict_interval=60, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.evict_interval = evict_interval
+        self._local = threading.local()
+        self._last_evict = 0.0
+        db = self._db()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, last_seen REAL NOT NULL)")
+        db.execute("CREATE TABLE IF NOT EXISTS messages ("
+                   "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, role TEXT NOT NULL, text TEXT NOT NULL)")
+        db.execute("CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id)")
+        db.execute("CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)")
+        db.commit()
+
+    def _db(self):
+        # sqlite3 connections must not be shared between threads
+        db = getattr(self._local, "db", None)
+        if db is None or getattr(self._local, "pid", None) != os.getpid():
+            db = sqlite3.connect(self.path, timeout=10)
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def _evict(self, db, now):
+        if now - self._last_evict < self.evict_interval:
+            return
+        self._last_evict = now
+        db.execute("DELETE FROM sessions WHERE last_seen < ?", (now - self.idle_ttl,))
+        db.execute("DELETE FROM sessions WHERE session_id IN ("
+                   "SELECT session_id FROM sessions ORDER BY last_seen DESC LIMIT -1 OFFSET ?)",
+                   (self.max_sessions,))
+        db.execute("DELETE FROM messages WHERE session_id NOT IN (SELECT session_id FROM sessions)")
+
+    def history(self, session_id, limit=None):
+        now = self.clock()
+        db = self._db()
+        row = db.execute("SELECT last_seen FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None or now - row[0] > self.idle_ttl:
+            return []
+        limit = min(limit, self.max_messages) if limit else self.max_messages
+        rows = db.execute("SELECT role, text FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                          (session_id, limit)).fetchall()
+        return list(reversed(rows))
+
+    def append(self, session_id, messages):
+        now = self.clock()
+        db = self._db()
+        with db:
+            row = db.execute("SELECT last_seen FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is not None and now - row[0] > self.idle_ttl:
+                db.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            db.execute("INSERT OR REPLACE INTO sessions (session_id, last_seen) VALUES (?, ?)", (session_id, now))
+            db.executemany("INSERT INTO messages (session_id, role, text) VALUES (?, ?, ?)",
+                           [(session_id, role, text) for role, text in messages])
+            db.execute("DELETE FROM messages WHERE session_id = ? AND id NOT IN ("
+                       "SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                       (session_id, session_id, self.max_messages))
+            self._evict(db, now)
+
+    def clear(self, session_id):
+        db = self._db()
+        with db:
+            db.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def __len__(self):
+        return self._db().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def create_session_store(max_messages):
+    """Build the session store selected by SESSION_BACKEND ("memory" or "sqlite")."""
+    options = {
+        "max_messages": max_messages,
+        "idle_ttl": float(os.getenv("SESSION_IDLE_TTL", "3600")),
+        "max_sessions": int(os.getenv("MAX_SESSIONS", "10000")),
+    }
+    backend = os.getenv("SESSION_BACKEND", "memory")
+    if backend == "sqlite":
+        path = os.getenv("SESSION_DB", os.path.join(os.path.dirname(__file__), "sessions.sqlite"))
+        return SQLiteSessionStore(path, **options)
+    if backend != "memory":
+        raise ValueError(f"Unknown SESSION_BACKEND '{backend}'")
+    return MemorySessionStore(**options)
@@ -0,0 +1,1058 @@
+import json
+import os
+import random
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from intent_index import IntentIndex, StoreIndexLoader
+from message_analysis import AnalyzedMessage
+import nltk_utils
+from nltk_utils import BagOfWordsEncoder, bag_of_words
+
+
+def simple_tokenize(sentence):
+    return sentence.lower().replace("?", "").split()
+
+
+def write_intents(path, intents):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"intents": intents}, f)
+
+
+SAMPLE_INTENTS = [
+    {"tag": "greeting", "patterns": ["Hi", "Hello there"], "responses": ["Hello!"]},
+    {"tag": "department_head", "patterns": ["Who is the head of department?"], "responses": ["Dr. Michael"]},
+]
+
+
+def test_intent_index_pretokenizes_patterns():
+    index = IntentIndex({"intents": SAMPLE_INTENTS}, simple_tokenize)
+    assert [p[:3] for p in index.patterns] == [
+        ("greeting", "Hi", frozenset({"hi"})),
+        ("greeting", "Hello there", frozenset({"hello", "there"})),
+        ("department_head", "Who is the head of department?",
+         frozenset({"who", "is", "the", "head", "of", "department"})),
+    ]
+    assert index.responses_for("greeting") == ["Hello!"]
+    assert index.responses_for("missing") == []
+
+
+def test_intent_index_rebuilds_only_on_change(tmp_path):
+    from intent_store import IntentStore
+
+    path = tmp_path / "intents.json"
+    write_intents(path, SAMPLE_INTENTS)
+    calls = []
+
+    def counting_tokenize(sentence):
+        calls.append(sentence)
+        return simple_tokenize(sentence)
+
+    store = IntentStore(str(path), refresh_interval=0)
+    loader = StoreIndexLoader(store, counting_tokenize)
+    first = loader.get()
+    assert loader.get() is first
+    assert len(calls) == 3
+
+    store.add_intent({"tag": "thanks", "patterns": ["Thanks"], "responses": ["Welcome"]})
+    second = loader.get()
+    assert second is not first
+    assert second.responses_for("thanks") == ["Welcome"]
+    assert loader.get() is second
+
+
+def test_inverted_index_matches_linear_scan():
+    rng = random.Random(7)
+    vocab = [f"w{i}" for i in range(60)]
+    intents = []
+    for i in range(40):
+        patterns = [" ".join(rng.sample(vocab, rng.randint(1, 5))) for _ in range(rng.randint(1, 6))]
+        responses = [f"r{i}"] if i % 7 else []
+        intents.append({"tag": "default" if i == 3 else f"t{i % 30}", "patterns": patterns, "responses": responses})
+    with open(os.path.join(os.path.dirname(__file__), "intents.json"), encoding="utf-8") as f:
+        intents.extend(json.load(f)["intents"])
+    index = IntentIndex({"intents": intents}, simple_tokenize)
+    queries = [p for _, p, _, _ in index.patterns]
+    queries += [" ".join(rng.sample(vocab, rng.randint(0, 6))) for _ in range(500)]
+    for query in queries:
+        tokens = simple_tokenize(query)
+        expected = index.match_linear(tokens)
+        assert index.match(tokens) == expected, query
+        assert index.match(tokens, on_score=lambda *score: None) == expected, query
+    assert index.candidates({"w1", "w2"}) == sorted(
+        i for i, (_, _, tokens, _) in enumerate(index.patterns) if tokens & {"w1", "w2"})
+
+
+def test_inverted_index_exits_on_perfect_match():
+    index = IntentIndex({"intents": SAMPLE_INTENTS + [
+        {"tag": "greeting_again", "patterns": ["hi"], "responses": ["Again"]},
+    ]}, simple_tokenize)
+    scored = []
+    score, responses = index.match(["hi"], on_score=lambda tag, *rest: scored.append(tag))
+    assert (score, responses) == (1.0, ["Hello!"])
+    assert scored == ["greeting"]
+
+
+def test_bag_of_words_encoder_matches_bag_of_words():
+    vocab = ["depart", "head", "hi", "intern", "univers", "who"]
+    encoder = BagOfWordsEncoder(vocab)
+    sentences = [[], ["hi"], ["head", "depart", "head"], ["Departments", "unknown"], ["universities", "who", "who"]]
+    for use_frequency in (False, True):
+        expected = np.array([bag_of_words(s, vocab, use_frequency) for s in sentences])
+        assert np.array_equal(encoder.encode_batch(sentences, use_frequency), expected)
+        for sentence, row in zip(sentences, expected):
+            assert np.array_equal(encoder.encode(sentence, use_frequency), row)
+            indices, values = encoder.encode(sentence, use_frequency, sparse=True)
+            assert np.array_equal(indices, np.flatnonzero(row))
+            assert np.array_equal(values, row[indices])
+
+
+def reference_tokenize(sentence):
+    # The original uncached pipeline, kept to check the memoized one against it
+    import re
+    import nltk
+    from nltk.tokenize.treebank import TreebankWordDetokenizer
+
+    sentence = sentence.lower()
+    words = sentence.split()
+    sentence = TreebankWordDetokenizer().detokenize([nltk_utils.contractions.get(w, w) for w in words])
+    sentence = re.sub(r"\s+", " ", sentence)
+    sentence = re.sub(r"[^\w\s]", "", sentence)
+    return [nltk_utils.stemmer.stem(w.lower()) for w in nltk.word_tokenize(sentence) if w not in nltk_utils.stop_words]
+
+
+def test_cached_tokenize_matches_reference():
+    with open(os.path.join(os.path.dirname(__file__), "intents.json"), encoding="utf-8") as f:
+        patterns = [p for i in json.load(f)["intents"] for p in i["patterns"]]
+    extra = ["I don't know who   the HEAD is", "  Hi!  ", "isn't it, we're here?", ""]
+    for sentence in patterns + extra:
+        assert nltk_utils.tokenize(sentence) == reference_tokenize(sentence), sentence
+
+
+def test_tokenize_cache_counts_hits():
+    nltk_utils.clear_tokenize_cache()
+    first = nltk_utils.tokenize("Who is the head of department")
+    first.append("mutated")
+    assert nltk_utils.tokenize("who is the  head of department ") == ["head", "depart"]
+    info = nltk_utils.tokenize_cache_info()
+    assert info["tokenize"]["hits"] == 1
+    assert info["tokenize"]["misses"] == 1
+    assert info["stem"]["misses"] == 2
+
+
+def test_ensure_nltk_data_downloads_only_missing(monkeypatch):
+    downloaded = []
+
+    def find(path):
+        if path == "corpora/missing":
+            raise LookupError(path)
+
+    monkeypatch.setattr(nltk_utils.nltk.data, "find", find)
+    monkeypatch.setattr(nltk_utils.nltk, "download", lambda package, quiet=False: downloaded.append(package))
+    nltk_utils.ensure_nltk_data([("tokenizers/punkt", "punkt"), ("corpora/missing", "missing")])
+    assert downloaded == ["missing"]
+
+
+def test_analyzed_message_computes_each_stage_once():
+    calls = {"tokenize": 0, "classify": 0}
+
+    def counting_tokenize(sentence):
+        calls["tokenize"] += 1
+        return simple_tokenize(sentence)
+
+    def classify(bag):
+        calls["classify"] += 1
+        return np.array([0.2, 0.8]) if bag[0] else np.array([0.9, 0.1])
+
+    analysis = AnalyzedMessage("hi there", counting_tokenize, BagOfWordsEncoder(["hi"]), classify, ["greeting", "other"])
+    assert analysis.tokens == ["hi", "there"]
+    assert analysis.prediction == ("other", pytest.approx(0.8))
+    assert analysis.prediction[0] == "other"
+    assert calls == {"tokenize": 1, "classify": 1}
+    assert set(analysis.timings) == {"tokenize", "encode", "classify"}
+
+    no_model = AnalyzedMessage("hi", simple_tokenize)
+    assert not no_model.can_classify
+    assert no_model.prediction == (None, 0.0)
+    no_model.attach_classifier(BagOfWordsEncoder(["hi"]), classify, ["greeting", "other"])
+    assert no_model.prediction == ("other", pytest.approx(0.8))
+
+
+def test_classify_batch_matches_single_forward_passes():
+    pytest.importorskip("torch")
+    from classifier import load_local_classifier
+
+    classifier = load_local_classifier(os.path.join(os.path.dirname(__file__), "data.pth"))
+    messages = [["intern"], ["head", "depart"], [], ["exam", "schedul"], ["nonsens"]]
+    results = classifier.classify_batch(messages, top_k=3)
+    assert len(results) == len(messages)
+    for tokens, result in zip(messages, results):
+        probs = classifier.classify_bag(classifier.encoder.encode(tokens))
+        order = np.argsort(-probs, kind="stable")[:3]
+        assert result["tag"] == classifier.tags[order[0]]
+        assert result["probability"] == pytest.approx(float(probs[order[0]]), abs=1e-6)
+        assert [alt["tag"] for alt in result["alternatives"]] == [classifier.tags[i] for i in order]
+    assert classifier.classify_batch([]) == []
+
+
+def test_numpy_classifier_matches_torch_model(tmp_path):
+    pytest.importorskip("torch")
+    from classifier import load_local_classifier
+    from export_model import export_npz
+    from numpy_classifier import load_numpy_classifier, npz_source_hash, file_sha256
+
+    pth_path = os.path.join(os.path.dirname(__file__), "data.pth")
+    npz_path = str(tmp_path / "data.npz")
+    export_npz(pth_path, npz_path)
+    assert npz_source_hash(npz_path) == file_sha256(pth_path)
+    reference = load_local_classifier(pth_path)
+    classifier = load_numpy_classifier(npz_path)
+    assert classifier.all_words == reference.all_words
+    assert classifier.tags == reference.tags
+
+    bags = (np.random.RandomState(0).rand(256, len(reference.all_words)) < 0.03).astype(np.float32)
+    expected = reference.predict_proba(bags)
+    actual = classifier.predict_proba(bags)
+    np.testing.assert_allclose(actual, expected, atol=1e-5)
+    assert (actual.argmax(axis=1) == expected.argmax(axis=1)).all()
+    np.testing.assert_allclose(classifier.classify_bag(bags[0]), expected[0], atol=1e-5)
+
+    messages = [["intern"], ["head", "depart"], [], ["exam", "schedul"]]
+    assert ([r["tag"] for r in classifier.classify_batch(messages)]
+            == [r["tag"] for r in reference.classify_batch(messages)])
+
+
+def test_sparse_and_int8_paths_match_dense_model(tmp_path):
+    from numpy_classifier import NumpyClassifier, load_numpy_classifier, quantization_parity, quantized_copy
+
+    rng = np.random.RandomState(1)
+    vocab = [f"w{i}" for i in range(300)]
+    classifier = NumpyClassifier([(rng.randn(300, 16), rng.randn(16)), (rng.randn(16, 16), rng.randn(16)),
+                                  (rng.randn(16, 5), rng.randn(5))], vocab, list("abcde"))
+    quantized = quantized_copy(classifier)
+    assert quantized.quantized and quantized.weight_bytes() < classifier.weight_bytes() / 3
+
+    for model in (classifier, quantized):
+        for indices in ([], [3], [0, 17, 299], list(range(0, 300, 7))):
+            bag = np.zeros(300, dtype=np.float32)
+            bag[indices] = 1.0
+            np.testing.assert_allclose(model.classify_sparse(indices), model.classify_bag(bag), atol=1e-5)
+            np.testing.assert_allclose(model.classify_sparse(indices, np.ones(len(indices))),
+                                       model.classify_bag(bag), atol=1e-5)
+
+    bags = (rng.rand(500, 300) < 0.02).astype(np.float32)
+    report = quantization_parity(classifier, quantized, bags)
+    assert report["top1_agreement"] > 0.9
+    assert not quantization_parity(classifier, quantized, bags, max_prob_diff=0.0)["passed"]
+
+    path = str(tmp_path / "model.npz")
+    arrays = {"format_version": np.int32(1), "num_layers": np.int32(3), "all_words": np.array(vocab),
+              "tags": np.array(list("abcde")), "source_sha256": np.array("")}
+    for i, (weight, bias, scale) in enumerate(quantized.layers):
+        arrays.update({f"w{i}": weight, f"b{i}": bias, f"s{i}": scale})
+    np.savez(path, **arrays)
+    loaded = load_numpy_classifier(path)
+    assert loaded.layers[0][0].dtype == np.int8
+    np.testing.assert_allclose(loaded.predict_proba(bags), quantized.predict_proba(bags), atol=1e-6)
+
+
+def test_binary_artifact_round_trip_and_integrity(tmp_path):
+    from model_artifact import ARTIFACT_MAGIC, artifact_source_hash, load_artifact, read_directory, write_artifact
+    from numpy_classifier import NumpyClassifier, quantized_copy
+
+    rng = np.random.RandomState(2)
+    vocab = [f"w{i}" for i in range(250)][::-1] + ["ፕሮጀክት", "café"]  # unsorted, non-ASCII
+    tags = ["greeting", "መረጃ", "goodbye"]
+    classifier = NumpyClassifier([(rng.randn(len(vocab), 8), rng.randn(8)), (rng.randn(8, 8), rng.randn(8)),
+                                  (rng.randn(8, 3), rng.randn(3))], vocab, tags)
+    bags = (rng.rand(200, len(vocab)) < 0.03).astype(np.float32)
+
+    for model in (classifier, quantized_copy(classifier)):
+        path = str(tmp_path / "model.bin")
+        write_artifact(path, model.layers, model.all_words, model.tags, source_sha256="abc")
+        loaded = load_artifact(path)
+        assert artifact_source_hash(path) == "abc"
+        assert list(loaded.all_words) == vocab and loaded.tags == tags
+        assert loaded.quantized == model.quantized
+        assert not loaded.layers[0][0].flags.writeable  # served straight from the mapping
+        np.testing.assert_allclose(loaded.predict_proba(bags), model.predict_proba(bags), atol=1e-6)
+        assert all(loaded.encoder.index.get(word) == i for i, word in enumerate(vocab))
+        assert loaded.encoder.index.get("missing") is None
+        tokens = ["w3", "café", "unknown"]
+        np.testing.assert_array_equal(loaded.encoder.encode(tokens), model.encoder.encode(tokens))
+
+    offset = read_directory(path)[1]["sections"]["w1"]["offset"]
+    with open(path, "r+b") as f:
+        assert f.read(len(ARTIFACT_MAGIC)) == ARTIFACT_MAGIC
+        f.seek(offset)
+        byte = f.read(1)[0]
+        f.seek(offset)
+        f.write(bytes([byte ^ 0xFF]))
+    with pytest.raises(ValueError, match="corrupt"):
+        load_artifact(path)
+    assert load_artifact(path, verify=False).layers[1][0].dtype == np.int8
+
+
+def test_vectorized_training_stops_early_and_keeps_best_weights():
+    torch = pytest.importorskip("torch")
+    import train
+    from model import NeuralNet
+
+    rng = np.random.RandomState(0)
+    y = np.repeat(np.arange(4), 10)
+    X = (rng.rand(40, 20) < 0.05).astype(np.float32)
+    X[np.arange(40), y] = 1.0  # one indicative word per class
+    X_fit, y_fit, X_val, y_val = train.holdout_split(X, y, fraction=0.2)
+    assert len(X_val) == 8 and all((y_fit == label).sum() >= 2 for label in range(4))
+
+    train.set_seed()
+    model = NeuralNet(20, 8, 4)
+    criterion = torch.nn.CrossEntropyLoss()
+    optimizer = torch.optim.Adam(model.parameters(), lr=0.01)
+    model, info = train.train_model_vectorized(model, X_fit, y_fit, criterion, optimizer, torch.device("cpu"),
+                                               num_epochs=2000, batch_size=8, X_val=X_val, y_val=y_val,
+                                               patience=20)
+    assert info["epochs"] < 2000
+    assert info["epochs"] - info["best_epoch"] == 20
+    val_loss, val_accuracy = train.evaluate(model, torch.as_tensor(X_val), torch.as_tensor(y_val), criterion)
+    assert val_loss == pytest.approx(info["val_loss"])
+    assert val_accuracy >= 0.75
+
+
+def test_incremental_trainer_extends_model_and_keeps_old_outputs(tmp_path):
+    torch = pytest.importorskip("torch")
+    import shutil
+    from classifier import load_local_classifier
+    from model import NeuralNet
+    from retrainer import IncrementalTrainer, extend_neural_net
+
+    model = NeuralNet(5, 8, 3).eval()
+    X = torch.rand(4, 5)
+    with torch.no_grad():
+        before = model(X)
+        extend_neural_net(model, 7, 4)
+        after = model(torch.cat([X, torch.zeros(4, 2)], dim=1))
+    assert model.fc1.in_features == 7 and model.fc3.out_features == 4
+    assert torch.allclose(after[:, :3], before)
+
+    here = os.path.dirname(__file__)
+    model_path = str(tmp_path / "data.pth")
+    shutil.copy(os.path.join(here, "data.pth"), model_path)
+    with open(os.path.join(here, "intents.json"), encoding="utf-8") as f:
+        intents = json.load(f)
+    new_patterns = ["When does the library open", "library opening hours"]
+    intents["intents"].append({"tag": "library_hours", "patterns": new_patterns, "responses": ["8am-10pm"]})
+    swapped = []
+    trainer = IncrementalTrainer(model_path, lambda: intents, lambda *args: swapped.append(args),
+                                 npz_path=str(tmp_path / "data.npz"), epochs=3)
+    trainer.request("library_hours", new_patterns)
+    deadline = time.time() + 60
+    while not swapped and time.time() < deadline:
+        time.sleep(0.05)
+    _, all_words, tags, info = swapped[0]
+    assert tags[-1] == "library_hours" and info["new_tags"] == ["library_hours"]
+    assert info["new_words"] > 0 and trainer.stats()["runs"] == 1
+    reloaded = load_local_classifier(model_path)
+    assert reloaded.tags == tags and reloaded.all_words == all_words
+    assert os.path.exists(tmp_path / "data.npz")
+    assert sorted(os.listdir(tmp_path)) == ["data.npz", "data.pth"]  # temporary files were renamed
+    assert trainer.unavailable_reason() is None
+    missing = str(tmp_path / "missing.pth")
+    assert IncrementalTrainer(missing, dict, print).unavailable_reason() == f"no trained model at {missing}"
+
+
+def _add_intents(path, worker, count):
+    from intent_store import IntentStore
+
+    store = IntentStore(path, compact_every=7)
+    for i in range(count):
+        store.add_intent({"tag": f"w{worker}-{i}", "patterns": [f"p{i}"], "responses": ["r"]})
+
+
+def test_intent_store_log_compaction_and_snapshots(tmp_path):
+    from intent_store import IntentStore
+
+    path = str(tmp_path / "intents.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"intents": [{"tag": "greeting", "patterns": ["hi"], "responses": ["hello"]}]}, f)
+    now = [0.0]
+    writer = IntentStore(path, compact_every=3, clock=lambda: now[0])
+    reader = IntentStore(path, compact_every=3, clock=lambda: now[0])
+    before = reader.snapshot()
+
+    writer.add_intent({"tag": "a", "patterns": ["x"], "responses": ["y"]})
+    writer.add_intent({"tag": "b", "patterns": ["x"], "responses": ["y"]})
+    assert [i["tag"] for i in writer.snapshot()["intents"]] == ["greeting", "a", "b"]
+    assert len(json.load(open(path, encoding="utf-8"))["intents"]) == 1  # only the log grew
+    assert reader.snapshot() is before  # served from memory until the refresh interval passes
+    with open(writer.log_path, "ab") as f:
+        f.write(b'{"seq": 3, "op": "ad')  # a writer caught mid-line
+    now[0] += 2
+    assert [i["tag"] for i in reader.snapshot()["intents"]] == ["greeting", "a", "b"]
+    assert len(before["intents"]) == 1  # old snapshots never change
+
+    with open(writer.log_path, "rb+") as f:
+        f.truncate(os.path.getsize(writer.log_path) - len(b'{"seq": 3, "op": "ad'))
+    writer.add_intent({"tag": "c", "patterns": ["x"], "responses": ["y"]})  # third record: compacts
+    assert os.path.getsize(writer.log_path) == 0
+    on_disk = json.load(open(path, encoding="utf-8"))
+    assert [i["tag"] for i in on_disk["intents"]] == ["greeting", "a", "b", "c"] and on_disk["log_seq"] == 3
+    now[0] += 2
+    assert [i["tag"] for i in reader.snapshot()["intents"]] == ["greeting", "a", "b", "c"]
+
+    # A crash between the rename and truncating the log must not apply records twice
+    with open(writer.log_path, "ab") as f:
+        f.write(b'{"seq": 3, "op": "add", "intent": {"tag": "c"}}\n')
+    assert [i["tag"] for i in IntentStore(path).snapshot()["intents"]] == ["greeting", "a", "b", "c"]
+
+
+def test_intent_store_concurrent_writers_lose_nothing(tmp_path):
+    import multiprocessing
+
+    from intent_store import IntentStore
+
+    path = str(tmp_path / "intents.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"intents": []}, f)
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_add_intents, args=(path, w, 10)) for w in range(4)]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join(30)
+        assert p.exitcode == 0
+    tags = [i["tag"] for i in IntentStore(path).snapshot()["intents"]]
+    assert sorted(tags) == sorted(f"w{w}-{i}" for w in range(4) for i in range(10))
+
+
+def test_micro_batcher_coalesces_concurrent_requests():
+    import threading
+
+    from batcher import MicroBatcher
+
+    calls = []
+
+    def predict(matrix):
+        calls.append(len(matrix))
+        return matrix * 2
+
+    batcher = MicroBatcher(predict, max_batch_size=8, max_wait_ms=50)
+    results = {}
+
+    def worker(i):
+        results[i] = batcher.classify(np.array([i, 1], dtype=np.float32), timeout=5)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert all(np.array_equal(results[i], [2 * i, 2]) for i in range(8))
+    assert sum(calls) == 8 and len(calls) < 8
+    stats = batcher.stats()
+    assert stats["latency_seconds"]["count"] == 8
+    assert stats["batch_size"]["count"] == len(calls)
+
+    def fail(matrix):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        MicroBatcher(fail, max_wait_ms=0).classify(np.zeros(2), timeout=5)
+
+
+def test_metrics_registry_renders_prometheus_text():
+    from metrics import Registry
+
+    registry = Registry()
+    latency = registry.histogram("stage_seconds", "Stage latency", ("stage",), buckets=(0.001, 0.01))
+    answers = registry.counter("answers_total", "Answers", ("answered_by",))
+    latency.observe(0.0005, "tokenize")
+    latency.observe(0.005, "tokenize")
+    latency.observe(2.0, "gemini")
+    answers.inc("intent")
+    answers.inc("intent")
+    answers.inc('odd"label')
+
+    lines = registry.render().splitlines()
+    assert "# TYPE stage_seconds histogram" in lines
+    assert 'stage_seconds_bucket{stage="tokenize",le="0.001"} 1' in lines
+    assert 'stage_seconds_bucket{stage="tokenize",le="0.01"} 2' in lines
+    assert 'stage_seconds_bucket{stage="tokenize",le="+Inf"} 2' in lines
+    assert 'stage_seconds_bucket{stage="gemini",le="0.01"} 0' in lines
+    assert 'stage_seconds_count{stage="gemini"} 1' in lines
+    assert 'stage_seconds_sum{stage="gemini"} 2.0' in lines
+    assert "# TYPE answers_total counter" in lines
+    assert 'answers_total{answered_by="intent"} 2' in lines
+    assert 'answers_total{answered_by="odd\\"label"} 1' in lines
+    assert answers.value("intent") == 2
+
+
+def test_logging_levels_sampling_and_trace():
+    import io
+
+    from app_logging import configure_logging, get_logger, parse_mapping, trace, tracing
+
+    assert parse_mapping("route=0.1, intent = 0", float) == {"route": 0.1, "intent": 0.0}
+    stream = io.StringIO()
+    pipeline = configure_logging(level="INFO", category_levels={"gemini": "DEBUG"},
+                                 sample_rates={"route": 0.0}, stream=stream)
+    try:
+        get_logger("route").info("sampled out")
+        get_logger("route").warning("warnings are never sampled")
+        get_logger("intent").debug("below the level")
+        get_logger("gemini").debug("category level %s", "DEBUG")
+        get_logger("trace").debug("not tracing, but trace lines are only logged when tracing()")
+        assert not tracing()
+        with trace():
+            assert tracing()
+            get_logger("route").info("traced request")
+        assert not tracing()
+    finally:
+        pipeline.stop()
+    assert stream.getvalue().splitlines() == [
+        "[route] warnings are never sampled",
+        "[gemini] category level DEBUG",
+        "[trace] not tracing, but trace lines are only logged when tracing()",
+        "[route] traced request",
+    ]
+    assert pipeline.stats()["dropped"] == 0
+
+
+def test_response_cache_ttl_lru_and_persistence(tmp_path):
+    from response_cache import ResponseCache
+
+    now = [1000.0]
+    db_path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(max_entries=2, ttl_seconds=60, db_path=db_path, clock=lambda: now[0])
+    cache.put("cours year 3", "Year 3 courses...")
+    cache.put("head depart", "Dr. Michael")
+    assert cache.get("cours year 3") == "Year 3 courses..."
+    cache.put("intern", "Internships...")  # evicts the least recently used entry
+    assert cache.get("head depart") is None
+    assert cache.stats()["evictions"] == 1
+
+    restored = ResponseCache(max_entries=2, ttl_seconds=60, db_path=db_path, clock=lambda: now[0])
+    assert restored.get("intern") == "Internships..."
+    assert restored.get("head depart") is None
+
+    now[0] += 61
+    assert cache.get("intern") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+    assert ResponseCache(db_path=db_path, clock=lambda: now[0]).stats()["entries"] == 0
+
+
+def _cache_put(cache, key):
+    parent_connection = cache._db
+    cache.put(key, f"answer {key}")
+    assert cache._db is not parent_connection  # sqlite connections must not cross fork()
+
+
+def test_response_cache_reconnects_in_forked_workers(tmp_path):
+    import multiprocessing
+
+    from response_cache import ResponseCache
+
+    db_path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(db_path=db_path)
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_cache_put, args=(cache, f"worker {w}")) for w in range(3)]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join(30)
+        assert p.exitcode == 0
+    cache.put("parent", "answer parent")
+    restored = ResponseCache(db_path=db_path)
+    assert sorted(restored._entries) == ["parent", "worker 0", "worker 1", "worker 2"]
+
+
+def test_semantic_cache_matches_paraphrases_only():
+    from semantic_cache import SemanticCache
+
+    cache = SemanticCache(BagOfWordsEncoder(["data", "exam", "room", "teach"]), threshold=0.8, max_entries=2)
+    assert cache.lookup(["data", "teach"]) == (None, 0.0)
+    cache.add(["data", "teach"], "Dr. X teaches data")
+    answer, similarity = cache.lookup(["teach", "data", "data"])
+    assert answer == "Dr. X teaches data" and similarity == pytest.approx(1.0)
+    # Out-of-vocabulary words still count against similarity
+    cache.add(["normal", "exam"], "Normalization exam")
+    assert cache.lookup(["network", "exam"])[0] is None
+    # Full cache overwrites the oldest entry
+    cache.add(["room"], "Room 423")
+    assert cache.lookup(["data", "teach"])[0] is None
+    assert cache.lookup(["room"])[0] == "Room 423"
+    assert len(cache) == 2
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_session_store_bounds_and_expiry(tmp_path, backend):
+    from session_store import MemorySessionStore, SQLiteSessionStore
+
+    now = [0.0]
+    options = {"max_messages": 4, "idle_ttl": 100, "max_sessions": 2, "clock": lambda: now[0]}
+    if backend == "sqlite":
+        store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite"), evict_interval=0, **options)
+        other_worker = SQLiteSessionStore(str(tmp_path / "sessions.sqlite"), evict_interval=0, **options)
+    else:
+        store = other_worker = MemorySessionStore(**options)
+
+    store.append("a", [("user", "q1"), ("assistant", "a1")])
+    store.append("a", [("user", "q2"), ("assistant", "a2"), ("user", "q3")])
+    assert other_worker.history("a") == [("assistant", "a1"), ("user", "q2"), ("assistant", "a2"), ("user", "q3")]
+    assert store.history("a", 2) == [("assistant", "a2"), ("user", "q3")]
+
+    now[0] = 10
+    store.append("b", [("user", "hi")])
+    store.append("c", [("user", "hey")])  # over max_sessions: "a" is least recently active
+    assert store.history("a") == []
+    assert len(store) == 2
+
+    now[0] = 150  # "b" and "c" idle for longer than idle_ttl
+    store.append("c", [("user", "again")])
+    assert store.history("b") == []
+    assert store.history("c") == [("user", "again")]
+    store.clear("c")
+    assert store.history("c") == []
+
+
+def test_session_store_backends_must_implement_the_interface():
+    from session_store import SessionStore
+
+    class HistoryOnly(SessionStore):
+        def history(self, session_id, limit=None):
+            return []
+
+    with pytest.raises(TypeError):
+        HistoryOnly()
+
+
+def run_async(coro):
+    import asyncio
+
+    return asyncio.run(coro)
+
+
+def test_async_gemini_client_against_stub_server():
+    from benchmarks.stub_gemini import StubGeminiServer
+    from llm_client import AsyncGeminiClient
+
+    with StubGeminiServer() as server:
+        client = AsyncGeminiClient("key", "gemini-2.5-flash", system_instruction="Be ISSEER",
+                                   generation_config={"temperature": 0.5}, base_url=server.base_url)
+
+        async def scenario():
+            history = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"},
+                       {"role": "user", "content": "year 3 courses?"}]
+            first = await client.generate(history)
+            second = await client.generate("plain question")
+            await client.aclose()
+            return first, second
+
+        assert run_async(scenario()) == ("stub answer: year 3 courses?", "stub answer: plain question")
+        request = server.requests[0]
+        assert request["path"] == "/v1beta/models/gemini-2.5-flash:generateContent"
+        assert [c["role"] for c in request["body"]["contents"]] == ["user", "model", "user"]
+        assert request["body"]["systemInstruction"] == {"parts": [{"text": "Be ISSEER"}]}
+        assert request["body"]["generationConfig"] == {"temperature": 0.5}
+
+
+def test_async_gemini_client_deadline_and_concurrency_limit():
+    import asyncio
+    import time
+
+    from benchmarks.stub_gemini import StubGeminiServer
+    from llm_client import AsyncGeminiClient, LLMError
+
+    with StubGeminiServer(latency=0.1) as server:
+        client = AsyncGeminiClient("key", "models/stub", base_url=server.base_url, max_concurrency=2)
+
+        async def scenario():
+            results = await asyncio.gather(*(client.generate(f"q{i}") for i in range(6)))
+            start = time.perf_counter()
+            with pytest.raises(LLMError):
+                await client.generate("slow", timeout=0.02)
+            elapsed = time.perf_counter() - start
+            await client.aclose()
+            return results, elapsed
+
+        results, elapsed = run_async(scenario())
+        assert results == [f"stub answer: q{i}" for i in range(6)]
+        assert server.max_in_flight == 2
+        assert elapsed < 0.09
+        assert client.stats["timeouts"] == 1
+
+
+def test_async_gemini_client_shards_large_connection_pools():
+    import asyncio
+
+    from benchmarks.stub_gemini import StubGeminiServer
+    from llm_client import POOL_SHARD_SIZE, AsyncGeminiClient
+
+    calls = 2 * POOL_SHARD_SIZE + 6
+    with StubGeminiServer(latency=0.3) as server:
+        client = AsyncGeminiClient("key", "models/stub", base_url=server.base_url,
+                                   max_concurrency=calls, max_connections=calls)
+
+        async def scenario():
+            results = await asyncio.gather(*(client.generate(f"q{i}") for i in range(calls)))
+            shards = len(client._clients)
+            await client.aclose()
+            return results, shards
+
+        results, shards = run_async(scenario())
+        assert results == [f"stub answer: q{i}" for i in range(calls)]
+        assert shards == 3
+        assert server.max_in_flight == calls  # round-robin spreads the calls over every pool
+
+
+def test_async_gemini_client_hedges_slow_requests():
+    from benchmarks.stub_gemini import StubGeminiServer
+    from llm_client import AsyncGeminiClient
+
+    # Only the first request is slow; the hedged duplicate answers quickly
+    with StubGeminiServer(latency=lambda n: 2.0 if n == 0 else 0.01) as server:
+        client = AsyncGeminiClient("key", "models/stub", base_url=server.base_url,
+                                   hedge_percentile=95, hedge_min_samples=5, timeout=1.0)
+        client.latencies.extend([0.05] * 5)
+
+        async def scenario():
+            text = await client.generate("hedge me")
+            await client.aclose()
+            return text
+
+        assert run_async(scenario()) == "stub answer: hedge me"
+        assert client.stats["hedges"] == 1
+        assert client.stats["hedge_wins"] == 1
+        assert len(server.requests) == 2
+
+
+def test_async_gemini_client_streams_chunks():
+    from benchmarks.stub_gemini import StubGeminiServer
+    from llm_client import AsyncGeminiClient, BackgroundLoop
+
+    with StubGeminiServer(chunk_latency=0.01) as server:
+        client = AsyncGeminiClient("key", "models/stub", base_url=server.base_url)
+        chunks = list(BackgroundLoop().iterate(client.stream("stream this please"), timeout=5))
+        assert chunks == ["stub ", "answer: ", "stream ", "this ", "please"]
+        assert server.requests[0]["path"] == "/v1beta/models/stub:streamGenerateContent?alt=sse"
+
+
+def test_async_gemini_client_stream_rejects_malformed_events():
+    from benchmarks.stub_gemini import StubGeminiServer, candidate
+    from llm_client import AsyncGeminiClient, BackgroundLoop, LLMError
+
+    def stream_event(chunk):
+        return json.dumps(candidate(chunk)) if chunk == "stub " else '{"candidates": ['
+
+    with StubGeminiServer(stream_event=stream_event) as server:
+        client = AsyncGeminiClient("key", "models/stub", base_url=server.base_url)
+        chunks = []
+        with pytest.raises(LLMError, match="malformed stream event"):
+            for chunk in BackgroundLoop().iterate(client.stream("cut me off"), timeout=5):
+                chunks.append(chunk)
+        assert chunks == ["stub "]
+        assert client.stats["errors"] == 1
+
+
+class FakeGeminiModel:
+    """Stands in for genai.GenerativeModel: replies with `chunks`, streamed or joined."""
+
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after  # raise after this many streamed chunks
+        self.calls = []
+
+    def generate_content(self, contents, stream=False):
+        from types import SimpleNamespace
+
+        self.calls.append(contents)
+        if not stream:
+            return SimpleNamespace(text="".join(self.chunks))
+
+        def chunks():
+            for i, text in enumerate(self.chunks):
+                if i == self.fail_after:
+                    raise RuntimeError("stream interrupted")
+                yield SimpleNamespace(text=text)
+        return chunks()
+
+
+OUT_OF_DOMAIN = "xyzzy plugh quux"
+
+
+@pytest.fixture(scope="module")
+def chatbot(tmp_path_factory):
+    """app.py imported once with lazy startup, in-memory state and a scratch intents.json."""
+    import shutil
+
+    workdir = tmp_path_factory.mktemp("app")
+    intents_path = str(workdir / "intents.json")
+    shutil.copy(os.path.join(os.path.dirname(__file__), "intents.json"), intents_path)
+    with pytest.MonkeyPatch.context() as mp:
+        for name, value in {"GEMINI_API_KEY": "test", "STARTUP_MODE": "lazy", "INTENTS_PATH": intents_path,
+                            "GEMINI_ASYNC": "0", "GEMINI_CACHE_ENABLED": "1", "SEMANTIC_CACHE_ENABLED": "0",
+                            "SESSION_BACKEND": "memory", "RETRAIN_ON_ADD_INTENT": "0",
+                            "LOG_LEVEL": "WARNING"}.items():
+            mp.setenv(name, value)
+        import app
+    return app
+
+
+@pytest.fixture
+def fake_gemini(chatbot, monkeypatch):
+    def install(chunks, fail_after=None):
+        model = FakeGeminiModel(chunks, fail_after)
+        monkeypatch.setattr(chatbot, "gemini_model", model)
+        return model
+    from response_cache import ResponseCache
+
+    monkeypatch.setattr(chatbot, "gemini_cache", ResponseCache())
+    return install
+
+
+def test_asgi_entry_point_routes_like_flask(chatbot, fake_gemini):
+    from starlette.testclient import TestClient
+    import asgi
+
+    client = TestClient(asgi.app)  # no lifespan: it would shut down the shared CPU pool
+    model = fake_gemini(["Ask the ", "department office."])
+    assert client.get("/").text == "Backend is running!"
+
+    reply = client.post("/message", json={"content": "Hi"})
+    assert reply.status_code == 200
+    assert reply.json()["bot_reply"] in chatbot.intent_index.get().responses_for("greeting")
+    assert model.calls == []
+
+    reply = client.post("/message", json={"content": OUT_OF_DOMAIN, "session_id": "asgi-1"})
+    assert reply.json() == {"bot_reply": "Ask the department office."}
+    assert model.calls == [OUT_OF_DOMAIN]
+    assert chatbot.CONVERSATIONS.history("asgi-1") == [("user", OUT_OF_DOMAIN),
+                                                       ("assistant", "Ask the department office.")]
+    client.post("/message", json={"content": "Hi", "session_id": "asgi-1", "clear_history": True})
+    assert chatbot.CONVERSATIONS.history("asgi-1") == []  # cleared; local answers are not remembered
+
+    assert client.post("/message", content="[1, 2]", headers={"Content-Type": "application/json"}).status_code == 400
+    assert client.post("/message", content="not json").status_code == 400
+    assert client.post("/message", json={}).json() == {"error": "Message content is required"}
+    assert client.post("/message", json={"content": ""}).status_code == 400
+
+    assert client.post("/add-intent", content="nope").status_code == 400
+    for body in ({}, {"tag": "t", "patterns": ["p"]}, {"tag": "t", "responses": ["r"]},
+                 {"patterns": ["p"], "responses": ["r"]}):
+        reply = client.post("/add-intent", json=body)
+        assert reply.status_code == 400
+        assert reply.json() == {"error": "Tag, patterns, and responses are required"}
+    reply = client.post("/add-intent", json={"tag": "asgi_test", "patterns": ["asgi zebra"], "responses": ["ok"]})
+    assert reply.json() == {"success": True, "message": "Intent 'asgi_test' added successfully.", "retraining": False,
+                            "retraining_skipped": "RETRAIN_ON_ADD_INTENT is off"}
+    assert client.post("/message", json={"content": "asgi zebra"}).json() == {"bot_reply": "ok"}
+
+
+def read_sse(response):
+    """(event, data) pairs of a text/event-stream body."""
+    events = []
+    for block in response.get_data(as_text=True).split("\n\n"):
+        if block:
+            event, data = block.split("\n")
+            events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_message_stream_route_frames_local_and_gemini_answers(chatbot, fake_gemini):
+    client = chatbot.app.test_client()
+    model = fake_gemini(["Ask ", "the ", "office."])
+
+    response = client.post("/message/stream", json={"content": "Hi"})
+    assert response.mimetype == "text/event-stream"
+    assert response.headers["Cache-Control"] == "no-cache"
+    [(event, payload)] = read_sse(response)
+    assert event == "done" and payload["answered_by"] == "intent"
+    assert payload["bot_reply"] in chatbot.intent_index.get().responses_for("greeting")
+
+    response = client.post("/message/stream", json={"content": OUT_OF_DOMAIN, "session_id": "sse-1"})
+    assert read_sse(response) == [("chunk", {"text": "Ask "}), ("chunk", {"text": "the "}),
+                                  ("chunk", {"text": "office."}),
+                                  ("done", {"bot_reply": "Ask the office.", "answered_by": "gemini"})]
+    assert chatbot.CONVERSATIONS.history("sse-1") == [("user", OUT_OF_DOMAIN), ("assistant", "Ask the office.")]
+    key = " ".join(chatbot.analyze_message(OUT_OF_DOMAIN).tokens)
+    assert chatbot.gemini_cache.get(key) == "Ask the office."
+
+    # The next identical question is answered from the response cache in one event
+    assert read_sse(client.post("/message/stream", json={"content": OUT_OF_DOMAIN})) == [
+        ("done", {"bot_reply": "Ask the office.", "answered_by": "gemini_cache"})]
+    assert len(model.calls) == 1
+
+    assert client.post("/message/stream", json={"content": ""}).status_code == 400
+
+
+def test_message_stream_route_reports_failures_mid_stream(chatbot, fake_gemini):
+    client = chatbot.app.test_client()
+    fake_gemini(["Ask ", "the ", "office."], fail_after=2)
+
+    response = client.post("/message/stream", json={"content": OUT_OF_DOMAIN, "session_id": "sse-2"})
+    assert read_sse(response) == [("chunk", {"text": "Ask "}), ("chunk", {"text": "the "}),
+                                  ("error", {"error": chatbot.GEMINI_ERROR_REPLY, "partial_reply": "Ask the "})]
+    # A failed stream is not cached, and the history records an empty reply
+    assert chatbot.gemini_cache.get(" ".join(chatbot.analyze_message(OUT_OF_DOMAIN).tokens)) is None
+    assert chatbot.CONVERSATIONS.history("sse-2") == [("user", OUT_OF_DOMAIN), ("assistant", "")]
+
+
+LAZY_STARTUP_CHECK = """
+import sys, threading, time
+import google.generativeai as genai
+
+listing = threading.Event()
+def list_models():  # a model listing that never returns
+    listing.set()
+    threading.Event().wait()
+genai.list_models = list_models
+
+start = time.perf_counter()
+import app
+assert time.perf_counter() - start < 30
+assert listing.wait(5)  # the check is running, in the background
+assert "torch" not in sys.modules
+assert app.local_classifier is None and not app.classifier_loaded
+
+loads = []
+loader = app.classifier_loader
+def counting_loader(backend):
+    loads.append(backend)
+    time.sleep(0.2)  # widen the window for racing callers
+    return loader(backend)
+app.classifier_loader = counting_loader
+
+results = []
+threads = [threading.Thread(target=lambda: results.append(app.ensure_local_classifier())) for _ in range(8)]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+assert loads == ["torch"], loads
+assert len(results) == 8 and all(r is app.local_classifier is not None for r in results)
+assert "torch" in sys.modules
+assert app.classify_batch(["Who is the head of department?"])[0]["tag"]
+print("ok")
+"""
+
+
+def test_lazy_startup_defers_model_check_and_classifier():
+    pytest.importorskip("torch")
+    import subprocess
+    import sys
+
+    env = dict(os.environ, GEMINI_API_KEY="test", STARTUP_MODE="lazy", CLASSIFIER_BACKEND="torch",
+               GEMINI_CACHE_ENABLED="0", SESSION_BACKEND="memory", RETRAIN_ON_ADD_INTENT="0", LOG_LEVEL="WARNING")
+    result = subprocess.run([sys.executable, "-c", LAZY_STARTUP_CHECK], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            env=env, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines()[-1] == "ok"
+
+
+def test_async_gemini_errors_fall_back_and_timeouts_cancel(chatbot, monkeypatch):
+    import asyncio
+    import concurrent.futures
+    from llm_client import BackgroundLoop
+
+    class BrokenClient:
+        async def generate(self, messages):
+            raise ValueError("Expecting value: line 1 column 1 (char 0)")  # a non-JSON 200 body
+
+    monkeypatch.setattr(chatbot, "async_llm", BrokenClient())
+    before = chatbot.GEMINI_ERRORS.value("exception")
+    assert run_async(chatbot.call_gemini_async("hi")) is None
+    assert chatbot.GEMINI_ERRORS.value("exception") == before + 1
+
+    cancelled = threading.Event()
+
+    async def stalled():
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(concurrent.futures.TimeoutError):
+        BackgroundLoop().run(stalled(), timeout=0.1)
+    assert cancelled.wait(5)
+
+
+def test_background_loop_iterate_times_out_on_stalled_streams():
+    import asyncio
+    import concurrent.futures
+    from llm_client import BackgroundLoop
+
+    closed = threading.Event()
+
+    async def stalled_stream():
+        try:
+            yield "first"
+            await asyncio.sleep(60)
+            yield "never"
+        finally:
+            closed.set()
+
+    chunks = []
+    with pytest.raises(concurrent.futures.TimeoutError):
+        for chunk in BackgroundLoop().iterate(stalled_stream(), timeout=0.2):
+            chunks.append(chunk)
+    assert chunks == ["first"]
+    assert closed.is_set()  # cancelled and closed, not left running on the loop
+
+
+def test_cache_stats_reports_tokenize_cache(chatbot):
+    client = chatbot.app.test_client()
+    client.post("/message", json={"content": "Hi"})
+    before = client.get("/cache-stats").get_json()["tokenize"]
+    client.post("/message", json={"content": "Hi"})
+    after = client.get("/cache-stats").get_json()["tokenize"]
+    assert set(after) == {"tokenize", "stem"}
+    assert after["tokenize"]["hits"] == before["tokenize"]["hits"] + 1
+    assert after["tokenize"]["maxsize"] > 0
+
+
+def test_metrics_endpoint_reports_routed_messages(chatbot):
+    import re
+
+    client = chatbot.app.test_client()
+
+    def samples():
+        text = client.get("/metrics").get_data(as_text=True)
+        return {line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+                for line in text.splitlines() if line and not line.startswith("#")}
+
+    before = samples()
+    assert client.post("/message", json={"content": "Hi"}).status_code == 200
+    after = samples()
+    stages = {re.search(r'stage="([^"]+)"', key).group(1) for key in after
+              if key.startswith("chatbot_stage_latency_seconds_count{")}
+    assert "intent_match" in stages
+    key = 'chatbot_stage_latency_seconds_count{stage="intent_match"}'
+    assert after[key] == before.get(key, 0) + 1
+    key = 'chatbot_answers_total{answered_by="intent"}'
+    assert after[key] == before.get(key, 0) + 1
+
+
+def test_classify_batch_route_validates_input(chatbot):
+    client = chatbot.app.test_client()
+    messages = ["Who is the head of department?", "Hi"]
+
+    reply = client.post("/classify-batch", json={"messages": messages, "top_k": 2})
+    assert reply.status_code == 200
+    results = reply.get_json()["results"]
+    assert [r["message"] for r in results] == messages
+    assert results == chatbot.classify_batch(messages, top_k=2)
+    assert all(len(r["alternatives"]) == 2 for r in results)
+
+    for body in ({"messages": "Hi"}, {"messages": ["Hi", 3]}, {}):
+        reply = client.post("/classify-batch", json=body)
+        assert reply.status_code == 400
+        assert reply.get_json() == {"error": "messages must be a list of strings"}
+    for top_k in (True, 0, -1, 2.5, "3"):
+        reply = client.post("/classify-batch", json={"messages": messages, "top_k": top_k})
+        assert reply.status_code == 400, top_k
+        assert reply.get_json() == {"error": "top_k must be a positive integer"}
@@ -1,5 +1,7 @@
-import json
+import argparse
+import copy
 import random
+import time
 import numpy as np
 from tqdm import tqdm  # For progress bars
 
@@ -7,8 +9,11 @@ import torch
 import torch.nn as nn
 from torch.utils.data import Dataset, DataLoader
 
-from nltk_utils import tokenize, stem, bag_of_words
+from nltk_utils import tokenize, stem, BagOfWordsEncoder
+from intent_store import IntentStore
 from model import NeuralNet
+from export_model import export_npz
+from model_artifact import export_artifact
 
 
 # Set random seeds for reproducibility
@@ -18,32 +23,39 @@ def set_seed(seed=42):
     random.seed(seed)
 
 
-# Prepare data from intents.json
-def prepare_data(intents_path):
-    with open("intents.json", "r", encoding="utf-8") as f:
-        intents = json.load(f)
+IGNORE_WORDS = ['?', '.', '!']
+
 
-    all_words, tags, xy = [], [], []
+def tokenize_patterns(intents):
+    """(tokens, tag) for every pattern of every intent, in file order."""
+    return [(tokenize(pattern), intent['tag']) for intent in intents['intents'] for pattern in intent['patterns']]
 
-    for intent in intents['intents']:
-        tag = intent['tag']
-        tags.append(tag)
-        for pattern in intent['patterns']:
-            w = tokenize(pattern)
-            all_words.extend(w)
-            xy.append((w, tag))
 
-    ignore_words = ['?', '.', '!']
-    all_words = sorted(set(stem(w) for w in all_words if w not in ignore_words))
-    tags = sorted(set(tags))
+def vocabulary(xy):
+    """Sorted stems of every pattern token, as stored in data.pth's all_words."""
+    return sorted(set(stem(w) for (pattern_sentence, _) in xy for w in pattern_sentence if w not in IGNORE_WORDS))
 
-    X_train, y_train = [], []
-    for (pattern_sentence, tag) in xy:
-        bag = bag_of_words(pattern_sentence, all_words)
-        X_train.append(bag)
-        y_train.append(tags.index(tag))
 
-    return np.array(X_train), np.array(y_train), all_words, tags
+def encode_patterns(xy, all_words, tags):
+    """Bag-of-words matrix and label vector for (tokens, tag) pairs."""
+    encoder = BagOfWordsEncoder(all_words)
+    tag_index = {tag: idx for idx, tag in enumerate(tags)}
+    X = encoder.encode_batch([pattern_sentence for (pattern_sentence, _) in xy])
+    y = np.array([tag_index[tag] for (_, tag) in xy])
+    return X, y
+
+
+# Prepare data from intents.json
+def prepare_data(intents_path):
+    # Includes additions still in the intent store's change log
+    intents = IntentStore(intents_path).snapshot()
+
+    xy = tokenize_patterns(intents)
+    all_words = vocabulary(xy)
+    tags = sorted(set(intent['tag'] for intent in intents['intents']))
+    X_train, y_train = encode_patterns(xy, all_words, tags)
+
+    return X_train, y_train, all_words, tags
 
 
 # Custom Dataset class
@@ -61,7 +73,7 @@ class ChatDataset(Dataset):
 
 
 # Training function
-def train_model(model, train_loader, criterion, optimizer, device, num_epochs=1000):
+def train_model(model, train_loader, criterion, optimizer, device, num_epochs=1000, on_epoch=None):
     model.train()
     for epoch in range(num_epochs):
         epoch_loss = 0
@@ -77,12 +89,95 @@ def train_model(model, train_loader, criterion, optimizer, device, num_epochs=10
             optimizer.step()
             epoch_loss += loss.item()
 
+        if on_epoch is not None:
+            on_epoch(epoch, epoch_loss / len(train_loader))
         if (epoch + 1) % 100 == 0 or epoch == 0:
             avg_loss = epoch_loss / len(train_loader)
             print(f"Epoch [{epoch+1}/{num_epochs}], Loss: {avg_loss:.4f}")
     return model
 
 
+def holdout_split(X, y, fraction=0.15, seed=42):
+    """Stratified split into (X_train, y_train, X_val, y_val).
+
+    Takes round(fraction * n) patterns of each tag for validation but always
+    leaves a tag at least two training patterns.
+    """
+    rng = np.random.RandomState(seed)
+    val_idx = []
+    for label in np.unique(y):
+        idx = np.flatnonzero(y == label)
+        rng.shuffle(idx)
+        val_idx.extend(idx[:max(0, min(int(round(len(idx) * fraction)), len(idx) - 2))])
+    val_mask = np.zeros(len(y), dtype=bool)
+    val_mask[val_idx] = True
+    return X[~val_mask], y[~val_mask], X[val_mask], y[val_mask]
+
+
+def evaluate(model, X, y, criterion):
+    """(loss, accuracy) of the model on pre-built tensors, in eval mode."""
+    model.eval()
+    with torch.no_grad():
+        outputs = model(X)
+        loss = criterion(outputs, y).item()
+        accuracy = (outputs.argmax(dim=1) == y).float().mean().item()
+    model.train()
+    return loss, accuracy
+
+
+# Vectorized training: the whole dataset lives in tensors, so each batch is one index slice
+def train_model_vectorized(model, X, y, criterion, optimizer, device, num_epochs=1000, batch_size=8,
+                           X_val=None, y_val=None, patience=50, min_delta=1e-4):
+    """Train without a DataLoader; with a validation split, stop early on validation loss.
+
+    Batches are slices of a per-epoch permutation (the last partial batch is
+    dropped, like DataLoader(drop_last=True); batch_size=0 means full batch).
+    When validation data is given, training stops once validation loss has
+    not improved by min_delta for `patience` epochs, and the best weights are
+    restored. Returns (model, info) with epochs run, best epoch and losses.
+    """
+    X = torch.as_tensor(X, dtype=torch.float32, device=device)
+    y = torch.as_tensor(y, dtype=torch.long, device=device)
+    has_val = X_val is not None and len(X_val) > 0
+    if has_val:
+        X_val = torch.as_tensor(X_val, dtype=torch.float32, device=device)
+        y_val = torch.as_tensor(y_val, dtype=torch.long, device=device)
+    n = len(X)
+    batch_size = batch_size or n
+    num_batches = max(n // batch_size, 1)
+
+    best_loss, best_epoch, best_state = float("inf"), 0, None
+    model.train()
+    for epoch in range(num_epochs):
+        permutation = torch.randperm(n, device=device)
+        epoch_loss = 0.0
+        for b in range(num_batches):
+            idx = permutation[b * batch_size:(b + 1) * batch_size]
+            loss = criterion(model(X[idx]), y[idx])
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            epoch_loss += loss.item()
+
+        if (epoch + 1) % 100 == 0 or epoch == 0:
+            print(f"Epoch [{epoch+1}/{num_epochs}], Loss: {epoch_loss / num_batches:.4f}")
+        if not has_val:
+            continue
+        val_loss, _ = evaluate(model, X_val, y_val, criterion)
+        if val_loss < best_loss - min_delta:
+            best_loss, best_epoch, best_state = val_loss, epoch + 1, copy.deepcopy(model.state_dict())
+        elif epoch + 1 - best_epoch >= patience:
+            print(f"Early stopping at epoch {epoch+1}; best validation loss {best_loss:.4f} at epoch {best_epoch}")
+            break
+
+    info = {"epochs": epoch + 1, "train_loss": epoch_loss / num_batches}
+    if best_state is not None:
+        model.load_state_dict(best_state)
+        val_loss, val_accuracy = evaluate(model, X_val, y_val, criterion)
+        info.update({"best_epoch": best_epoch, "val_loss": val_loss, "val_accuracy": val_accuracy})
+    return model, info
+
+
 def save_model(model, file_path, input_size, hidden_size, output_size, all_words, tags):
     data = {
         "model_state": model.state_dict(),
@@ -97,6 +192,17 @@ def save_model(model, file_path, input_size, hidden_size, output_size, all_words
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Train the intent classifier on intents.json")
+    parser.add_argument("--mode", choices=["loader", "vectorized"], default="loader",
+                        help="loader: DataLoader loop; vectorized: tensor slices with early stopping")
+    parser.add_argument("--epochs", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=8, help="0 = full batch (vectorized mode)")
+    parser.add_argument("--val-fraction", type=float, default=0.15, help="held-out split (vectorized mode)")
+    parser.add_argument("--patience", type=int, default=50)
+    parser.add_argument("--refit", action="store_true",
+                        help="vectorized mode: retrain on all patterns for the early-stopped epoch count")
+    args = parser.parse_args()
+
     set_seed()
 
     # Load and preprocess data
@@ -106,14 +212,10 @@ def main():
     output_size = len(tags)
 
     # Hyperparameters
-    num_epochs = 1000
-    batch_size = 8
+    num_epochs = args.epochs
+    batch_size = args.batch_size
     learning_rate = 0.001
 
-    # Setup dataset and dataloader
-    dataset = ChatDataset(X_train, y_train)
-    train_loader = DataLoader(dataset=dataset, batch_size=batch_size, shuffle=True, drop_last=True)
-
     # Device configuration
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     model = NeuralNet(input_size, hidden_size, output_size).to(device)
@@ -126,10 +228,30 @@ def main():
     print(f"Input Size: {input_size}, Output Size: {output_size}, Tags: {tags}")
 
     # Train the model
-    trained_model = train_model(model, train_loader, criterion, optimizer, device, num_epochs)
+    start = time.perf_counter()
+    if args.mode == "vectorized":
+        X_fit, y_fit, X_val, y_val = holdout_split(X_train, y_train, args.val_fraction)
+        trained_model, info = train_model_vectorized(model, X_fit, y_fit, criterion, optimizer, device,
+                                                     num_epochs, batch_size, X_val, y_val, args.patience)
+        print(f"Training summary: {info}")
+        if args.refit and info.get("best_epoch"):
+            set_seed()
+            model = NeuralNet(input_size, hidden_size, output_size).to(device)
+            optimizer = torch.optim.Adam(model.parameters(), lr=learning_rate)
+            trained_model, _ = train_model_vectorized(model, X_train, y_train, criterion, optimizer, device,
+                                                      info["best_epoch"], batch_size)
+    else:
+        # Setup dataset and dataloader
+        dataset = ChatDataset(X_train, y_train)
+        train_loader = DataLoader(dataset=dataset, batch_size=batch_size, shuffle=True, drop_last=True)
+        trained_model = train_model(model, train_loader, criterion, optimizer, device, num_epochs)
+    print(f"Training took {time.perf_counter() - start:.1f}s ({args.mode} mode)")
 
     # Save trained model
     save_model(trained_model, "data.pth", input_size, hidden_size, output_size, all_words, tags)
+    # Torch-free artifact served by default (numpy_classifier)
+    export_npz("data.pth", "data.npz")
+    export_artifact("data.pth", "data.bin")
 
 
 if __name__ == "__main__":